@@ -0,0 +1,108 @@
+"""
+Model definition and learning-rate schedule shared by disease.py and train.py.
+
+`build_custom_cnn` is the network behind `best_alzheimer_model.h5`. Its softmax layer is
+pinned to float32, so under a mixed-precision policy the class probabilities (and the
+loss computed from them) keep full precision, while the convolutions run in
+bfloat16/float16.
+"""
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers, models
+
+
+def build_custom_cnn(input_shape=(224, 224, 3), num_classes=4):
+    """
+    Custom CNN optimized for MRI brain scans
+    Designed to hit 98%+ accuracy
+    """
+    model = models.Sequential([
+        # Block 1
+        layers.Conv2D(32, (3, 3), activation='relu', padding='same', input_shape=input_shape),
+        layers.BatchNormalization(),
+        layers.Conv2D(32, (3, 3), activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.MaxPooling2D((2, 2)),
+        layers.Dropout(0.25),
+        # Block 2
+        layers.Conv2D(64, (3, 3), activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.Conv2D(64, (3, 3), activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.MaxPooling2D((2, 2)),
+        layers.Dropout(0.25),
+        # Block 3
+        layers.Conv2D(128, (3, 3), activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.Conv2D(128, (3, 3), activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.MaxPooling2D((2, 2)),
+        layers.Dropout(0.25),
+        # Block 4
+        layers.Conv2D(256, (3, 3), activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.Conv2D(256, (3, 3), activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.MaxPooling2D((2, 2)),
+        layers.Dropout(0.25),
+
+        # Block 5 (Deeper)
+        layers.Conv2D(512, (3, 3), activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.Conv2D(512, (3, 3), activation='relu', padding='same'),
+        layers.BatchNormalization(),
+        layers.GlobalAveragePooling2D(),
+        # Dense layers
+        layers.Dense(512, activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(0.5),
+
+        layers.Dense(256, activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(0.4),
+
+        layers.Dense(128, activation='relu'),
+        layers.BatchNormalization(),
+        layers.Dropout(0.3),
+        # Output layer (float32 even under a mixed-precision policy)
+        layers.Dense(num_classes, activation='softmax', dtype='float32')
+    ])
+
+    return model
+
+
+class WarmUpCosineDecay(keras.optimizers.schedules.LearningRateSchedule):
+    """
+    Learning rate schedule with warmup and cosine decay
+    Essential for transformer training
+    """
+    def __init__(self, initial_lr, warmup_steps, total_steps):
+        super().__init__()
+        self.initial_lr = initial_lr
+        self.warmup_steps = warmup_steps
+        self.total_steps = total_steps
+
+    def __call__(self, step):
+        # Optimizer steps arrive as int64; do the math in float32 (also under XLA)
+        step = tf.cast(step, tf.float32)
+        warmup_steps = tf.cast(self.warmup_steps, tf.float32)
+        total_steps = tf.cast(self.total_steps, tf.float32)
+
+        # Warmup phase
+        warmup_lr = self.initial_lr * (step / tf.maximum(warmup_steps, 1.0))
+
+        # Cosine decay phase
+        decay_steps = tf.maximum(total_steps - warmup_steps, 1.0)
+        decay_progress = tf.clip_by_value((step - warmup_steps) / decay_steps, 0.0, 1.0)
+        cosine_decay = 0.5 * (1 + tf.cos(np.pi * decay_progress))
+        decay_lr = self.initial_lr * cosine_decay
+
+        return tf.where(step < warmup_steps, warmup_lr, decay_lr)
+
+    def get_config(self):
+        return {
+            'initial_lr': self.initial_lr,
+            'warmup_steps': self.warmup_steps,
+            'total_steps': self.total_steps,
+        }
@@ -1,18 +1,16 @@
 import streamlit as st
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from PIL import Image
 import os
 import sys
-import tensorflow as tf
-from tensorflow import keras
-import plotly.graph_objects as go
-import plotly.express as px
-from io import BytesIO
-import base64
-from mri_validation import validate_mri_scan
+# TensorFlow is imported by model_registry when the model is first loaded, and plotly
+# where a chart is drawn, so the page renders before either import finishes
+from mri_validation import load_rgb_array
+from image_pipeline import prepare_image, prepare_images, remember_prediction, to_model_input
+from instrumentation import configure_from_env, metrics, timed_predict
+from prediction_cache import PredictionCache, model_identity
+from model_registry import evict_model, get_model, is_loaded, warm_up_in_background
 
 # Set page config
 st.set_page_config(
@@ -64,54 +62,112 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Images per model.predict call in the batch analysis tab
+BATCH_SIZE = 32
+
 # Helper functions from the original code
 def _get_class_names_fallback():
     """Get class names for the model"""
     return ['NonDemented', 'VeryMildDemented', 'MildDemented', 'ModerateDemented']
 
+class SharedModel:
+    """Keras-style handle on the process-wide model; the first predict() waits for the load"""
+    def __init__(self, model_path):
+        self.model_path = model_path
+    
+    def predict(self, batch, verbose=0):
+        return get_model(self.model_path).predict(batch, verbose=verbose)
+
+@st.cache_resource
+def start_model_warm_up(model_path, mtime_ns):
+    """Load + warm the model on a background thread, once per file version"""
+    return warm_up_in_background(model_path)
+
 def load_trained_model(model_path='best_alzheimer_model.h5'):
-    """Load a trained Keras model"""
+    """Get the trained Keras model, shared by all sessions and loaded in the background
+    (rejected uploads are answered without waiting for TensorFlow)"""
     if not os.path.exists(model_path):
         st.error(f"❌ Model file not found: {model_path}")
         return None
-    try:
-        loaded = keras.models.load_model(model_path, compile=False)
-        st.success(f"✅ Model loaded successfully!")
-        return loaded
-    except Exception as e:
-        st.error(f"❌ Failed to load model: {e}")
-        return None
+    start_model_warm_up(model_path, os.stat(model_path).st_mtime_ns)
+    return SharedModel(model_path)
+
+@st.cache_resource
+def get_prediction_cache(model_path, model_id, db_path=None):
+    """Process-wide prediction cache shared by all sessions (optional SQLite tier).
+    `model_id` is part of the resource key so a retrained model gets a fresh cache."""
+    return PredictionCache(model_path, max_entries=4096, db_path=db_path)
 
 def preprocess_image(image, target_size=(224, 224)):
     """Preprocess image for prediction"""
-    if isinstance(image, Image.Image):
-        img = image.convert('RGB')
-    else:
-        img = Image.open(image).convert('RGB')
-    
-    img = img.resize(target_size)
-    arr = np.array(img, dtype=np.float32) / 255.0
-    arr = np.expand_dims(arr, axis=0)
-    return arr
+    return to_model_input(load_rgb_array(image), target_size=target_size)
 
-def predict_image(model, image, class_names=None, target_size=(224, 224)):
-    """Predict single image and return results"""
+def predict_image(model, image, class_names=None, target_size=(224, 224), cache=None):
+    """Predict single image and return results (re-uploads are served from `cache`)"""
     if class_names is None:
         class_names = _get_class_names_fallback()
 
-    is_valid, validation_msg = validate_mri_scan(image)
-    if not is_valid:
-        return None, None, None, validation_msg
+    with metrics.trace("prediction", source=getattr(image, 'name', 'upload')) as trace:
+        # Decode once; validation and preprocessing share the same RGB array
+        prepared = prepare_image(image, target_size=target_size, cache=cache)
+        if not prepared.is_valid:
+            trace["outcome"] = "rejected"
+            return None, None, None, prepared.message
+        
+        if prepared.probs is not None:
+            probs = prepared.probs
+            trace["outcome"] = "cached"
+        else:
+            probs = timed_predict(model, prepared.x)[0]
+            remember_prediction(cache, prepared, probs)
+            trace["outcome"] = "accepted"
+        with metrics.stage("format"):
+            idx = int(np.argmax(probs))
+            label = class_names[idx] if idx < len(class_names) else str(idx)
+        trace["label"], trace["confidence"] = label, float(probs[idx])
+        return label, float(probs[idx]), probs, None
+
+def predict_images(model, images, class_names=None, target_size=(224, 224), cache=None, workers=None):
+    """
+    Batch version of predict_image: decode in parallel, validate in one vectorized
+    pass, then run a single model.predict over the accepted images.
+    Returns a list of (label, confidence, probs, validation_msg, error), one per image.
+    If the model call fails, only the images that reached it get `error` set; rejected
+    and cached images keep their own outcome.
+    """
+    if class_names is None:
+        class_names = _get_class_names_fallback()
+    
+    prepared = prepare_images(images, target_size=target_size, workers=workers, cache=cache)
+    to_run = [p for p in prepared if p.x is not None]
+    batch_error = None
+    try:
+        batch_probs = iter(timed_predict(model, np.concatenate([p.x for p in to_run], axis=0))) if to_run else iter(())
+    except Exception as e:
+        batch_error = str(e)
     
-    x = preprocess_image(image, target_size=target_size)
-    preds = model.predict(x, verbose=0)
-    probs = preds[0]
-    idx = int(np.argmax(probs))
-    label = class_names[idx] if idx < len(class_names) else str(idx)
-    return label, float(probs[idx]), probs, None
+    outcomes = []
+    for p in prepared:
+        if not p.is_valid:
+            outcomes.append((None, None, None, p.message, None))
+            continue
+        if p.probs is not None:
+            probs = p.probs
+        elif batch_error is not None:
+            outcomes.append((None, None, None, None, batch_error))
+            continue
+        else:
+            probs = next(batch_probs)
+            remember_prediction(cache, p, probs)
+        idx = int(np.argmax(probs))
+        label = class_names[idx] if idx < len(class_names) else str(idx)
+        outcomes.append((label, float(probs[idx]), probs, None, None))
+    return outcomes
 
 def create_probability_chart(probs, class_names):
     """Create a probability chart using Plotly"""
+    import plotly.graph_objects as go
+    
     fig = go.Figure(data=[
         go.Bar(
             x=class_names,
@@ -153,8 +209,22 @@ def get_risk_level(prediction):
     }
     return risk_map.get(prediction, 'Unknown')
 
+def show_performance_metrics():
+    """Sidebar table of per-stage timings (only when MRI_METRICS=1)"""
+    summary = metrics.stage_summary()
+    if not summary:
+        return
+    with st.sidebar.expander("⏱️ Performance"):
+        st.dataframe(pd.DataFrame(summary).T[['calls', 'mean_ms', 'p50_ms', 'p95_ms']].round(2))
+        outcomes = metrics.counter_values("mri_images_total")
+        if outcomes:
+            st.caption(", ".join(f"{k}: {int(v)}" for k, v in sorted(outcomes.items())))
+
 # Main app
 def main():
+    # Stage timings/counters when MRI_METRICS=1 (Prometheus endpoint on MRI_METRICS_PORT)
+    configure_from_env(service='app')
+    
     # Header
     st.markdown('<h1 class="main-header">🧠 Alzheimer\'s Disease Detection</h1>', unsafe_allow_html=True)
     st.markdown('<p style="text-align: center; color: #6C757D; font-size: 1.1rem;">AI-Powered MRI Analysis for Early Dementia Detection</p>', unsafe_allow_html=True)
@@ -165,19 +235,28 @@ def main():
     # Model selection
     model_path = st.sidebar.text_input("Model Path", "best_alzheimer_model.h5")
     
-    # Load model
-    if 'model' not in st.session_state:
-        st.session_state.model = None
+    # Model is shared process-wide (keyed by path + mtime); reload only on request
+    if st.sidebar.button("🔄 Reload Model", type="primary"):
+        evict_model(model_path)
     
-    if st.sidebar.button("🔄 Load Model", type="primary"):
-        with st.spinner("Loading model..."):
-            st.session_state.model = load_trained_model(model_path)
+    model = load_trained_model(model_path)
     
     # Check if model is loaded
-    if st.session_state.model is None:
-        st.warning("⚠️ Please load the model first using the sidebar.")
+    if model is None:
+        st.warning("⚠️ Model could not be loaded. Check the model path in the sidebar.")
         st.info("💡 Make sure 'best_alzheimer_model.h5' is in the same directory as this app.")
         return
+    if is_loaded(model_path):
+        st.sidebar.success("✅ Model ready")
+    else:
+        st.sidebar.info("⏳ Model loading in the background...")
+    
+    # Same scan uploaded again (any session) -> cached result, no re-validation or inference
+    cache = None
+    if os.path.exists(model_path):
+        cache = get_prediction_cache(model_path, model_identity(model_path), os.environ.get('PREDICTION_CACHE_DB'))
+    
+    show_performance_metrics()
     
     # Main content area
     tab1, tab2, tab3 = st.tabs(["📸 Single Image Analysis", "📊 Batch Analysis", "ℹ️ About"])
@@ -215,11 +294,16 @@ def main():
                 
                 # Make prediction
                 with st.spinner("Analyzing image..."):
-                    prediction, confidence, probs, validation_msg = predict_image(
-                        st.session_state.model, 
-                        image, 
-                        class_names=_get_class_names_fallback()
-                    )
+                    try:
+                        prediction, confidence, probs, validation_msg = predict_image(
+                            model, 
+                            uploaded_file, 
+                            class_names=_get_class_names_fallback(),
+                            cache=cache
+                        )
+                    except Exception as e:  # model load/inference failure
+                        st.error(f"❌ Prediction failed: {e}")
+                        st.stop()
 
                 if prediction is None:
                     st.error("Invalid input. Please provide a valid MRI scanned brain image.")
@@ -274,19 +358,30 @@ def main():
                 results = []
                 progress_bar = st.progress(0)
                 status_text = st.empty()
+                total = len(uploaded_files)
                 
-                for i, file in enumerate(uploaded_files):
-                    status_text.text(f"Analyzing {file.name}...")
-                    progress_bar.progress((i + 1) / len(uploaded_files))
+                # One decode/validate/predict round per batch; UI updates once per batch
+                for start in range(0, total, BATCH_SIZE):
+                    chunk = uploaded_files[start:start + BATCH_SIZE]
+                    status_text.text(f"Analyzing images {start + 1}-{start + len(chunk)} of {total}...")
                     
-                    try:
-                        image = Image.open(file)
-                        prediction, confidence, probs, validation_msg = predict_image(
-                            st.session_state.model, 
-                            image, 
-                            class_names=_get_class_names_fallback()
-                        )
-                        if prediction is None:
+                    outcomes = predict_images(
+                        model,
+                        chunk,
+                        class_names=_get_class_names_fallback(),
+                        cache=cache
+                    )
+                    
+                    for file, outcome in zip(chunk, outcomes):
+                        prediction, confidence, probs, validation_msg, error = outcome
+                        if error is not None:
+                            results.append({
+                                'Filename': file.name,
+                                'Prediction': 'Error',
+                                'Confidence': 'N/A',
+                                'Risk Level': f'Processing error: {error}'
+                            })
+                        elif prediction is None:
                             results.append({
                                 'Filename': file.name,
                                 'Prediction': 'Invalid Image',
@@ -300,13 +395,8 @@ def main():
                                 'Confidence': f"{confidence*100:.1f}%",
                                 'Risk Level': get_risk_level(prediction)
                             })
-                    except Exception as e:
-                        results.append({
-                            'Filename': file.name,
-                            'Prediction': 'Error',
-                            'Confidence': 'N/A',
-                            'Risk Level': f'Processing error: {str(e)}'
-                        })
+                    
+                    progress_bar.progress((start + len(chunk)) / total)
                 
                 status_text.text("✅ Analysis complete!")
                 
@@ -336,6 +426,8 @@ def main():
                 # Create summary chart
                 if valid_results:
                     st.markdown("### 📊 Distribution of Results")
+                    import plotly.express as px
+                    
                     fig = px.pie(
                         values=prediction_counts.values,
                         names=prediction_counts.index,
@@ -0,0 +1,435 @@
+"""
+Inference benchmark: latency percentiles, throughput curves, cold start and peak memory.
+
+FAST_PREDICTION_GUIDE.md and example_production.py quote "~2 seconds per prediction" and
+"30-60 seconds for 100 images". This script measures those numbers on the current machine
+and writes them to JSON, so two commits (or two backends) can be compared.
+
+It runs synthetic MRI-like scans (dark background, skull rim, folded texture; all of
+them pass mri_validation's strict checks, so the full pipeline runs) through:
+    * predict.predict_image           - decode + validate + single-image inference
+    * AlzheimerPredictor.predict_image - the library entry point
+    * AlzheimerPredictor.iter_predictions - threaded decode + batched inference, per batch size
+    * runner.predict                   - model only, images/sec per batch size and thread count
+Cold start (imports + model load + first prediction) and the thread sweep run in fresh
+child processes, because thread pools cannot be resized once TensorFlow has started.
+
+Example:
+    python benchmark_inference.py --model best_alzheimer_model.h5 exports/model_int8.tflite
+    python benchmark_inference.py --compare benchmarks/main.json --output benchmarks/branch.json
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_BATCH_SIZES = (1, 8, 16, 32, 64)
+
+# ============================================
+# SYNTHETIC MRI-LIKE INPUTS
+# ============================================
+
+def synthetic_mri(size=256, seed=0):
+    """(size, size, 3) uint8 axial-slice-like image that passes the strict MRI validation."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32) / (size - 1) * 2 - 1
+    cy, cx = rng.uniform(-0.05, 0.05, 2)
+    ry, rx = rng.uniform(0.70, 0.82), rng.uniform(0.58, 0.70)
+    r = np.sqrt(((yy - cy) / ry) ** 2 + ((xx - cx) / rx) ** 2)
+    noise = rng.uniform(0, 255, (size // 8, size // 8)).astype(np.uint8)
+    texture = np.asarray(Image.fromarray(noise).resize((size, size), Image.BICUBIC), dtype=np.float32)
+    folds = 0.5 + 0.5 * np.sin(r * rng.uniform(18, 26) + texture / 40.0)
+    brain = np.where(r < 1.0, 70 + 90 * folds + 0.25 * texture, 0.0)
+    brain = np.where(r < 0.93, brain, np.where(r < 1.0, 200.0, 0.0))  # skull rim
+    ventricles = np.sqrt(((yy - cy) / 0.12) ** 2 + ((np.abs(xx - cx) - 0.1) / 0.05) ** 2) < 1.0
+    brain = np.where(ventricles, 20.0, brain)
+    brain += rng.normal(0, 4, brain.shape) * (r < 1.0)
+    gray = np.clip(brain, 0, 255).astype(np.uint8)
+    return np.stack([gray] * 3, axis=-1)
+
+
+def write_synthetic_scans(folder, count=64, size=256, seed=0):
+    """Write `count` synthetic scans as PNGs; returns their paths."""
+    from mri_validation import validate_mri_scan
+
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i in range(count):
+        rgb = synthetic_mri(size, seed + i)
+        is_valid, message = validate_mri_scan(rgb)
+        if not is_valid:
+            raise RuntimeError(f"Synthetic scan {i} failed MRI validation: {message}")
+        path = os.path.join(folder, f"synthetic_{i:04d}.png")
+        Image.fromarray(rgb).save(path)
+        paths.append(path)
+    return paths
+
+# ============================================
+# MEASUREMENT HELPERS
+# ============================================
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where `resource` is unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3  # bytes on macOS, KB on Linux
+
+
+def latency_stats(timings_ms):
+    timings = np.asarray(timings_ms, dtype=np.float64)
+    if not len(timings):
+        return {'count': 0}
+    return {
+        'count': int(len(timings)),
+        'mean_ms': float(timings.mean()),
+        'min_ms': float(timings.min()),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+        'p99_ms': float(np.percentile(timings, 99)),
+        'max_ms': float(timings.max()),
+    }
+
+
+def time_calls(fn, args_list, warmup=1):
+    """Milliseconds per `fn(arg)` call, after `warmup` untimed calls."""
+    for arg in args_list[:warmup]:
+        fn(arg)
+    timings = []
+    for arg in args_list:
+        start = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+
+def _cycle(items, n):
+    return [items[i % len(items)] for i in range(n)]
+
+# ============================================
+# BENCHMARKS
+# ============================================
+
+def bench_predict_image(model, paths, samples=50):
+    """End-to-end latency of predict.predict_image (decode, validate, infer)."""
+    from predict import predict_image
+
+    return latency_stats(time_calls(lambda p: predict_image(model, p), _cycle(paths, samples)))
+
+
+def bench_predictor(predictor, paths, samples=50):
+    """End-to-end latency of AlzheimerPredictor.predict_image."""
+    return latency_stats(time_calls(predictor.predict_image, _cycle(paths, samples)))
+
+
+def bench_model_batches(runner, inputs, batch_sizes=DEFAULT_BATCH_SIZES, min_images=128):
+    """
+    Model-only throughput: `runner.predict` on pre-processed batches of each size.
+    Each size runs at least `min_images` images (and at least 5 batches).
+    """
+    rows = []
+    for batch_size in batch_sizes:
+        batch = np.concatenate(_cycle(inputs, batch_size), axis=0)
+        iterations = max(5, -(-min_images // batch_size))
+        timings = time_calls(lambda b: runner.predict(b, verbose=0), [batch] * iterations)
+        stats = latency_stats(timings)
+        stats.update(batch_size=batch_size, images_per_sec=batch_size * 1000.0 / stats['mean_ms'])
+        rows.append(stats)
+    return rows
+
+
+def bench_pipeline(predictor, folder, batch_sizes=DEFAULT_BATCH_SIZES, workers=None):
+    """Folder throughput of AlzheimerPredictor.iter_predictions per batch size."""
+    count = len(os.listdir(folder))
+    list(predictor.iter_predictions(folder, batch_size=batch_sizes[0], workers=workers))  # warm-up
+    rows = []
+    for batch_size in batch_sizes:
+        start = time.perf_counter()
+        results = list(predictor.iter_predictions(folder, batch_size=batch_size, workers=workers))
+        elapsed = time.perf_counter() - start
+        errors = sum(1 for r in results if r.error is not None)
+        rows.append({'batch_size': batch_size, 'images': count, 'seconds': elapsed,
+                     'images_per_sec': count / elapsed, 'errors': errors})
+    return rows
+
+# ============================================
+# CHILD PROCESSES (COLD START, THREAD SWEEP)
+# ============================================
+
+def _child_main(spec):
+    """Runs in a fresh interpreter: import, load, first prediction, optional batch sweep."""
+    t0 = time.perf_counter()
+    from inference_runner import create_runner, detect_backend
+    from image_pipeline import prepare_image
+
+    backend = spec['backend'] if spec['backend'] != 'auto' else detect_backend(spec['model'])
+    threads = spec.get('threads')
+    if backend != 'tflite':
+        import tensorflow as tf  # thread pools must be sized before the first op runs
+
+        if threads:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+    t_import = time.perf_counter()
+    runner = create_runner(spec['model'], backend=backend, num_threads=threads)
+    t_load = time.perf_counter()
+    prepared = prepare_image(spec['images'][0])
+    runner.predict(prepared.x, verbose=0)
+    t_first = time.perf_counter()
+
+    result = {
+        'backend': backend,
+        'threads': threads,
+        'import_s': t_import - t0,
+        'load_s': t_load - t_import,
+        'first_prediction_s': t_first - t_load,
+        'total_s': t_first - t0,
+    }
+    if spec.get('batch_sizes'):
+        inputs = [prepare_image(p).x for p in spec['images']]
+        result['batches'] = bench_model_batches(runner, inputs, spec['batch_sizes'], spec.get('min_images', 128))
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_child(model_path, backend, image_paths, threads=None, batch_sizes=None, min_images=128):
+    """Run `_child_main` in a new process; returns its result dict plus the wall time seen from outside."""
+    spec = {'model': model_path, 'backend': backend, 'images': list(image_paths), 'threads': threads,
+            'batch_sizes': list(batch_sizes or []), 'min_images': min_images}
+    env = dict(os.environ)
+    if threads:
+        env['TF_NUM_INTRAOP_THREADS'] = str(threads)
+        env['TF_NUM_INTEROP_THREADS'] = '1'
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', json.dumps(spec)],
+                          capture_output=True, text=True, env=env)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark child failed:\n{proc.stderr.strip()[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['process_wall_s'] = wall
+    return result
+
+
+def cold_start(model_path, backend, image_paths, runs=3):
+    """Fresh-process start-up cost; the run with the median total time is reported, plus all totals."""
+    results = sorted((run_child(model_path, backend, image_paths[:1]) for _ in range(runs)),
+                     key=lambda r: r['process_wall_s'])
+    median = dict(results[len(results) // 2])
+    median['runs_wall_s'] = [r['process_wall_s'] for r in results]
+    return median
+
+
+def thread_sweep(model_path, backend, image_paths, thread_counts, batch_sizes, min_images=128):
+    """images/sec versus batch size, one fresh process per thread count."""
+    rows = []
+    for threads in thread_counts:
+        result = run_child(model_path, backend, image_paths, threads=threads,
+                           batch_sizes=batch_sizes, min_images=min_images)
+        rows.append({'threads': threads, 'peak_rss_mb': result['peak_rss_mb'], 'batches': result['batches']})
+    return rows
+
+# ============================================
+# REPORTING
+# ============================================
+
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def environment_info():
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+
+
+def compare_reports(baseline, current, tolerance=0.10):
+    """
+    Regressions of `current` against `baseline`: latencies more than `tolerance` slower
+    and throughputs more than `tolerance` lower, matched by model and batch size.
+    """
+    problems = []
+    base_models = {m['model']: m for m in baseline.get('models', [])}
+    for model in current.get('models', []):
+        base = base_models.get(model['model'])
+        if base is None:
+            continue
+        name = os.path.basename(model['model'])
+        for section in ('predict_image', 'predictor'):
+            for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+                old, new = base.get(section, {}).get(key), model.get(section, {}).get(key)
+                if old and new and new > old * (1 + tolerance):
+                    problems.append(f"{name} {section} {key}: {old:.1f} -> {new:.1f} ms")
+        for section in ('model_batches', 'pipeline'):
+            old_rows = {r['batch_size']: r for r in base.get(section, [])}
+            for row in model.get(section, []):
+                old = old_rows.get(row['batch_size'])
+                if old and row['images_per_sec'] < old['images_per_sec'] * (1 - tolerance):
+                    problems.append(f"{name} {section} batch {row['batch_size']}: "
+                                    f"{old['images_per_sec']:.1f} -> {row['images_per_sec']:.1f} img/s")
+        old_cold, new_cold = base.get('cold_start', {}).get('total_s'), model.get('cold_start', {}).get('total_s')
+        if old_cold and new_cold and new_cold > old_cold * (1 + tolerance):
+            problems.append(f"{name} cold start: {old_cold:.2f} -> {new_cold:.2f} s")
+    return problems
+
+
+def print_summary(report):
+    for m in report['models']:
+        print(f"\n{'='*70}")
+        print(f"[*] {m['model']} ({m['backend']})")
+        print(f"{'='*70}")
+        cold = m.get('cold_start')
+        if cold:
+            print(f"  Cold start: {cold['total_s']:.2f}s (import {cold['import_s']:.2f}s, load {cold['load_s']:.2f}s, "
+                  f"first prediction {cold['first_prediction_s']:.2f}s), peak RSS {cold['peak_rss_mb'] or 0:.0f} MB")
+        print(f"\n  {'Single image':28} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for section, label in (('predict_image', 'predict.predict_image'), ('predictor', 'AlzheimerPredictor')):
+            s = m[section]
+            print(f"  {label:28} {s['p50_ms']:8.1f} {s['p95_ms']:8.1f} {s['p99_ms']:8.1f}")
+        print(f"\n  {'Batch':>5} {'model img/s':>12} {'batch p95 ms':>13} {'pipeline img/s':>15}")
+        pipeline = {r['batch_size']: r for r in m.get('pipeline', [])}
+        for row in m['model_batches']:
+            pipe = pipeline.get(row['batch_size'])
+            pipe_ips = f"{pipe['images_per_sec']:15.1f}" if pipe else f"{'n/a':>15}"
+            print(f"  {row['batch_size']:5d} {row['images_per_sec']:12.1f} {row['p95_ms']:13.1f} {pipe_ips}")
+        if m.get('thread_sweep'):
+            sizes = [r['batch_size'] for r in m['thread_sweep'][0]['batches']]
+            print("\n  img/s by threads x batch size")
+            print(f"  {'threads':>7} " + ' '.join(f"{'b=' + str(b):>8}" for b in sizes) + f" {'RSS MB':>8}")
+            for row in m['thread_sweep']:
+                rss = f"{row['peak_rss_mb']:8.0f}" if row['peak_rss_mb'] else f"{'n/a':>8}"
+                print(f"  {row['threads']:7d} " + ' '.join(f"{r['images_per_sec']:8.1f}" for r in row['batches']) + f" {rss}")
+
+# ============================================
+# CLI INTERFACE
+# ============================================
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--child':
+        _child_main(json.loads(sys.argv[2]))
+        sys.exit(0)
+
+    import argparse
+    import shutil
+
+    parser = argparse.ArgumentParser(
+        description='Benchmark inference latency, throughput, cold start and memory',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Baseline Keras model
+  python benchmark_inference.py
+
+  # Compare Keras against exported TFLite variants
+  python benchmark_inference.py --model best_alzheimer_model.h5 exports/model_float16.tflite exports/model_int8.tflite
+
+  # Regression check against a stored run (exit code 1 on regression)
+  python benchmark_inference.py --output benchmarks/branch.json --compare benchmarks/main.json
+        """
+    )
+    parser.add_argument('--model', '-m', nargs='+', default=['best_alzheimer_model.h5'],
+                        help='Model(s): .h5, SavedModel dir or .tflite [default: best_alzheimer_model.h5]')
+    parser.add_argument('--backend', choices=('auto', 'keras', 'savedmodel', 'tflite'), default='auto',
+                        help='Inference backend for every model [default: auto]')
+    parser.add_argument('--images', type=int, default=64, help='Synthetic scans to generate [default: 64]')
+    parser.add_argument('--image-size', type=int, default=256, help='Synthetic scan size in pixels [default: 256]')
+    parser.add_argument('--samples', type=int, default=50, help='Single-image latency samples [default: 50]')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=list(DEFAULT_BATCH_SIZES),
+                        help='Batch sizes for throughput curves [default: 1 8 16 32 64]')
+    parser.add_argument('--threads', type=int, nargs='+', default=None,
+                        help='Thread counts for the sweep [default: 1 2 4 ... CPU count]')
+    parser.add_argument('--min-images', type=int, default=128,
+                        help='Images per model-only throughput measurement [default: 128]')
+    parser.add_argument('--workers', type=int, default=None, help='Decode threads for the pipeline runs')
+    parser.add_argument('--cold-runs', type=int, default=3, help='Fresh-process cold-start runs [default: 3]')
+    parser.add_argument('--skip-cold-start', action='store_true', help='Skip the cold-start measurement')
+    parser.add_argument('--skip-threads', action='store_true', help='Skip the thread-count sweep')
+    parser.add_argument('--output', '-o', default='benchmark_results.json',
+                        help='JSON results file [default: benchmark_results.json]')
+    parser.add_argument('--compare', default=None, help='Baseline JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed slowdown before a regression is reported [default: 0.10]')
+    args = parser.parse_args()
+
+    for model_path in args.model:
+        if not os.path.exists(model_path):
+            print(f"[ERROR] Model not found: {model_path}")
+            sys.exit(1)
+
+    cpus = os.cpu_count() or 1
+    thread_counts = args.threads or sorted({t for t in (1, 2, 4, 8, 16, 32) if t < cpus} | {cpus})
+    batch_sizes = sorted(set(args.batch_sizes))
+
+    from inference_runner import detect_backend
+    from simple_predict import AlzheimerPredictor
+    from image_pipeline import prepare_image
+
+    work_dir = tempfile.mkdtemp(prefix='mri_benchmark_')
+    try:
+        print(f"[*] Generating {args.images} synthetic MRI scans ({args.image_size}px)...")
+        paths = write_synthetic_scans(os.path.join(work_dir, 'scans'), args.images, args.image_size)
+        report = {'environment': environment_info(), 'config': vars(args), 'models': []}
+
+        for model_path in args.model:
+            backend = args.backend if args.backend != 'auto' else detect_backend(model_path)
+            entry = {'model': model_path, 'backend': backend}
+            if not args.skip_cold_start:
+                print(f"[*] {model_path}: cold start x{args.cold_runs}...")
+                entry['cold_start'] = cold_start(model_path, backend, paths, runs=args.cold_runs)
+
+            predictor = AlzheimerPredictor(model_path, backend=backend)
+            print(f"[*] {model_path}: single-image latency ({args.samples} samples)...")
+            entry['predict_image'] = bench_predict_image(predictor.model, paths, args.samples)
+            entry['predictor'] = bench_predictor(predictor, paths, args.samples)
+            print(f"[*] {model_path}: batch throughput {batch_sizes}...")
+            inputs = [prepare_image(p).x for p in paths]
+            entry['model_batches'] = bench_model_batches(predictor.model, inputs, batch_sizes, args.min_images)
+            entry['pipeline'] = bench_pipeline(predictor, os.path.dirname(paths[0]), batch_sizes, args.workers)
+            del predictor, inputs
+            if not args.skip_threads:
+                print(f"[*] {model_path}: thread sweep {thread_counts}...")
+                entry['thread_sweep'] = thread_sweep(model_path, backend, paths, thread_counts,
+                                                     batch_sizes, args.min_images)
+            report['models'].append(entry)
+        report['environment']['peak_rss_mb'] = peak_rss_mb()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_summary(report)
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w') as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\n[OK] Results saved: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as fh:
+            regressions = compare_reports(json.load(fh), report, args.tolerance)
+        if regressions:
+            print(f"\n[!] {len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"[OK] No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
@@ -0,0 +1,197 @@
+"""
+The single `tf.data` input pipeline for training, validation and test data.
+
+It replaces both the `image_dataset_from_directory` cells and the `ImageDataGenerator`
+cells of disease.py:
+    * decoding/resizing runs in `map(..., num_parallel_calls=AUTOTUNE)`, or is skipped
+      entirely when pre-decoded shards from dataset_cache.py are available
+    * decoded uint8 images are cached after the first epoch, then shuffled and batched
+    * rotation/shift/zoom augmentation runs per batch through vectorized Keras
+      preprocessing layers instead of per image in Python
+    * batches are prefetched, and every random op is seeded
+
+The split is the one `flow_from_directory(validation_split=0.2)` used: for each class, the
+first 20% of the sorted file names is validation and the rest is training. Labels follow
+the sorted class-folder order, and class weights are 'balanced' over the training split.
+
+Example:
+    from data_pipeline import build_datasets
+    data = build_datasets('archive/AugmentedAlzheimerDataset', 'archive/OriginalDataset')
+    model.fit(data.train, validation_data=data.val, class_weight=data.class_weights, epochs=30)
+"""
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from dataset_cache import MANIFEST_NAME, balanced_class_weights, list_class_images, load_manifest, shard_examples
+
+# Matches the old ImageDataGenerator(rotation_range=10, width/height_shift_range=0.1, zoom_range=0.1)
+ROTATION_DEGREES = 10
+SHIFT_FRACTION = 0.1
+ZOOM_FRACTION = 0.1
+
+
+class TrainingData(NamedTuple):
+    """Batched datasets plus the metadata the training cells need."""
+
+    train: object  # tf.data.Dataset of (float32 images in [0, 1], one-hot labels)
+    val: object
+    test: Optional[object]
+    class_names: List[str]
+    class_weights: Dict[int, float]
+    train_count: int
+    val_count: int
+    test_count: int
+    test_labels: Optional[np.ndarray]  # integer labels of `test`, in order (for confusion matrices)
+    batch_size: int = 16
+
+
+def set_global_seed(seed=42):
+    """Seed Python, NumPy and TensorFlow in one call."""
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(seed)
+
+
+def build_augmentation(seed=42):
+    """Vectorized rotation/shift/zoom layers, applied to whole batches."""
+    from tensorflow import keras
+    from tensorflow.keras import layers
+
+    return keras.Sequential([
+        layers.RandomRotation(ROTATION_DEGREES / 360.0, fill_mode='nearest', seed=seed),
+        layers.RandomTranslation(SHIFT_FRACTION, SHIFT_FRACTION, fill_mode='nearest', seed=seed + 1),
+        layers.RandomZoom((-ZOOM_FRACTION, ZOOM_FRACTION), (-ZOOM_FRACTION, ZOOM_FRACTION),
+                          fill_mode='nearest', seed=seed + 2),
+    ], name='augmentation')
+
+
+def file_examples(items, image_size=(224, 224)):
+    """Unbatched (uint8 (H, W, 3) image, int64 label) examples decoded from [(path, label), ...]."""
+    import tensorflow as tf
+
+    width, height = image_size
+    paths = [path for path, _ in items]
+    labels = np.array([label for _, label in items], dtype=np.int64)
+
+    def decode(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, (height, width), method='nearest')  # keeps uint8, like load_img
+        image.set_shape((height, width, 3))
+        return image, label
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    return ds.map(decode, num_parallel_calls=tf.data.AUTOTUNE)
+
+
+def batch_examples(ds, num_classes, batch_size=16, training=False, cache=True, shuffle_buffer=2048,
+                   augment=True, seed=42, repeat=False):
+    """
+    uint8 examples -> cache -> (shuffle) -> (repeat) -> batch -> rescale/one-hot (+ augmentation) -> prefetch.
+    `cache` may be True (memory), a file path, or False.
+    """
+    import tensorflow as tf
+
+    autotune = tf.data.AUTOTUNE
+    if cache:
+        ds = ds.cache(cache if isinstance(cache, str) else '')
+    if training:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    if repeat:
+        ds = ds.repeat()
+    ds = ds.batch(batch_size)
+
+    augmentation = build_augmentation(seed) if training and augment else None
+
+    def to_model_input(images, labels):
+        images = tf.cast(images, tf.float32) / 255.0
+        if augmentation is not None:
+            images = augmentation(images, training=True)
+        return images, tf.one_hot(labels, num_classes)
+
+    ds = ds.map(to_model_input, num_parallel_calls=autotune)
+    return ds.prefetch(autotune)
+
+
+def _without_auto_shard(ds):
+    """Data is already split per worker; stop tf.distribute from sharding it again."""
+    import tensorflow as tf
+
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.OFF
+    return ds.with_options(options)
+
+
+def build_datasets(train_dir=None, test_dir=None, shard_dir=None, image_size=(224, 224), batch_size=16,
+                   validation_split=0.2, seed=42, augment=True, cache=True, shuffle_buffer=2048,
+                   num_workers=1, worker_index=0, index=None, split_manifest=None):
+    """
+    Build train/val (and optionally test) datasets.
+
+    Train/val come from `shard_dir` when it holds a dataset_cache.py manifest, and from
+    decoding `train_dir` otherwise. File order is shuffled once with `seed` before
+    decoding, so the cached examples are already mixed across classes. A
+    dataset_index.DatasetIndex of `train_dir` may be passed as `index` to take the file
+    lists from it instead of listing the folders, and a dedup.py `split_manifest` to train
+    on its de-duplicated, leak-free train/val lists.
+
+    For multi-worker training (`num_workers > 1`), `batch_size` is the global batch:
+    under MultiWorkerMirroredStrategy, `fit` splits each worker's batch across all
+    `num_replicas_in_sync` replicas. Each worker decodes and caches only its own
+    disjoint part of train/val. Both
+    repeat forever, so pass `steps_per_epoch`/`validation_steps` to `fit`.
+    The counts and class weights still describe the full dataset.
+    """
+    distributed = num_workers > 1
+    if shard_dir and os.path.exists(os.path.join(shard_dir, MANIFEST_NAME)):
+        manifest = load_manifest(shard_dir)
+        if tuple(manifest['image_size']) != tuple(image_size):
+            raise ValueError(f"Shards in {shard_dir} are {manifest['image_size']}, expected {list(image_size)}")
+        class_names = manifest['class_names']
+        counts = manifest['splits']['train']['class_counts']
+        train_count = manifest['splits']['train']['num_examples']
+        val_count = manifest['splits'].get('val', {}).get('num_examples', 0)
+        weights = balanced_class_weights([counts[name] for name in class_names])
+        train_ds = shard_examples(shard_dir, 'train', shuffle=True, seed=seed, deterministic=True,
+                                  num_workers=num_workers, worker_index=worker_index)
+        val_ds = shard_examples(shard_dir, 'val', num_workers=num_workers, worker_index=worker_index) if val_count else None
+    elif train_dir or split_manifest:
+        if split_manifest:
+            from dedup import load_split_manifest
+            class_names, splits = load_split_manifest(split_manifest)
+        elif index is not None:
+            class_names, splits = index.split_items(validation_split)
+        else:
+            class_names, splits = list_class_images(train_dir, validation_split=validation_split)
+        order = np.random.RandomState(seed).permutation(len(splits['train']))
+        train_items = [splits['train'][i] for i in order]
+        train_count, val_count = len(train_items), len(splits['val'])
+        weights = balanced_class_weights(np.bincount([label for _, label in train_items],
+                                                     minlength=len(class_names)))
+        # Same permutation on every worker, so the strided slices are disjoint
+        train_ds = file_examples(train_items[worker_index::num_workers], image_size)
+        val_ds = file_examples(splits['val'][worker_index::num_workers], image_size) if val_count else None
+    else:
+        raise ValueError("Pass train_dir or a shard_dir containing a manifest")
+
+    num_classes = len(class_names)
+    train_ds = batch_examples(train_ds, num_classes, batch_size, training=True, cache=cache,
+                              shuffle_buffer=shuffle_buffer, augment=augment, seed=seed + worker_index,
+                              repeat=distributed)
+    if val_ds is not None:
+        val_ds = batch_examples(val_ds, num_classes, batch_size, cache=cache, repeat=distributed)
+    if distributed:
+        train_ds = _without_auto_shard(train_ds)
+        val_ds = _without_auto_shard(val_ds) if val_ds is not None else None
+
+    test_ds, test_labels, test_count = None, None, 0
+    if test_dir:
+        _, test_splits = list_class_images(test_dir, class_names=class_names)
+        test_items = test_splits['train']
+        test_labels = np.array([label for _, label in test_items], dtype=np.int64)
+        test_count = len(test_items)
+        test_ds = batch_examples(file_examples(test_items, image_size), num_classes, batch_size, cache=False)
+
+    return TrainingData(train_ds, val_ds, test_ds, class_names, weights, train_count, val_count,
+                        test_count, test_labels, batch_size)
@@ -0,0 +1,282 @@
+"""
+One-time conversion of a class-per-folder image dataset into pre-decoded TFRecord shards.
+
+`ImageDataGenerator.flow_from_directory` decodes and resizes every JPEG again on each
+epoch, so training is limited by the CPU rather than by the model. `build_shards` does
+that work once. It writes 224x224 RGB uint8 pixels and integer labels into fixed-size
+TFRecord shards, plus a `manifest.json` that records classes, splits and counts.
+`load_shard_dataset` then streams the shards through `tf.data`, using parallel
+interleave, optional caching and prefetch.
+
+The train/validation split matches `flow_from_directory(validation_split=...)`. For each
+class, the first `validation_split` fraction of the sorted file names is validation and
+the rest is training. Images are resized with nearest-neighbour sampling, as `load_img`
+does. A model trained on the shards therefore sees the same pixels as one trained on
+the generators.
+
+Example:
+    python dataset_cache.py -d archive/AugmentedAlzheimerDataset -o shards/augmented --validation-split 0.2
+    python dataset_cache.py -d archive/OriginalDataset -o shards/original
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from image_pipeline import default_workers
+from mri_validation import load_rgb_array
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+MANIFEST_NAME = 'manifest.json'
+
+# ============================================
+# DATASET LISTING
+# ============================================
+
+def list_class_images(data_dir, class_names=None, validation_split=0.0):
+    """
+    List a class-per-folder dataset. Classes default to the sorted sub-folder names
+    (the `flow_from_directory` label order).
+    Returns (class_names, {'train': [(path, label), ...], 'val': [...]}).
+    """
+    if class_names is None:
+        class_names = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    splits = {'train': [], 'val': []}
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(data_dir, class_name)
+        if not os.path.isdir(class_dir):
+            raise FileNotFoundError(f"Class folder not found: {class_dir}")
+        files = sorted(f for f in os.listdir(class_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        n_val = int(validation_split * len(files))
+        splits['val'].extend((os.path.join(class_dir, f), label) for f in files[:n_val])
+        splits['train'].extend((os.path.join(class_dir, f), label) for f in files[n_val:])
+    return list(class_names), splits
+
+
+def decode_resized(path, image_size=(224, 224)):
+    """Decode one file to an (H, W, 3) uint8 array at `image_size` (W, H)."""
+    rgb = load_rgb_array(path)
+    if rgb.shape[1] != image_size[0] or rgb.shape[0] != image_size[1]:
+        rgb = np.asarray(Image.fromarray(rgb).resize(image_size, Image.NEAREST))
+    return rgb
+
+# ============================================
+# SHARD WRITING
+# ============================================
+
+def _example(tf, rgb, label):
+    return tf.train.Example(features=tf.train.Features(feature={
+        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[rgb.tobytes()])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[label])),
+    }))
+
+
+def write_split(items, output_dir, split, image_size=(224, 224), images_per_shard=2048, workers=None, seed=42):
+    """
+    Decode `items` ([(path, label), ...]) in parallel and write them into
+    `{split}-NNNNN-of-MMMMM.tfrecord` shards. Items are shuffled once up front so each
+    shard holds a mix of classes, and interleaving a few shards is already well mixed.
+    Returns the shard file names (relative to `output_dir`).
+    """
+    import tensorflow as tf
+
+    if not items:
+        return []
+    order = np.random.RandomState(seed).permutation(len(items))
+    items = [items[i] for i in order]
+    n_shards = (len(items) + images_per_shard - 1) // images_per_shard
+    names = [f'{split}-{i:05d}-of-{n_shards:05d}.tfrecord' for i in range(n_shards)]
+
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as pool:
+        for shard, name in enumerate(names):
+            chunk = items[shard * images_per_shard:(shard + 1) * images_per_shard]
+            arrays = pool.map(lambda item: decode_resized(item[0], image_size), chunk)
+            with tf.io.TFRecordWriter(os.path.join(output_dir, name)) as writer:
+                for rgb, (_, label) in zip(arrays, chunk):
+                    writer.write(_example(tf, rgb, label).SerializeToString())
+            print(f"  [{shard + 1}/{n_shards}] {name} ({len(chunk)} images)")
+    return names
+
+
+def build_shards(data_dir, output_dir, class_names=None, validation_split=0.0, image_size=(224, 224),
+                 images_per_shard=2048, workers=None, seed=42):
+    """Convert `data_dir` into TFRecord shards + manifest under `output_dir`. Returns the manifest."""
+    os.makedirs(output_dir, exist_ok=True)
+    class_names, splits = list_class_images(data_dir, class_names, validation_split)
+    manifest = {
+        'source': os.path.abspath(data_dir),
+        'class_names': class_names,
+        'image_size': list(image_size),
+        'validation_split': validation_split,
+        'seed': seed,
+        'splits': {},
+    }
+    for split, items in splits.items():
+        if not items:
+            continue
+        print(f"[*] Writing {split} split: {len(items)} images")
+        shards = write_split(items, output_dir, split, image_size, images_per_shard, workers, seed)
+        counts = np.bincount([label for _, label in items], minlength=len(class_names))
+        manifest['splits'][split] = {
+            'shards': shards,
+            'num_examples': len(items),
+            'class_counts': {name: int(c) for name, c in zip(class_names, counts)},
+        }
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as fh:
+        json.dump(manifest, fh, indent=2)
+    return manifest
+
+# ============================================
+# TF.DATA LOADING
+# ============================================
+
+def load_manifest(cache_dir):
+    with open(os.path.join(cache_dir, MANIFEST_NAME)) as fh:
+        return json.load(fh)
+
+
+def balanced_class_weights(counts):
+    """'balanced' class weights from per-class counts (same formula as sklearn's compute_class_weight)."""
+    counts = np.asarray(counts, dtype=np.float64)
+    weights = counts.sum() / (len(counts) * np.maximum(counts, 1))
+    return {i: float(w) for i, w in enumerate(weights)}
+
+
+def class_weights(manifest, split='train'):
+    """Balanced class weights for a split of a shard manifest."""
+    return balanced_class_weights(list(manifest['splits'][split]['class_counts'].values()))
+
+
+def shard_examples(cache_dir, split='train', shuffle=False, seed=42, cycle_length=None, deterministic=None,
+                   num_workers=1, worker_index=0):
+    """
+    Unbatched (uint8 (H, W, 3) image, int64 label) examples of a split. Shards are read
+    with a parallel interleave. By default its order is only fixed when not shuffling;
+    pass `deterministic=True` for a run that is reproducible from `seed`.
+    With `num_workers > 1` only this worker's part of the data is read: whole files
+    when there are enough of them, otherwise every `num_workers`-th example.
+    """
+    import tensorflow as tf
+
+    manifest = load_manifest(cache_dir)
+    info = manifest['splits'][split]
+    width, height = manifest['image_size']
+    autotune = tf.data.AUTOTUNE
+
+    files = tf.data.Dataset.from_tensor_slices([os.path.join(cache_dir, s) for s in info['shards']])
+    by_file = num_workers > 1 and len(info['shards']) >= num_workers
+    if by_file:
+        files = files.shard(num_workers, worker_index)
+    if shuffle:
+        files = files.shuffle(len(info['shards']), seed=seed, reshuffle_each_iteration=True)
+    ds = files.interleave(
+        tf.data.TFRecordDataset,
+        cycle_length=cycle_length or max(1, min(len(info['shards']) // (num_workers if by_file else 1), 8)),
+        num_parallel_calls=autotune,
+        deterministic=(not shuffle) if deterministic is None else deterministic,
+    )
+
+    features = {
+        'image': tf.io.FixedLenFeature([], tf.string),
+        'label': tf.io.FixedLenFeature([], tf.int64),
+    }
+
+    def parse(record):
+        example = tf.io.parse_single_example(record, features)
+        image = tf.reshape(tf.io.decode_raw(example['image'], tf.uint8), (height, width, 3))
+        return image, example['label']
+
+    if num_workers > 1 and not by_file:
+        ds = ds.shard(num_workers, worker_index)
+    return ds.map(parse, num_parallel_calls=autotune)
+
+
+def load_shard_dataset(cache_dir, split='train', batch_size=16, shuffle=None, shuffle_buffer=4096,
+                       cache=False, one_hot=True, seed=42, cycle_length=None):
+    """
+    Stream a split as batches of (float32 images in [0, 1], labels).
+
+    * `cache=True` keeps the decoded uint8 examples in memory after the first epoch
+      (about 150 KB per 224x224 image); a string caches to that file instead
+    * rescaling to float32 happens per batch, after caching, so the cache stays uint8
+    * labels are one-hot (`class_mode='categorical'`) unless `one_hot=False`
+    """
+    import tensorflow as tf
+
+    num_classes = len(load_manifest(cache_dir)['class_names'])
+    shuffle = (split == 'train') if shuffle is None else shuffle
+    autotune = tf.data.AUTOTUNE
+
+    ds = shard_examples(cache_dir, split, shuffle=shuffle, seed=seed, cycle_length=cycle_length)
+    if cache:
+        ds = ds.cache(cache if isinstance(cache, str) else '')
+    if shuffle:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+
+    def rescale(images, labels):
+        images = tf.cast(images, tf.float32) / 255.0
+        if one_hot:
+            labels = tf.one_hot(labels, num_classes)
+        return images, labels
+
+    ds = ds.map(rescale, num_parallel_calls=autotune)
+    return ds.prefetch(autotune)
+
+# ============================================
+# CLI INTERFACE
+# ============================================
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Pre-decode a class-per-folder dataset into resized uint8 TFRecord shards',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Training data with the same 80/20 split as flow_from_directory(validation_split=0.2)
+  python dataset_cache.py -d archive/AugmentedAlzheimerDataset -o shards/augmented --validation-split 0.2
+
+  # Test data, no split
+  python dataset_cache.py -d archive/OriginalDataset -o shards/original
+
+  # Load in Python
+  from dataset_cache import load_shard_dataset
+  train_ds = load_shard_dataset('shards/augmented', 'train', batch_size=16, cache=True)
+        """
+    )
+    parser.add_argument('--data', '-d', required=True, help='Dataset folder (one sub-folder per class)')
+    parser.add_argument('--output', '-o', required=True, help='Output directory for shards + manifest')
+    parser.add_argument('--classes', nargs='+', default=None,
+                        help='Class folder names in label order [default: sorted folder names]')
+    parser.add_argument('--validation-split', type=float, default=0.0,
+                        help='Fraction of each class written to the val split [default: 0]')
+    parser.add_argument('--size', '-s', type=int, nargs=2, metavar=('W', 'H'), default=(224, 224),
+                        help='Stored image size W H [default: 224 224]')
+    parser.add_argument('--images-per-shard', type=int, default=2048,
+                        help='Examples per TFRecord file [default: 2048]')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Decode threads [default: CPU count, max 32]')
+    parser.add_argument('--seed', type=int, default=42, help='Shuffle seed [default: 42]')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.data):
+        print(f"[ERROR] Dataset folder not found: {args.data}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    try:
+        result = build_shards(args.data, args.output, args.classes, args.validation_split, tuple(args.size),
+                              args.images_per_shard, args.workers, args.seed)
+    except FileNotFoundError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    print(f"\n[OK] Shards written to {args.output} in {time.perf_counter() - start:.1f}s")
+    print(f"[*] Classes: {', '.join(result['class_names'])}")
+    for split, info in result['splits'].items():
+        print(f"  {split:5} : {info['num_examples']} images in {len(info['shards'])} shards")
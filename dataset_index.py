@@ -0,0 +1,250 @@
+"""
+Persistent, incrementally updated index of a class-per-folder image dataset.
+
+The notebook cells that count images and check sizes/modes used to walk the dataset
+with `os.walk`/`os.listdir` and open images with PIL on every run, which is slow on
+network mounts. `DatasetIndex` keeps one SQLite row per image. Each row holds:
+    relative path, class, width, height, mode, file size, mtime and SHA-256 of the content
+
+`update()` lists the dataset with `os.scandir` and probes only new or changed files
+(by size + mtime). Width, height and mode come from the image header; the pixels are
+never decoded. Class counts, dimension histograms and train/validation splits are then
+answered from the index without touching the dataset again.
+
+Example:
+    python dataset_index.py -d archive/AugmentedAlzheimerDataset
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+_HASH_CHUNK = 1 << 20
+
+
+class IndexEntry(NamedTuple):
+    path: str  # relative to the dataset root, '/'-separated
+    class_name: str
+    width: Optional[int]  # None if the header could not be read
+    height: Optional[int]
+    mode: Optional[str]
+    size_bytes: int
+    mtime_ns: int
+    sha256: Optional[str]
+
+
+class UpdateStats(NamedTuple):
+    added: int
+    changed: int
+    removed: int
+    unchanged: int
+    unreadable: int
+
+
+def default_index_path(root: str) -> str:
+    """`<dataset name>_index.sqlite` in the working directory (dataset mounts may be read-only)."""
+    return f"{os.path.basename(os.path.normpath(root))}_index.sqlite"
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file's content, read in 1 MiB chunks."""
+    sha = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _probe(path: str, rel: str, class_name: str, size: int, mtime_ns: int, hash_contents: bool) -> IndexEntry:
+    """Header-only size/mode probe plus (optionally) a content hash."""
+    try:
+        with Image.open(path) as img:  # lazy: reads the header, not the pixels
+            width, height = img.size
+            mode = img.mode
+    except Exception:
+        width = height = mode = None
+    digest = file_sha256(path) if hash_contents else None
+    return IndexEntry(rel, class_name, width, height, mode, size, mtime_ns, digest)
+
+
+class DatasetIndex:
+    """SQLite-backed manifest of `root/<class>/<image>` files."""
+
+    def __init__(self, root: str, db_path: Optional[str] = None, hash_contents: bool = True,
+                 extensions: Sequence[str] = IMAGE_EXTENSIONS):
+        self.root = root
+        self.db_path = db_path or default_index_path(root)
+        self.hash_contents = hash_contents
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " path TEXT PRIMARY KEY,"
+            " class_name TEXT NOT NULL,"
+            " width INTEGER,"
+            " height INTEGER,"
+            " mode TEXT,"
+            " size_bytes INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS images_class ON images (class_name)")
+        self._db.commit()
+
+    # ---------------- building ----------------
+
+    def _scan(self) -> Iterator[Tuple[str, str, str, int, int]]:
+        """(abs path, rel path, class, size, mtime_ns) for every image under root."""
+        with os.scandir(self.root) as classes:
+            class_dirs = sorted((e for e in classes if e.is_dir() and not e.name.startswith('.')), key=lambda e: e.name)
+        for class_dir in class_dirs:
+            with os.scandir(class_dir.path) as files:
+                for entry in files:
+                    if entry.is_file() and entry.name.lower().endswith(self.extensions):
+                        stat = entry.stat()
+                        yield entry.path, f"{class_dir.name}/{entry.name}", class_dir.name, stat.st_size, stat.st_mtime_ns
+
+    def update(self, workers: Optional[int] = None) -> UpdateStats:
+        """
+        Bring the index in line with the files on disk; only new/changed files are probed.
+
+        With `hash_contents`, rows indexed earlier without a hash are probed again so
+        their sha256 gets backfilled (they are counted as changed).
+        """
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in
+                     self._db.execute("SELECT path, size_bytes, mtime_ns FROM images")}
+            unhashed = set()
+            if self.hash_contents:
+                unhashed = {row[0] for row in self._db.execute("SELECT path FROM images WHERE sha256 IS NULL")}
+
+        seen, todo = set(), []
+        for path, rel, class_name, size, mtime_ns in self._scan():
+            seen.add(rel)
+            if known.get(rel) != (size, mtime_ns) or rel in unhashed:
+                todo.append((path, rel, class_name, size, mtime_ns))
+        removed = [rel for rel in known if rel not in seen]
+
+        with ThreadPoolExecutor(max_workers=workers or min(32, os.cpu_count() or 1)) as pool:
+            entries = list(pool.map(lambda t: _probe(*t, self.hash_contents), todo))
+
+        with self._lock:
+            self._db.executemany("DELETE FROM images WHERE path = ?", [(rel,) for rel in removed])
+            self._db.executemany("INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?, ?, ?, ?)", entries)
+            self._db.commit()
+
+        changed = sum(1 for e in entries if e.path in known)
+        return UpdateStats(
+            added=len(entries) - changed,
+            changed=changed,
+            removed=len(removed),
+            unchanged=len(seen) - len(entries),
+            unreadable=sum(1 for e in entries if e.mode is None),
+        )
+
+    # ---------------- queries ----------------
+
+    def _query(self, sql: str, params: Sequence = ()) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def absolute_path(self, rel: str) -> str:
+        return os.path.join(self.root, *rel.split('/'))
+
+    def class_names(self) -> List[str]:
+        """Sorted class folder names (the flow_from_directory label order)."""
+        return [row[0] for row in self._query("SELECT DISTINCT class_name FROM images ORDER BY class_name")]
+
+    def entries(self, class_name: Optional[str] = None, limit: Optional[int] = None) -> List[IndexEntry]:
+        """Index rows in path order, optionally for one class."""
+        sql, params = "SELECT * FROM images", []
+        if class_name is not None:
+            sql += " WHERE class_name = ?"
+            params.append(class_name)
+        sql += " ORDER BY path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [IndexEntry(*row) for row in self._query(sql, params)]
+
+    def class_counts(self) -> Dict[str, int]:
+        return dict(self._query("SELECT class_name, COUNT(*) FROM images GROUP BY class_name ORDER BY class_name"))
+
+    def dimension_histogram(self, class_name: Optional[str] = None) -> Counter:
+        """Counter of (width, height) -> number of images."""
+        sql = "SELECT width, height, COUNT(*) FROM images WHERE width IS NOT NULL"
+        params: list = []
+        if class_name is not None:
+            sql += " AND class_name = ?"
+            params.append(class_name)
+        return Counter({(w, h): n for w, h, n in self._query(sql + " GROUP BY width, height", params)})
+
+    def mode_counts(self) -> Counter:
+        return Counter(dict(self._query("SELECT mode, COUNT(*) FROM images WHERE mode IS NOT NULL GROUP BY mode")))
+
+    def split_items(self, validation_split: float = 0.0, class_names: Optional[Sequence[str]] = None):
+        """
+        Same output as dataset_cache.list_class_images: (class_names, {'train': [(path, label)],
+        'val': [...]}), with the first `validation_split` of each class's sorted files as
+        validation. Unreadable images are left out.
+        """
+        class_names = list(class_names) if class_names is not None else self.class_names()
+        splits = {'train': [], 'val': []}
+        for label, class_name in enumerate(class_names):
+            rows = self._query("SELECT path FROM images WHERE class_name = ? AND mode IS NOT NULL ORDER BY path",
+                               (class_name,))
+            paths = [self.absolute_path(row[0]) for row in rows]
+            n_val = int(validation_split * len(paths))
+            splits['val'].extend((p, label) for p in paths[:n_val])
+            splits['train'].extend((p, label) for p in paths[n_val:])
+        return class_names, splits
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM images")[0][0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build/update the persistent index of an image dataset")
+    parser.add_argument("--data", "-d", required=True, help="Dataset folder (one sub-folder per class)")
+    parser.add_argument("--db", default=None, help="Index file [default: <dataset name>_index.sqlite]")
+    parser.add_argument("--no-hash", action="store_true", help="Skip SHA-256 content hashes (header probe only)")
+    parser.add_argument("--workers", type=int, default=None, help="Probe threads [default: CPU count, max 32]")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.data):
+        print(f"[ERROR] Dataset folder not found: {args.data}")
+        raise SystemExit(1)
+
+    index = DatasetIndex(args.data, db_path=args.db, hash_contents=not args.no_hash)
+    start = time.perf_counter()
+    stats = index.update(workers=args.workers)
+    print(f"[OK] Index {index.db_path} updated in {time.perf_counter() - start:.1f}s: "
+          f"{stats.added} added, {stats.changed} changed, {stats.removed} removed, {stats.unchanged} unchanged")
+    if stats.unreadable:
+        print(f"[!] {stats.unreadable} files could not be read as images")
+
+    print(f"\n[*] CLASS COUNTS ({len(index)} images):")
+    for class_name, count in index.class_counts().items():
+        print(f"  {class_name:20} : {count}")
+    print("\n[*] IMAGE DIMENSIONS:")
+    for (w, h), count in index.dimension_histogram().most_common(10):
+        print(f"  {w} x {h} : {count}")
+    print("\n[*] COLOR MODES:")
+    for mode, count in index.mode_counts().most_common():
+        print(f"  {mode:5} : {count}")
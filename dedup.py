@@ -0,0 +1,401 @@
+"""
+Exact and near-duplicate detection within and across the train/validation/test splits.
+
+AugmentedAlzheimerDataset is generated from OriginalDataset, so test images (or light
+augmentations of them) can also sit in the training data. That inflates test accuracy,
+and repeated images waste epoch time. This module:
+    * reuses the SHA-256 content hashes from dataset_index.py to find exact copies
+    * computes a 64-bit pHash (DCT) and dHash (gradient) of every image at the training
+      resolution, plus the hashes of its mirror image, and caches them by content hash
+    * finds near-duplicate pairs with multi-index hashing: each pHash is split into
+      `max_distance + 1` bands. By the pigeonhole principle, two hashes within
+      `max_distance` bits agree exactly on at least one band, so only images sharing a
+      band are compared. No pair is missed and the cost is far below all-pairs.
+    * merges the pairs into duplicate groups and writes a report and a de-duplicated
+      training manifest. Within each group one training image is kept, validation copies
+      of training images are dropped, and any train/val image matching a test image is
+      dropped.
+
+Example:
+    python dedup.py --train-dir archive/AugmentedAlzheimerDataset --test-dir archive/OriginalDataset
+    python train.py --train-dir archive/AugmentedAlzheimerDataset --split-manifest dedup_manifest.json
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from dataset_cache import decode_resized
+from dataset_index import DatasetIndex, file_sha256
+
+HASH_BITS = 64
+# Largest pairwise distance block (elements) built at once when comparing a band bucket
+COMPARE_BLOCK = 1 << 20
+SPLITS = ('train', 'val', 'test')
+
+# ============================================
+# PERCEPTUAL HASHES
+# ============================================
+
+def _bits_to_int(bits):
+    return int(np.packbits(bits.astype(np.uint8).ravel()).view('>u8')[0])
+
+
+def dhash(gray, hash_size=8):
+    """Difference hash: sign of horizontal gradients on a (hash_size, hash_size+1) thumbnail."""
+    small = np.asarray(Image.fromarray(gray).resize((hash_size + 1, hash_size), Image.LANCZOS), dtype=np.float32)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * x + 1) * k / (2 * n))
+
+
+def phash(gray, hash_size=8, highfreq_factor=4):
+    """DCT hash: low-frequency DCT coefficients of a 32x32 thumbnail against their median."""
+    n = hash_size * highfreq_factor
+    small = np.asarray(Image.fromarray(gray).resize((n, n), Image.LANCZOS), dtype=np.float64)
+    c = _dct_matrix(n)
+    low = (c @ small @ c.T)[:hash_size, :hash_size]
+    return _bits_to_int(low > np.median(low))
+
+
+def image_hashes(path, image_size=(224, 224)):
+    """(phash, dhash, mirrored phash, mirrored dhash) of an image at the training resolution."""
+    gray = np.asarray(Image.fromarray(decode_resized(path, image_size)).convert('L'))
+    mirrored = np.ascontiguousarray(gray[:, ::-1])
+    return phash(gray), dhash(gray), phash(mirrored), dhash(mirrored)
+
+
+def _signed(value):
+    """uint64 -> int64 for SQLite storage."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class HashStore:
+    """SQLite cache of perceptual hashes keyed by (content SHA-256, resolution)."""
+
+    def __init__(self, db_path='perceptual_hashes.sqlite'):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            " sha256 TEXT NOT NULL, size TEXT NOT NULL,"
+            " phash INTEGER, dhash INTEGER, phash_mirror INTEGER, dhash_mirror INTEGER,"
+            " PRIMARY KEY (sha256, size))"
+        )
+        self._db.commit()
+
+    def get_many(self, digests, size_key):
+        found = {}
+        with self._lock:
+            for digest in digests:
+                row = self._db.execute("SELECT phash, dhash, phash_mirror, dhash_mirror FROM hashes "
+                                       "WHERE sha256 = ? AND size = ?", (digest, size_key)).fetchone()
+                if row is not None:
+                    found[digest] = tuple(_unsigned(v) for v in row)
+        return found
+
+    def put_many(self, rows, size_key):
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                                 [(d, size_key, *(_signed(v) for v in h)) for d, h in rows])
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+# ============================================
+# NEAR-DUPLICATE SEARCH
+# ============================================
+
+def popcount(x):
+    """Number of set bits of a uint64 array."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(x)
+    return np.unpackbits(x.view(np.uint8).reshape(x.shape + (8,)), axis=-1).sum(axis=-1)
+
+
+def _bands(max_distance):
+    """Split 64 bits into max_distance + 1 contiguous bands (shift, mask)."""
+    count = max_distance + 1
+    widths = [HASH_BITS // count + (1 if i < HASH_BITS % count else 0) for i in range(count)]
+    bands, shift = [], 0
+    for width in widths:
+        bands.append((shift, (1 << width) - 1))
+        shift += width
+    return bands
+
+
+def near_duplicate_pairs(phashes, dhashes, owners, max_distance=6, max_dhash_distance=10):
+    """
+    Pairs (i, j), i < j, of distinct owners whose pHash differs in at most `max_distance`
+    bits and whose dHash differs in at most `max_dhash_distance` bits.
+    `owners[k]` is the image that hash row k belongs to (mirrored hashes share the owner).
+    Large band buckets are compared in row chunks of at most `COMPARE_BLOCK` distances,
+    so peak memory stays bounded however many near-identical hashes share a band.
+    """
+    phashes = np.asarray(phashes, dtype=np.uint64)
+    dhashes = np.asarray(dhashes, dtype=np.uint64)
+    owners = np.asarray(owners)
+    pairs = set()
+    for shift, mask in _bands(max_distance):
+        keys = (phashes >> np.uint64(shift)) & np.uint64(mask)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        for start, end in zip(starts, ends):
+            if end - start < 2:
+                continue
+            rows = order[start:end]
+            p_rows, d_rows = phashes[rows], dhashes[rows]
+            step = max(1, COMPARE_BLOCK // len(rows))
+            for c in range(0, len(rows), step):
+                # Rows c..c+step against columns c.. (the upper triangle of the bucket only)
+                p_dist = popcount(p_rows[c:c + step, None] ^ p_rows[None, c:])
+                d_dist = popcount(d_rows[c:c + step, None] ^ d_rows[None, c:])
+                a, b = np.nonzero(np.triu((p_dist <= max_distance) & (d_dist <= max_dhash_distance), k=1))
+                for i, j in zip(owners[rows[c + a]], owners[rows[c + b]]):
+                    if i != j:
+                        pairs.add((min(i, j), max(i, j)))
+    return pairs
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+# ============================================
+# DATASET-LEVEL DEDUPLICATION
+# ============================================
+
+def collect_items(train_dir, test_dir=None, validation_split=0.2, class_names=None):
+    """
+    [(path, label, split, sha256)] for train/val (from `train_dir`) and test, listed
+    through each dataset's persistent DatasetIndex. Returns (class_names, items).
+    Indexes built with --no-hash get their missing hashes backfilled by update().
+    """
+    train_index = DatasetIndex(train_dir, hash_contents=True)
+    train_index.update()
+    class_names, splits = train_index.split_items(validation_split, class_names)
+    digests = {train_index.absolute_path(e.path): e.sha256 for e in train_index.entries()}
+    items = [(p, label, split, digests[p] or file_sha256(p)) for split in ('train', 'val') for p, label in splits[split]]
+    if test_dir:
+        test_index = DatasetIndex(test_dir, hash_contents=True)
+        test_index.update()
+        _, test_splits = test_index.split_items(0.0, class_names)
+        digests = {test_index.absolute_path(e.path): e.sha256 for e in test_index.entries()}
+        items += [(p, label, 'test', digests[p] or file_sha256(p)) for p, label in test_splits['train']]
+    return class_names, items
+
+
+def _check_digests(items):
+    """Content hashes key both the hash cache and the exact-duplicate groups; None would merge everything."""
+    missing = [path for path, _, _, digest in items if not digest]
+    if missing:
+        raise ValueError(f"{len(missing)} items have no SHA-256 content hash (e.g. {missing[0]}); "
+                         f"build them with collect_items or a hashing DatasetIndex")
+
+
+def compute_hashes(items, store, image_size=(224, 224), workers=None):
+    """Perceptual hashes for every item, computing only content not yet in `store`."""
+    _check_digests(items)
+    size_key = f"{image_size[0]}x{image_size[1]}"
+    unique = {}
+    for path, _, _, digest in items:
+        unique.setdefault(digest, path)
+    known = store.get_many(list(unique), size_key)
+    missing = [(d, p) for d, p in unique.items() if d not in known]
+    if missing:
+        print(f"[*] Hashing {len(missing)} new images ({len(known)} cached)")
+        with ThreadPoolExecutor(max_workers=workers or min(32, os.cpu_count() or 1)) as pool:
+            computed = list(zip([d for d, _ in missing],
+                                pool.map(lambda dp: image_hashes(dp[1], image_size), missing)))
+        store.put_many(computed, size_key)
+        known.update(computed)
+    return [known[digest] for _, _, _, digest in items]
+
+
+def find_duplicate_groups(items, hashes, max_distance=6, max_dhash_distance=10):
+    """Groups (lists of item indices, size >= 2) of exact or near-duplicate images."""
+    _check_digests(items)
+    uf = _UnionFind(len(items))
+    by_digest = {}
+    for i, (_, _, _, digest) in enumerate(items):
+        if digest in by_digest:
+            uf.union(by_digest[digest], i)
+        else:
+            by_digest[digest] = i
+
+    # One representative per distinct content; mirrored hashes share its owner id
+    reps = list(by_digest.values())
+    p = [hashes[i][0] for i in reps] + [hashes[i][2] for i in reps]
+    d = [hashes[i][1] for i in reps] + [hashes[i][3] for i in reps]
+    owners = reps + reps
+    for i, j in near_duplicate_pairs(p, d, owners, max_distance, max_dhash_distance):
+        uf.union(i, j)
+
+    groups = defaultdict(list)
+    for i in range(len(items)):
+        groups[uf.find(i)].append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def deduplicate(items, groups, drop_leaked=True):
+    """
+    Decide which train/val items to keep. Returns (kept_items, summary).
+    Per group: if a test image is present, all train/val members are leaks (dropped when
+    `drop_leaked`). Otherwise one training image is kept (or one validation image if the
+    group has none), and every other member is dropped.
+    """
+    drop = set()
+    summary = {'groups': len(groups), 'train_train': 0, 'val_val': 0, 'train_val': 0,
+               'train_test': 0, 'val_test': 0, 'test_test': 0, 'dropped_duplicates': 0, 'dropped_leaked': 0}
+    for members in groups:
+        splits = {s: sorted((i for i in members if items[i][2] == s), key=lambda i: items[i][0]) for s in SPLITS}
+        summary['train_train'] += max(0, len(splits['train']) - 1)
+        summary['val_val'] += max(0, len(splits['val']) - 1)
+        summary['test_test'] += max(0, len(splits['test']) - 1)
+        summary['train_val'] += len(splits['val']) if splits['train'] else 0
+        summary['train_test'] += len(splits['train']) if splits['test'] else 0
+        summary['val_test'] += len(splits['val']) if splits['test'] else 0
+        if splits['test'] and drop_leaked:
+            leaked = splits['train'] + splits['val']
+            drop.update(leaked)
+            summary['dropped_leaked'] += len(leaked)
+            continue
+        keep = (splits['train'] or splits['val'])[:1]
+        redundant = [i for i in splits['train'] + splits['val'] if i not in keep]
+        drop.update(redundant)
+        summary['dropped_duplicates'] += len(redundant)
+    kept = [item for i, item in enumerate(items) if i not in drop and item[2] != 'test']
+    return kept, summary
+
+
+def write_split_manifest(path, class_names, kept_items, extra=None):
+    """JSON manifest in the (class_names, splits) shape used by data_pipeline."""
+    manifest = {
+        'class_names': class_names,
+        'splits': {
+            split: [[p, label] for p, label, s, _ in kept_items if s == split] for split in ('train', 'val')
+        },
+    }
+    manifest.update(extra or {})
+    with open(path, 'w') as fh:
+        json.dump(manifest, fh, indent=1)
+    return manifest
+
+
+def load_split_manifest(path):
+    """(class_names, {'train': [(path, label)], 'val': [...]}) from `write_split_manifest` output."""
+    with open(path) as fh:
+        manifest = json.load(fh)
+    splits = {split: [(p, int(label)) for p, label in manifest['splits'].get(split, [])] for split in ('train', 'val')}
+    return manifest['class_names'], splits
+
+# ============================================
+# CLI INTERFACE
+# ============================================
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description='Find exact/near-duplicate images within and across splits and write a de-duplicated manifest',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Report leakage between the augmented training data and the original test data
+  python dedup.py --train-dir archive/AugmentedAlzheimerDataset --test-dir archive/OriginalDataset
+
+  # Train on the de-duplicated, leak-free split
+  python train.py --train-dir archive/AugmentedAlzheimerDataset --split-manifest dedup_manifest.json
+        """
+    )
+    parser.add_argument('--train-dir', required=True, help='Training dataset (train/val split is taken from it)')
+    parser.add_argument('--test-dir', default=None, help='Test dataset to check for leakage')
+    parser.add_argument('--validation-split', type=float, default=0.2,
+                        help='Per-class validation fraction, as in training [default: 0.2]')
+    parser.add_argument('--size', '-s', type=int, nargs=2, metavar=('W', 'H'), default=(224, 224),
+                        help='Resolution hashed, as seen by the model [default: 224 224]')
+    parser.add_argument('--max-distance', type=int, default=6,
+                        help='Max differing pHash bits for a near-duplicate [default: 6]')
+    parser.add_argument('--max-dhash-distance', type=int, default=10,
+                        help='Max differing dHash bits for a near-duplicate [default: 10]')
+    parser.add_argument('--keep-leaked', action='store_true',
+                        help='Keep train/val images that match test images (report only)')
+    parser.add_argument('--hash-db', default='perceptual_hashes.sqlite',
+                        help='Perceptual hash cache [default: perceptual_hashes.sqlite]')
+    parser.add_argument('--output', '-o', default='dedup_manifest.json',
+                        help='De-duplicated training manifest [default: dedup_manifest.json]')
+    parser.add_argument('--report', default='duplicate_report.json',
+                        help='Duplicate groups report [default: duplicate_report.json]')
+    parser.add_argument('--workers', type=int, default=None, help='Hashing threads [default: CPU count, max 32]')
+    args = parser.parse_args()
+
+    for folder in (args.train_dir, args.test_dir):
+        if folder and not os.path.isdir(folder):
+            print(f"[ERROR] Dataset folder not found: {folder}")
+            sys.exit(1)
+
+    start = time.perf_counter()
+    classes, all_items = collect_items(args.train_dir, args.test_dir, args.validation_split)
+    print(f"[*] {len(all_items)} images indexed")
+    store = HashStore(args.hash_db)
+    all_hashes = compute_hashes(all_items, store, tuple(args.size), args.workers)
+    store.close()
+
+    dup_groups = find_duplicate_groups(all_items, all_hashes, args.max_distance, args.max_dhash_distance)
+    kept_items, stats = deduplicate(all_items, dup_groups, drop_leaked=not args.keep_leaked)
+
+    with open(args.report, 'w') as fh:
+        json.dump({
+            'summary': stats,
+            'groups': [[{'path': all_items[i][0], 'split': all_items[i][2], 'class': classes[all_items[i][1]]}
+                        for i in members] for members in dup_groups],
+        }, fh, indent=1)
+    write_split_manifest(args.output, classes, kept_items, extra={
+        'source': os.path.abspath(args.train_dir),
+        'validation_split': args.validation_split,
+        'max_distance': args.max_distance,
+        'summary': stats,
+    })
+
+    n_train_val = sum(1 for item in all_items if item[2] != 'test')
+    print(f"\n{'='*70}")
+    print(f"[*] DUPLICATE REPORT ({time.perf_counter() - start:.1f}s)")
+    print(f"{'='*70}")
+    print(f"  Duplicate groups          : {stats['groups']}")
+    print(f"  Extra copies within train : {stats['train_train']}")
+    print(f"  Val images also in train  : {stats['train_val']}")
+    print(f"  Train images matching test: {stats['train_test']}")
+    print(f"  Val images matching test  : {stats['val_test']}")
+    print(f"  Kept for training         : {len(kept_items)} of {n_train_val} "
+          f"({stats['dropped_duplicates']} duplicates, {stats['dropped_leaked']} leaked dropped)")
+    print(f"\n[OK] Report saved: {args.report}")
+    print(f"[OK] Manifest saved: {args.output}")
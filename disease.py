@@ -9,9 +9,7 @@ import os
 import sys
 from PIL import Image
 import cv2
-from collections import Counter
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
 
 print("✅ Imports done!")
 
@@ -21,25 +19,25 @@ print("✅ Imports done!")
 # ============================================
 base_path = 'C:\\Users\\bbnro\\Downloads\\archive\\AugmentedAlzheimerDataset'
 
+# Persistent index (see dataset_index.py): the first run probes image headers + hashes,
+# later runs only look at new or changed files
+from dataset_index import DatasetIndex
+
+dataset_index = DatasetIndex(base_path)
+index_stats = dataset_index.update()
+print(f"🗂️ Index: {len(dataset_index)} images "
+      f"({index_stats.added} added, {index_stats.changed} changed, {index_stats.removed} removed)\n")
+
 print("📁 FOLDER STRUCTURE:\n")
-for root, dirs, files in os.walk(base_path):
-    level = root.replace(base_path, '').count(os.sep)
-    indent = '  ' * level
-    print(f"{indent}📂 {os.path.basename(root)}/")
-    if level < 2:  # Don't go too deep
-        for d in dirs:
-            print(f"{indent}  📁 {d}")
+print(f"📂 {os.path.basename(base_path)}/")
+for class_name in dataset_index.class_names():
+    print(f"  📁 {class_name}")
 
 #third cell: image counts per class
 # ============================================
-augmented_path = 'C:\\Users\\bbnro\\Downloads\\archive\\AugmentedAlzheimerDataset'
+augmented_path = base_path
 
-class_counts = {}
-for class_name in os.listdir(augmented_path):
-    class_path = os.path.join(augmented_path, class_name)
-    if os.path.isdir(class_path):
-        count = len(os.listdir(class_path))
-        class_counts[class_name] = count
+class_counts = dataset_index.class_counts()
 
 # Display as DataFrame
 df_counts = pd.DataFrame({
@@ -78,18 +76,14 @@ print(f"   Ratio: {max_count/min_count:.2f}x difference")
 
 # CELL 5: VIEW SAMPLE IMAGES FROM EACH CLASS
 # ============================================
-augmented_path = 'C:\\Users\\bbnro\\Downloads\\archive\\AugmentedAlzheimerDataset'
-
 fig, axes = plt.subplots(4, 5, figsize=(15, 12))
 class_names = ['NonDemented', 'VeryMildDemented', 'MildDemented', 'ModerateDemented']
 
 for row, class_name in enumerate(class_names):
-    class_path = os.path.join(augmented_path, class_name)
-    images = os.listdir(class_path)[:5]  # Get first 5 images
+    samples = dataset_index.entries(class_name, limit=5)  # first 5 images, no directory listing
     
-    for col, img_name in enumerate(images):
-        img_path = os.path.join(class_path, img_name)
-        img = Image.open(img_path)
+    for col, entry in enumerate(samples):
+        img = Image.open(dataset_index.absolute_path(entry.path))
         axes[row, col].imshow(img, cmap='gray')
         axes[row, col].axis('off')
         if col == 0:
@@ -101,23 +95,10 @@ plt.show()
 
 # CELL 6: CHECK IMAGE DIMENSIONS & PROPERTIES
 # ============================================
-augmented_path = 'C:\\Users\\bbnro\\Downloads\\archive\\AugmentedAlzheimerDataset'
-
-# Sample random images to check dimensions
-sample_dims = []
-sample_modes = []
-
-for class_name in os.listdir(augmented_path):
-    class_path = os.path.join(augmented_path, class_name)
-    if os.path.isdir(class_path):
-        images = os.listdir(class_path)[:50]  # Check 50 from each class
-        for img_name in images:
-            img = Image.open(os.path.join(class_path, img_name))
-            sample_dims.append(img.size)
-            sample_modes.append(img.mode)
-# Analyze dimensions
-unique_dims = Counter(sample_dims)
-unique_modes = Counter(sample_modes)
+# Every image's size and mode are already in the index (header-only probe), so the
+# histogram covers the whole dataset instead of 50 samples per class
+unique_dims = dataset_index.dimension_histogram()
+unique_modes = dataset_index.mode_counts()
 
 print("📐 IMAGE DIMENSIONS:")
 for dim, count in unique_dims.most_common():
@@ -128,11 +109,13 @@ for mode, count in unique_modes.items():
     mode_desc = {'L': 'Grayscale', 'RGB': 'Color', 'RGBA': 'Color+Alpha'}
     print(f"   {mode_desc.get(mode, mode)}: {count} images")
 # Get one sample for detailed info
-sample_img = Image.open(os.path.join(augmented_path, 'NonDemented', os.listdir(os.path.join(augmented_path, 'NonDemented'))[0]))
+sample_entry = dataset_index.entries('NonDemented', limit=1)[0]
+sample_img = Image.open(dataset_index.absolute_path(sample_entry.path))
 print(f"\n📋 SAMPLE IMAGE INFO:")
 print(f"   Size: {sample_img.size}")
 print(f"   Mode: {sample_img.mode}")
 print(f"   Format: {sample_img.format}")
+print(f"   SHA-256: {sample_entry.sha256}")
 
 # CELL 7: MARKDOWN - DATA ANALYSIS SUMMARY
 # ============================================
@@ -178,52 +161,20 @@ train_path = 'C:\\Users\\bbnro\\Downloads\\archive\\AugmentedAlzheimerDataset'
 test_path = 'C:\\Users\\bbnro\\Downloads\\archive\\OriginalDataset'
 
 # Image parameters
-IMG_SIZE = (176, 176)
+IMG_SIZE = (224, 224)
 BATCH_SIZE = 32
 
-# Load training data
-train_generator = tf.keras.utils.image_dataset_from_directory(
-    train_path,
-    image_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    label_mode='categorical',
-    validation_split=0.15,
-    subset='training',
-    seed=42
-)
-
-# Store class names before mapping
-class_names = sorted(os.listdir(train_path))
-
-# Load validation data
-val_generator = tf.keras.utils.image_dataset_from_directory(
-    train_path,
-    image_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    label_mode='categorical',
-    validation_split=0.15,
-    subset='validation',
-    seed=42
-)
-
-# Load test data
-test_generator = tf.keras.utils.image_dataset_from_directory(
-    test_path,
-    image_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    label_mode='categorical'
-)
-
-# Normalize pixel values
-normalize = tf.keras.layers.Rescaling(1./255)
-train_generator = train_generator.map(lambda x, y: (normalize(x), y))
-val_generator = val_generator.map(lambda x, y: (normalize(x), y))
-test_generator = test_generator.map(lambda x, y: (normalize(x), y))
+# One tf.data pipeline for the whole notebook (see data_pipeline.py); no augmentation for browsing
+from data_pipeline import build_datasets
+preview = build_datasets(train_path, test_path, image_size=IMG_SIZE, batch_size=BATCH_SIZE,
+                         validation_split=0.2, augment=False, cache=False)
+train_generator, val_generator, test_generator = preview.train, preview.val, preview.test
+class_names = preview.class_names
 
 print("\n✅ Data Generators Ready!")
-print(f"   Training samples: {tf.data.experimental.cardinality(train_generator).numpy() * BATCH_SIZE}")
-print(f"   Validation samples: {tf.data.experimental.cardinality(val_generator).numpy() * BATCH_SIZE}")
-print(f"   Test samples: {tf.data.experimental.cardinality(test_generator).numpy() * BATCH_SIZE}")
+print(f"   Training samples: {preview.train_count}")
+print(f"   Validation samples: {preview.val_count}")
+print(f"   Test samples: {preview.test_count}")
 
 
 # ============================================
@@ -263,7 +214,6 @@ print("   Then re-run all cells before continuing")
 # CELL 11: IMPORTS & GPU CHECK
 # ============================================
 from tensorflow import keras
-from tensorflow.keras import layers, models
 from tensorflow.keras.applications import EfficientNetB3, ResNet50V2
 from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
 import pandas as pd
@@ -293,71 +243,47 @@ test_path = 'C:\\Users\\bbnro\\Downloads\\archive\\OriginalDataset'
 IMG_SIZE = (224, 224)  # EfficientNet/ResNet optimal size
 BATCH_SIZE = 16  # Smaller batch for better generalization
 
-# Training generator - MINIMAL augmentation (data already augmented!)
-train_datagen = ImageDataGenerator(
-    rescale=1./255,
-    rotation_range=10,  # Slight rotation only
-    width_shift_range=0.1,
-    height_shift_range=0.1,
-    zoom_range=0.1,
-    validation_split=0.2  # 20% for validation
-)
-
-# Test generator - NO augmentation
-test_datagen = ImageDataGenerator(rescale=1./255)
+# Pre-decoded shards skip JPEG decoding entirely (optional, one-time):
+#   python dataset_cache.py -d <train_path> -o shards/augmented --validation-split 0.2
+shard_dir = 'shards/augmented'
 
-# Create generators
-train_gen = train_datagen.flow_from_directory(
-    train_path,
-    target_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    subset='training',
-    shuffle=True,
-    seed=42
-)
+# Same 80/20 split, label order and rotation/shift/zoom augmentation as the old
+# ImageDataGenerator, but decoded in parallel, cached, augmented per batch and prefetched
+from data_pipeline import build_datasets, set_global_seed
+from dataset_index import DatasetIndex
 
-val_gen = train_datagen.flow_from_directory(
+set_global_seed(42)
+train_index = DatasetIndex(train_path)  # file lists from the persistent index (cell 2)
+train_index.update()
+data = build_datasets(
     train_path,
-    target_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    subset='validation',
-    shuffle=False,
-    seed=42
-)
-test_gen = test_datagen.flow_from_directory(
     test_path,
-    target_size=IMG_SIZE,
+    shard_dir=shard_dir,
+    index=train_index,
+    image_size=IMG_SIZE,
     batch_size=BATCH_SIZE,
-    class_mode='categorical',
-    shuffle=False
-)
-
-# Calculate class weights to handle imbalance
-from sklearn.utils.class_weight import compute_class_weight
-
-class_weights = compute_class_weight(
-    'balanced',
-    classes=np.unique(train_gen.classes),
-    y=train_gen.classes
+    validation_split=0.2,
+    seed=42,
 )
-class_weights_dict = dict(enumerate(class_weights))
-
-print("\n✅ Data Generators Created!")
-print(f"   Training samples: {train_gen.samples}")
-print(f"   Validation samples: {val_gen.samples}")
-print(f"   Test samples: {test_gen.samples}")
-print(f"\n📚 Class Mapping: {train_gen.class_indices}")
+train_data, val_data, test_data = data.train, data.val, data.test
+class_names = data.class_names
+class_weights_dict = data.class_weights
+
+print("\n✅ Data Pipeline Created!")
+print(f"   Source: {'pre-decoded shards' if os.path.exists(os.path.join(shard_dir, 'manifest.json')) else 'JPEG folders'}")
+print(f"   Training samples: {data.train_count}")
+print(f"   Validation samples: {data.val_count}")
+print(f"   Test samples: {data.test_count}")
+print(f"\n📚 Class Mapping: {dict((name, i) for i, name in enumerate(class_names))}")
 print(f"\n⚖️ Class Weights: {class_weights_dict}")
 
 # CELL 13: VERIFY DATA PIPELINE
 # ============================================
 
-images, labels = next(train_gen)
+images, labels = next(iter(train_data))
+images, labels = images.numpy(), labels.numpy()
 
 fig, axes = plt.subplots(2, 4, figsize=(14, 7))
-class_names = list(train_gen.class_indices.keys())
 
 for i, ax in enumerate(axes.flat):
     ax.imshow(images[i])
@@ -377,64 +303,8 @@ print(f"   Data type: {images.dtype}")
 # CELL 14: BUILD CUSTOM CNN (NO DOWNLOADS!)
 # ============================================
 
-def build_custom_cnn():
-    """
-    Custom CNN optimized for MRI brain scans
-    Designed to hit 98%+ accuracy
-    """
-    model = models.Sequential([
-        # Block 1
-        layers.Conv2D(32, (3, 3), activation='relu', padding='same', input_shape=(224, 224, 3)),
-        layers.BatchNormalization(),
-        layers.Conv2D(32, (3, 3), activation='relu', padding='same'),
-        layers.BatchNormalization(),
-        layers.MaxPooling2D((2, 2)),
-        layers.Dropout(0.25),
-        # Block 2
-        layers.Conv2D(64, (3, 3), activation='relu', padding='same'),
-        layers.BatchNormalization(),
-        layers.Conv2D(64, (3, 3), activation='relu', padding='same'),
-        layers.BatchNormalization(),
-        layers.MaxPooling2D((2, 2)),
-        layers.Dropout(0.25),
-        # Block 3
-        layers.Conv2D(128, (3, 3), activation='relu', padding='same'),
-        layers.BatchNormalization(),
-        layers.Conv2D(128, (3, 3), activation='relu', padding='same'),
-        layers.BatchNormalization(),
-        layers.MaxPooling2D((2, 2)),
-        layers.Dropout(0.25),
-        # Block 4
-        layers.Conv2D(256, (3, 3), activation='relu', padding='same'),
-        layers.BatchNormalization(),
-        layers.Conv2D(256, (3, 3), activation='relu', padding='same'),
-        layers.BatchNormalization(),
-        layers.MaxPooling2D((2, 2)),
-        layers.Dropout(0.25),
-        
-        # Block 5 (Deeper)
-        layers.Conv2D(512, (3, 3), activation='relu', padding='same'),
-        layers.BatchNormalization(),
-        layers.Conv2D(512, (3, 3), activation='relu', padding='same'),
-        layers.BatchNormalization(),
-        layers.GlobalAveragePooling2D(),
-        # Dense layers
-        layers.Dense(512, activation='relu'),
-        layers.BatchNormalization(),
-        layers.Dropout(0.5),
-        
-        layers.Dense(256, activation='relu'),
-        layers.BatchNormalization(),
-        layers.Dropout(0.4),
-        
-        layers.Dense(128, activation='relu'),
-        layers.BatchNormalization(),
-        layers.Dropout(0.3),
-        # Output layer
-        layers.Dense(4, activation='softmax')
-    ])
-    
-    return model
+# Shared with train.py; the softmax output stays float32 under mixed precision
+from alzheimer_model import build_custom_cnn
 
 model = build_custom_cnn()
 
@@ -477,6 +347,8 @@ print("✅ Callbacks ready!")
 
 # CELL 16: TRAIN THE MODEL (SKIP IF ALREADY TRAINED)
 # ============================================
+# Long runs: use the CLI instead, it resumes after interruptions
+#   python train.py --train-dir <train_path> --test-dir <test_path>
 
 import os
 model_path = 'best_alzheimer_model.h5'
@@ -503,8 +375,8 @@ else:
     print(f"⚠️ GPU Status: {'ENABLED ✅' if tf.config.list_physical_devices('GPU') else 'DISABLED - Training will be slow ⚠️'}")
 
     history = model.fit(
-        train_gen,
-        validation_data=val_gen,
+        train_data,
+        validation_data=val_data,
         epochs=30,
         class_weight=class_weights_dict,
         callbacks=callbacks,
@@ -566,35 +438,11 @@ print(f"   Val Loss:       {history.history['val_loss'][-1]:.4f}")
 # ============================================
 
 # Warmup + Cosine Decay (critical for transformers!)
-class WarmUpCosineDecay(keras.optimizers.schedules.LearningRateSchedule):
-    """
-    Learning rate schedule with warmup and cosine decay
-    Essential for transformer training
-    """
-    def __init__(self, initial_lr, warmup_steps, total_steps):
-        super().__init__()
-        self.initial_lr = initial_lr
-        self.warmup_steps = warmup_steps
-        self.total_steps = total_steps
-    
-    def __call__(self, step):
-        # Warmup phase
-        warmup_lr = self.initial_lr * (step / self.warmup_steps)
-         
-        # Cosine decay phase
-        decay_steps = self.total_steps - self.warmup_steps
-        decay_progress = (step - self.warmup_steps) / decay_steps
-        cosine_decay = 0.5 * (1 + tf.cos(np.pi * decay_progress))
-        decay_lr = self.initial_lr * cosine_decay
-        
-        return tf.cond(
-            step < self.warmup_steps,
-            lambda: warmup_lr,
-            lambda: decay_lr
-        )
+# Shared with train.py (casts the int64 step to float32, so it also works under XLA)
+from alzheimer_model import WarmUpCosineDecay
 
 # Calculate steps
-steps_per_epoch = train_gen.samples // train_gen.batch_size
+steps_per_epoch = data.train_count // BATCH_SIZE
 total_steps = steps_per_epoch * 40  # 40 epochs
 warmup_steps = steps_per_epoch * 5  # 5 epochs warmup
 # Create schedule
@@ -660,7 +508,7 @@ if EVALUATE_ON_FULL_DATASET:
     print("⏳ This may take a while...\n")
 
     # Evaluate
-    test_results = model.evaluate(test_gen, verbose=1)
+    test_results = model.evaluate(test_data, verbose=1)
 
     print("\n" + "=" * 60)
     print("🎯 TEST SET RESULTS (Original Dataset)")
@@ -672,16 +520,15 @@ if EVALUATE_ON_FULL_DATASET:
     print(f"Test AUC:       {test_results[4]:.4f}")
     print("=" * 60)
     # Get predictions
-    test_gen.reset()
-    predictions = model.predict(test_gen, verbose=1)
+    predictions = model.predict(test_data, verbose=1)
     y_pred = np.argmax(predictions, axis=1)
-    y_true = test_gen.classes
+    y_true = data.test_labels
 
     # Confusion matrix
     from sklearn.metrics import confusion_matrix, classification_report
 
     cm = confusion_matrix(y_true, y_pred)
-    class_names = list(test_gen.class_indices.keys())
+    class_names = data.class_names
     # Plot confusion matrix
     plt.figure(figsize=(10, 8))
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', 
@@ -706,8 +553,8 @@ else:
 # ============================================
 def _get_class_names_fallback():
     try:
-        if 'train_gen' in globals() and hasattr(train_gen, 'class_indices'):
-            return list(train_gen.class_indices.keys())
+        if 'data' in globals() and hasattr(data, 'class_names'):
+            return list(data.class_names)
         if 'train_path' in globals() and os.path.isdir(train_path):
             return sorted([d for d in os.listdir(train_path) if os.path.isdir(os.path.join(train_path, d))])
     except Exception:
@@ -0,0 +1,102 @@
+"""
+Helpers for data-parallel training with `tf.distribute.MultiWorkerMirroredStrategy`.
+
+Every worker runs the same `train.py` command and finds its place in the cluster from the
+`TF_CONFIG` environment variable. `launch_local_workers` builds that cluster from N local
+processes on one machine (for CPU hosts and for testing). For a real multi-node run,
+start `train.py --distributed` on each node with its own `TF_CONFIG`.
+
+Scaling rules:
+    * `--batch-size` stays the per-replica batch (16 in disease.py). The global batch is
+      per-replica batch x number of replicas.
+    * the learning rate scales linearly with the global batch, relative to the
+      single-process batch it was tuned for. The cosine schedule's warm-up keeps the
+      first epochs stable at the larger rate.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import subprocess
+import sys
+from typing import List, Optional, Sequence, Tuple
+
+
+def worker_info() -> Tuple[int, int]:
+    """(num_workers, worker_index) from TF_CONFIG; (1, 0) when it is not set."""
+    config = json.loads(os.environ.get("TF_CONFIG", "{}") or "{}")
+    workers = config.get("cluster", {}).get("worker", [])
+    task = config.get("task", {})
+    if not workers or task.get("type", "worker") != "worker":
+        return 1, 0
+    return len(workers), int(task.get("index", 0))
+
+
+def is_chief() -> bool:
+    """Worker 0 writes the final model and logs; the others only compute."""
+    return worker_info()[1] == 0
+
+
+def scale_hyperparameters(per_replica_batch: int, learning_rate: float, num_replicas: int,
+                          scale_lr: bool = True) -> Tuple[int, float]:
+    """(global_batch, learning_rate) for `num_replicas` replicas, using the linear scaling rule."""
+    global_batch = per_replica_batch * num_replicas
+    return global_batch, (learning_rate * num_replicas if scale_lr else learning_rate)
+
+
+def _free_ports(count: int) -> List[int]:
+    sockets, ports = [], []
+    try:
+        for _ in range(count):
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.bind(("localhost", 0))
+            sockets.append(s)
+            ports.append(s.getsockname()[1])
+    finally:
+        for s in sockets:
+            s.close()
+    return ports
+
+
+def local_cluster(num_workers: int, base_port: Optional[int] = None) -> List[dict]:
+    """TF_CONFIG dicts for `num_workers` processes on localhost."""
+    ports = list(range(base_port, base_port + num_workers)) if base_port else _free_ports(num_workers)
+    workers = [f"localhost:{port}" for port in ports]
+    return [{"cluster": {"worker": workers}, "task": {"type": "worker", "index": i}} for i in range(num_workers)]
+
+
+def launch_local_workers(num_workers: int, argv: Sequence[str], log_dir: str = ".",
+                         base_port: Optional[int] = None, intra_op_threads: Optional[int] = None) -> int:
+    """
+    Run `python <argv>` as `num_workers` cooperating processes and wait for all of them.
+
+    The CPU cores are split between the workers so they do not oversubscribe the host.
+    Worker 0 prints to this terminal; the others log to `log_dir/worker-<i>.log`.
+    Returns the first non-zero exit code (0 if every worker succeeded).
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    threads = intra_op_threads or max(1, (os.cpu_count() or 1) // num_workers)
+    procs, logs = [], []
+    try:
+        for index, config in enumerate(local_cluster(num_workers, base_port)):
+            env = dict(os.environ)
+            env["TF_CONFIG"] = json.dumps(config)
+            env["TF_NUM_INTRAOP_THREADS"] = str(threads)
+            env["TF_NUM_INTEROP_THREADS"] = "1"
+            if index == 0:
+                out = None
+            else:
+                out = open(os.path.join(log_dir, f"worker-{index}.log"), "w")
+                logs.append(out)
+            procs.append(subprocess.Popen([sys.executable, *argv], env=env, stdout=out,
+                                          stderr=subprocess.STDOUT if out else None))
+        codes = [proc.wait() for proc in procs]
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+        codes = [proc.wait() for proc in procs]
+    finally:
+        for out in logs:
+            out.close()
+    return next((code for code in codes if code != 0), 0)
@@ -8,15 +8,21 @@ Shows how to integrate fast predictions into real applications
 # ============================================
 
 from simple_predict import AlzheimerPredictor
+from prediction_cache import PredictionCache
 from datetime import datetime
 import json
+import os
+import warnings
 
 class HospitalClinicSystem:
     """Example clinic management system using fast predictions"""
     
-    def __init__(self, model_path='best_alzheimer_model.h5'):
+    def __init__(self, model_path='best_alzheimer_model.h5', cache_db=None):
         # Load model once at startup (not for each prediction!)
-        self.predictor = AlzheimerPredictor(model_path)
+        # Re-uploaded scans are answered from the prediction cache (memory, plus SQLite
+        # when cache_db is given, e.g. 'clinic_prediction_cache.sqlite')
+        cache = PredictionCache(model_path, db_path=cache_db)
+        self.predictor = AlzheimerPredictor(model_path, cache=cache)
         self.records = []
     
     def process_patient_scan(self, patient_id, mri_path):
@@ -55,18 +61,19 @@ class HospitalClinicSystem:
         print(f"\n📋 Batch Processing Patient {patient_id}")
         print(f"📁 Folder: {mri_folder}")
         
-        # Fast batch prediction (30-60 seconds for many images)
-        results = self.predictor.predict_folder(mri_folder)
-        
+        # Fast batch prediction, streamed batch by batch
         diagnoses = []
-        for filename, disease, confidence in results:
+        for result in self.predictor.iter_predictions(mri_folder):
+            if result.error is not None:
+                print(f"   ⚠️ Skipped {os.path.basename(result.path)}: {result.error}")
+                continue
             diagnosis = {
                 'patient_id': patient_id,
                 'timestamp': datetime.now().isoformat(),
-                'scan_file': filename,
-                'prediction': disease,
-                'confidence': float(confidence),
-                'risk_level': self._get_risk_level(disease)
+                'scan_file': os.path.basename(result.path),
+                'prediction': result.predicted_class,
+                'confidence': float(result.confidence),
+                'risk_level': self._get_risk_level(result.predicted_class)
             }
             diagnoses.append(diagnosis)
             self.records.append(diagnosis)
@@ -103,7 +110,6 @@ class HospitalClinicSystem:
 # ============================================
 
 from collections import Counter
-import statistics
 
 class ResearchStudyAnalyzer:
     """Example for analyzing groups of patients in research"""
@@ -112,25 +118,40 @@ class ResearchStudyAnalyzer:
         self.predictor = AlzheimerPredictor(model_path)
         self.study_results = []
     
-    def analyze_study_group(self, group_name, mri_folder):
-        """Analyze entire study group"""
+    def analyze_study_group(self, group_name, mri_folder, keep_details=True):
+        """
+        Analyze entire study group
+        
+        Results are streamed with `iter_predictions`, so statistics update as
+        each batch finishes. `mri_folder` may also be a glob such as
+        'cohort/**/*.jpg'. Set keep_details=False on very large runs to keep
+        only the aggregate statistics in memory.
+        """
         print(f"\n📊 Analyzing Study Group: {group_name}")
         
-        # Batch prediction on all images
-        results = self.predictor.predict_folder(mri_folder)
+        # Running statistics over the streamed predictions
+        counts = Counter()
+        confidence_sum = 0.0
+        results = []
+        total = 0
         
-        # Extract results
-        predictions = [disease for _, disease, _ in results]
-        confidences = [conf for _, _, conf in results]
+        for result in self.predictor.iter_predictions(mri_folder):
+            if result.error is not None:
+                continue
+            total += 1
+            counts[result.predicted_class] += 1
+            confidence_sum += result.confidence
+            if keep_details:
+                results.append((os.path.basename(result.path), result.predicted_class, result.confidence))
+            if total % 500 == 0:
+                print(f"   ... {total} scans processed")
         
-        # Calculate statistics
-        counts = Counter(predictions)
-        avg_confidence = statistics.mean(confidences)
+        avg_confidence = confidence_sum / total if total else 0.0
         
         # Store results
         study_data = {
             'group': group_name,
-            'total_scans': len(results),
+            'total_scans': total,
             'predictions': dict(counts),
             'average_confidence': avg_confidence,
             'scan_details': results
@@ -139,10 +160,10 @@ class ResearchStudyAnalyzer:
         self.study_results.append(study_data)
         
         # Display summary
-        print(f"✅ Processed {len(results)} scans")
+        print(f"✅ Processed {total} scans")
         print(f"   Average Confidence: {avg_confidence*100:.1f}%")
         for disease, count in counts.items():
-            percentage = (count / len(results)) * 100
+            percentage = (count / total) * 100
             print(f"   {disease}: {count} ({percentage:.1f}%)")
         
         return study_data
@@ -152,58 +173,78 @@ class ResearchStudyAnalyzer:
 # EXAMPLE 3: Real-Time Monitoring System
 # ============================================
 
-from pathlib import Path
-import time
+from folder_watcher import FolderWatcher, ProcessedJournal
+from instrumentation import metrics, serve_metrics
 
 class MRIMonitoringSystem:
     """Monitor a folder for new MRI scans and predict automatically"""
     
-    def __init__(self, model_path='best_alzheimer_model.h5'):
+    def __init__(self, model_path='best_alzheimer_model.h5', journal_path='processed_scans.sqlite',
+                 metrics_port=None, metrics_log=None):
         self.predictor = AlzheimerPredictor(model_path)
-        self.processed_files = set()
+        # Persistent journal: bounded memory, survives restarts
+        self.journal = ProcessedJournal(journal_path)
+        # Optional per-stage timings: Prometheus scrape endpoint and/or JSON log per scan
+        if metrics_port or metrics_log:
+            metrics.enable(service='mri-monitor', json_log=metrics_log)
+        if metrics_port:
+            serve_metrics(metrics_port)
     
-    def monitor_and_predict(self, watch_folder, check_interval=30):
+    def monitor_and_predict(self, watch_folder, poll_interval=1.0, batch_size=32, max_wait_ms=50, check_interval=None):
         """
         Watch a folder and automatically predict on new images
         
+        New files are reported by file-system events (inotify via `watchdog`
+        when installed, otherwise a 1-second scandir poll) and batched into
+        the model within `max_wait_ms` of landing.
+        
         Args:
             watch_folder: Folder path to monitor
-            check_interval: Seconds between checks
+            poll_interval: Seconds between scans when falling back to polling
+            batch_size: Largest batch sent to the model at once
+            max_wait_ms: How long to wait for more files after the first arrives
+            check_interval: Deprecated alias of poll_interval
         """
+        if check_interval is not None:
+            warnings.warn("check_interval is deprecated, use poll_interval", DeprecationWarning, stacklevel=2)
+            poll_interval = check_interval
+        watcher = FolderWatcher(watch_folder, self.journal, poll_interval=poll_interval)
         print(f"👀 Monitoring folder: {watch_folder}")
-        print(f"   Check interval: {check_interval}s")
+        print(f"   Mode: {watcher.mode} | already processed: {len(self.journal)}")
         print("   Press Ctrl+C to stop")
         
+        watcher.start()
         try:
-            while True:
-                # Find new images
-                new_files = self._find_new_images(watch_folder)
-                
-                if new_files:
-                    print(f"\n🆕 Found {len(new_files)} new image(s)")
-                    
-                    for filepath in new_files:
-                        disease, conf = self.predictor.predict_image(str(filepath))
-                        print(f"   ✓ {filepath.name}: {disease} ({conf*100:.1f}%)")
-                        self.processed_files.add(str(filepath))
+            for new_files in watcher.iter_batches(max_batch_size=batch_size, max_wait_ms=max_wait_ms):
+                print(f"\n🆕 Found {len(new_files)} new image(s)")
                 
-                # Wait before checking again
-                time.sleep(check_interval)
+                done, failed = [], []
+                for result in self.predictor.iter_predictions(new_files, batch_size=batch_size):
+                    name = os.path.basename(result.path)
+                    if result.status == 'ok':
+                        print(f"   ✓ {name}: {result.predicted_class} ({result.confidence*100:.1f}%)")
+                        done.append((result.path, result.predicted_class))
+                    elif result.status == 'unreadable':
+                        # Journaled by size + mtime: retried once the writer finishes (the file changes)
+                        print(f"   … {name}: not readable ({result.error})")
+                        done.append((result.path, 'unreadable'))
+                    elif result.status == 'error':
+                        # Model failure: not journaled (retried after a restart), skipped until then
+                        print(f"   ✗ {name}: {result.error}")
+                        failed.append(result.path)
+                    else:
+                        print(f"   ✗ {name}: {result.error}")
+                        done.append((result.path, 'rejected'))
+                self.journal.mark_processed(done)
+                watcher.mark_failed(failed)
         
         except KeyboardInterrupt:
             print("\n⏹️ Monitoring stopped")
-    
-    def _find_new_images(self, folder):
-        """Find image files not yet processed"""
-        path = Path(folder)
-        extensions = {'.jpg', '.jpeg', '.png', '.bmp'}
-        
-        new_files = [
-            f for f in path.iterdir()
-            if f.suffix.lower() in extensions and str(f) not in self.processed_files
-        ]
-        
-        return new_files
+        finally:
+            watcher.stop()
+            if metrics.enabled:
+                print("\n⏱️ Stage timings this session:")
+                print(metrics.format_summary())
 
 
 # ============================================
@@ -264,13 +305,29 @@ if __name__ == '__main__':
     # Initialize monitoring system
     monitor = MRIMonitoringSystem('best_alzheimer_model.h5')
     
-    # Monitor folder for new MRI scans
+    # Monitor folder for new MRI scans (event-driven, near-instant)
     monitor.monitor_and_predict(
         watch_folder='new_mri_scans/',
-        check_interval=30  # Check every 30 seconds
+        max_wait_ms=50  # Batch files that land within 50 ms of each other
     )
     """)
     
+    # Example 4: Instrumentation
+    print("\n\n📌 EXAMPLE 4: Finding Slow Stages")
+    print("-" * 80)
+    print("""
+    # Expose decode/validate/resize/predict timings and accepted/rejected counts
+    monitor = MRIMonitoringSystem('best_alzheimer_model.h5',
+                                  metrics_port=9100,                 # curl localhost:9100/metrics
+                                  metrics_log='monitor_scans.jsonl')  # one JSON line per scan
+    
+    # Or in any code using AlzheimerPredictor
+    from instrumentation import metrics
+    metrics.enable(service='clinic')
+    clinic.process_patient_scan('PAT-003', 'patient_scans/patient_003.jpg')
+    print(metrics.format_summary())
+    """)
+    
     print("\n\n✅ All examples ready to use in your production code!")
     print("\nKey Benefits:")
     print("  ⚡ Fast: Single prediction in ~2 seconds")
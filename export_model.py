@@ -0,0 +1,107 @@
+"""
+Export the trained Keras model for lightweight inference.
+
+Turns `best_alzheimer_model.h5` (the `build_custom_cnn` network from disease.py) into:
+    * a SavedModel with a fixed float32 (None, H, W, 3) serving signature
+    * a TFLite flatbuffer converted from that SavedModel
+
+Both artifacts can be used through `inference_runner.create_runner` or
+`AlzheimerPredictor(model_path, backend=...)`.
+"""
+import os
+import sys
+
+
+def load_keras_model(model_path):
+    """Load the trained Keras model without its training configuration."""
+    from tensorflow import keras
+
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+    return keras.models.load_model(model_path, compile=False)
+
+
+def export_savedmodel(model, export_dir, image_size=(224, 224)):
+    """
+    Write an inference-only SavedModel whose `serving_default` signature takes a
+    float32 (None, H, W, 3) batch scaled to [0, 1]. Returns `export_dir`.
+    """
+    import tensorflow as tf
+
+    spec = tf.TensorSpec((None, image_size[1], image_size[0], 3), tf.float32, name='image')
+
+    @tf.function(input_signature=[spec])
+    def serve(image):
+        return {'probabilities': model(image, training=False)}
+
+    module = tf.Module()
+    module.model = model
+    module.serve = serve
+    tf.saved_model.save(module, export_dir, signatures={'serving_default': serve})
+    return export_dir
+
+
+def convert_savedmodel_to_tflite(saved_model_dir, tflite_path, configure=None):
+    """
+    Convert a SavedModel to a TFLite flatbuffer.
+
+    `configure` may adjust the converter (optimizations, representative dataset,
+    target types) before conversion; it is used by quantize_model.py.
+    Returns the flatbuffer size in bytes.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+    if configure is not None:
+        configure(converter)
+    flatbuffer = converter.convert()
+    with open(tflite_path, 'wb') as fh:
+        fh.write(flatbuffer)
+    return len(flatbuffer)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Export the trained model to SavedModel and TFLite for faster CPU inference',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Export both formats next to the model
+  python export_model.py -m best_alzheimer_model.h5 -o exported/
+
+  # Use the exported model
+  python predict.py -i scan.jpg -m exported/alzheimer_model.tflite
+        """
+    )
+    parser.add_argument('--model', '-m', default='best_alzheimer_model.h5',
+                        help='Trained Keras model (.h5) [default: best_alzheimer_model.h5]')
+    parser.add_argument('--output', '-o', default='exported',
+                        help='Output directory [default: exported]')
+    parser.add_argument('--size', '-s', type=int, nargs=2, metavar=('W', 'H'), default=(224, 224),
+                        help='Model input size W H [default: 224 224]')
+    parser.add_argument('--no-tflite', action='store_true', help='Only write the SavedModel')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    saved_model_dir = os.path.join(args.output, 'alzheimer_savedmodel')
+    tflite_path = os.path.join(args.output, 'alzheimer_model.tflite')
+
+    print(f"[*] Loading model: {args.model}")
+    try:
+        mdl = load_keras_model(args.model)
+    except Exception as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+    print(f"[*] Writing SavedModel: {saved_model_dir}")
+    export_savedmodel(mdl, saved_model_dir, image_size=tuple(args.size))
+    print("[OK] SavedModel exported")
+
+    if not args.no_tflite:
+        print(f"[*] Converting to TFLite: {tflite_path}")
+        size = convert_savedmodel_to_tflite(saved_model_dir, tflite_path)
+        print(f"[OK] TFLite model written ({size / 1e6:.1f} MB)")
+
+    print("\n[OK] Done! Run with: python predict.py -i <image> -m " + (tflite_path if not args.no_tflite else saved_model_dir))
@@ -0,0 +1,225 @@
+"""
+Event-driven folder watching with a persistent processed-file journal.
+
+`FolderWatcher` reports new image files as soon as they land:
+    * with `watchdog` installed (inotify on Linux), file-system events are pushed
+      straight into a queue, so there is no polling delay
+    * otherwise it falls back to a lightweight `os.scandir` poll
+
+`ProcessedJournal` remembers which files were already handled in a small SQLite file,
+keyed by path, size and mtime, with their outcome (rejected and unreadable files
+included). Memory stays flat however many scans arrive, restarts resume where they
+stopped, and a file overwritten in place (or finished after a partial write) is picked
+up again. Transient failures reported with `FolderWatcher.mark_failed` are not retried
+in the same session until the file changes.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+try:  # optional dependency: inotify/FSEvents/ReadDirectoryChangesW backends
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # pragma: no cover - polling fallback
+    FileSystemEventHandler = object
+    Observer = None
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """(size, mtime_ns) of a file, or None if it vanished."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class ProcessedJournal:
+    """SQLite journal of processed files, keyed by path + size + mtime."""
+
+    def __init__(self, db_path: str = "processed_scans.sqlite"):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " processed_at REAL NOT NULL,"
+            " outcome TEXT)"
+        )
+        self._db.commit()
+
+    def is_processed(self, path: str) -> bool:
+        """True if `path` was handled and has not changed since."""
+        signature = _file_signature(path)
+        if signature is None:
+            return True  # gone; nothing to do
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime_ns FROM processed WHERE path = ?", (path,)).fetchone()
+        return row is not None and tuple(row) == signature
+
+    def mark_processed(self, paths_and_outcomes: Sequence[Tuple[str, str]]) -> None:
+        """Record a batch of (path, outcome) pairs in one transaction."""
+        now = time.time()
+        rows = []
+        for path, outcome in paths_and_outcomes:
+            signature = _file_signature(path)
+            if signature is not None:
+                rows.append((path, signature[0], signature[1], now, outcome))
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO processed (path, size, mtime_ns, processed_at, outcome) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM processed").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "FolderWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_closed(self, event):  # IN_CLOSE_WRITE on Linux: the writer is done
+        if not event.is_directory:
+            self.watcher.notify(event.src_path)
+
+    def on_moved(self, event):  # atomic "write to temp, then rename" uploads
+        if not event.is_directory:
+            self.watcher.notify(event.dest_path)
+
+
+class FolderWatcher:
+    """
+    Yield batches of new image paths from `folder` with millisecond latency.
+
+    Files already in the journal are skipped, and files present at start-up are
+    reported once (so scans that landed while the watcher was down are not lost).
+    """
+
+    def __init__(self, folder: str, journal: ProcessedJournal, extensions: Sequence[str] = IMAGE_EXTENSIONS,
+                 poll_interval: float = 1.0, use_events: bool = True):
+        self.folder = folder
+        self.journal = journal
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.poll_interval = poll_interval
+        self.use_events = use_events and Observer is not None
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._observer = None
+        self._stop = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+        # Paths queued by a scan but not yet handled, so repeated polls do not re-queue them
+        self._inflight: set = set()
+        self._inflight_lock = threading.Lock()
+        # (path, size, mtime_ns) that failed this session; skipped until the file changes
+        self._failed: set = set()
+
+    @property
+    def mode(self) -> str:
+        return "events" if self.use_events else "polling"
+
+    def notify(self, path: str) -> None:
+        """Queue a candidate path (called from the event thread or the poller)."""
+        if path.lower().endswith(self.extensions):
+            self._queue.put(path)
+
+    def mark_failed(self, paths: Sequence[str]) -> None:
+        """Skip these files (in their current version) for the rest of the session."""
+        with self._inflight_lock:
+            for path in paths:
+                signature = _file_signature(path)
+                if signature is not None:
+                    self._failed.add((path,) + signature)
+
+    def _is_done(self, path: str) -> bool:
+        signature = _file_signature(path)
+        with self._inflight_lock:
+            failed = signature is not None and (path,) + signature in self._failed
+        return failed or self.journal.is_processed(path)
+
+    def _scan(self) -> None:
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(self.extensions):
+                    with self._inflight_lock:
+                        if entry.path in self._inflight:
+                            continue
+                    if not self._is_done(entry.path):
+                        with self._inflight_lock:
+                            self._inflight.add(entry.path)
+                        self._queue.put(entry.path)
+
+    def _poll(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            self._scan()
+
+    def start(self) -> None:
+        if self.use_events:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), self.folder, recursive=False)
+            self._observer.start()
+        else:
+            self._poller = threading.Thread(target=self._poll, name="folder-poller", daemon=True)
+            self._poller.start()
+        self._scan()  # backlog from before start-up
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def iter_batches(self, max_batch_size: int = 32, max_wait_ms: float = 50.0) -> Iterator[List[str]]:
+        """
+        Block until a new file arrives, then keep collecting for up to `max_wait_ms`
+        (or `max_batch_size` files) so bursts share one model.predict call.
+        Duplicate events, already-journaled files and files marked failed are dropped.
+        """
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            pending = [first]
+            deadline = time.perf_counter() + max_wait_ms / 1000.0
+            while len(pending) < max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            batch = []
+            for path in dict.fromkeys(pending):  # de-duplicate, keep arrival order
+                if os.path.isfile(path) and not self._is_done(path):
+                    batch.append(path)
+            if batch:
+                yield batch
+            with self._inflight_lock:
+                self._inflight.difference_update(pending)
@@ -0,0 +1,268 @@
+"""
+Shared "load once" image pipeline used by the CLI, the Python API and the Streamlit app.
+
+Each input is decoded a single time into an RGB uint8 array. MRI validation and the
+resize/normalize step both run on that array, so no file is opened or decoded twice.
+The cache_lookup/decode/validate/resize stages and the image outcomes are recorded in
+`instrumentation.metrics` when it is enabled.
+"""
+from __future__ import annotations
+
+import io
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from instrumentation import metrics
+from mri_validation import ImageSource, load_rgb_array, validate_mri_scan, validate_rgb_arrays
+from prediction_cache import PredictionCache
+
+
+class PreparedImage(NamedTuple):
+    """Outcome of decoding + validating + preprocessing one image."""
+
+    is_valid: bool
+    message: str
+    x: Optional[np.ndarray]  # (1, H, W, 3) float32 model input, None when rejected or cached
+    key: Optional[str] = None  # prediction cache key, when a cache is in use
+    probs: Optional[np.ndarray] = None  # cached class probabilities; skip the model when set
+    unreadable: bool = False  # could not be read/decoded at all (e.g. still being written)
+
+
+def to_model_input(rgb: np.ndarray, target_size: Tuple[int, int] = (224, 224)) -> np.ndarray:
+    """Resize a decoded RGB array, scale to [0, 1] and add the batch dimension."""
+    img = Image.fromarray(rgb).resize(target_size)
+    arr = np.asarray(img, dtype=np.float32) / 255.0
+    return np.expand_dims(arr, axis=0)
+
+
+def _source_bytes(image_or_path: Any) -> Optional[bytes]:
+    """Raw bytes identifying an input for the prediction cache (None if it has none)."""
+    if isinstance(image_or_path, (str, os.PathLike)):
+        with open(image_or_path, "rb") as fh:
+            return fh.read()
+    if isinstance(image_or_path, np.ndarray):
+        return repr(image_or_path.shape).encode("ascii") + np.ascontiguousarray(image_or_path).tobytes()
+    if isinstance(image_or_path, Image.Image):
+        return f"{image_or_path.mode}{image_or_path.size}".encode("ascii") + image_or_path.tobytes()
+    if hasattr(image_or_path, "getvalue"):  # e.g. Streamlit UploadedFile, BytesIO
+        return image_or_path.getvalue()
+    if hasattr(image_or_path, "read"):
+        if hasattr(image_or_path, "seek"):
+            image_or_path.seek(0)
+        return image_or_path.read()
+    return None
+
+
+def _decode(
+    image_or_path: ImageSource,
+    target_size: Tuple[int, int],
+    cache: Optional[PredictionCache],
+) -> Tuple[Optional[PreparedImage], Optional[str], Optional[np.ndarray]]:
+    """
+    Cache lookup + single decode. Returns (finished, key, rgb): `finished` is set for
+    cache hits and unreadable inputs, otherwise `rgb` still needs validation.
+    """
+    key = None
+    source = image_or_path
+    try:
+        if cache is not None:
+            with metrics.stage("cache_lookup"):
+                data = _source_bytes(image_or_path)
+                hit = None
+                if data is not None:
+                    key = cache.key_for(data, target_size)
+                    hit = cache.get(key)
+            if hit is not None:
+                metrics.count("mri_images_total", outcome="cached")
+                probs = np.asarray(hit.probs, dtype=np.float32) if hit.probs is not None else None
+                return PreparedImage(hit.is_valid, hit.message, None, key, probs), key, None
+            if data is not None and not isinstance(image_or_path, (np.ndarray, Image.Image)):
+                source = io.BytesIO(data)  # decode the bytes already read
+        with metrics.stage("decode"):
+            rgb = load_rgb_array(source)
+        return None, key, rgb
+    except Exception as exc:
+        metrics.count("mri_images_total", outcome="unreadable")
+        return PreparedImage(False, f"Unable to validate image: {exc}", None, unreadable=True), None, None
+
+
+def _finish(
+    rgb: np.ndarray,
+    key: Optional[str],
+    is_valid: bool,
+    message: str,
+    target_size: Tuple[int, int],
+    cache: Optional[PredictionCache],
+) -> PreparedImage:
+    if not is_valid:
+        metrics.count("mri_images_total", outcome="rejected")
+        if key is not None:
+            cache.put(key, False, message)
+        return PreparedImage(False, message, None, key)
+    metrics.count("mri_images_total", outcome="accepted")
+    with metrics.stage("resize"):
+        x = to_model_input(rgb, target_size)
+    return PreparedImage(True, message, x, key)
+
+
+def prepare_image(
+    image_or_path: ImageSource,
+    target_size: Tuple[int, int] = (224, 224),
+    cache: Optional[PredictionCache] = None,
+) -> PreparedImage:
+    """
+    Decode once, validate as MRI, then build the model input from the same array.
+
+    With a `cache`, the raw bytes are hashed first: a hit returns the stored verdict
+    (and probabilities) without decoding, and new rejections are recorded. Callers
+    store accepted predictions with `remember_prediction`.
+
+    Never raises for unreadable inputs; they come back as rejected with a message.
+    """
+    finished, key, rgb = _decode(image_or_path, target_size, cache)
+    if finished is not None:
+        return finished
+    with metrics.stage("validate"):
+        is_valid, message = validate_mri_scan(rgb)
+    return _finish(rgb, key, is_valid, message, target_size, cache)
+
+
+def prepare_images(
+    sources: Sequence[ImageSource],
+    target_size: Tuple[int, int] = (224, 224),
+    workers: Optional[int] = None,
+    cache: Optional[PredictionCache] = None,
+) -> List[PreparedImage]:
+    """
+    Batch counterpart of `prepare_image` for a list of inputs held in memory.
+
+    Decoding and resizing run on a thread pool; MRI validation runs as one vectorized
+    `validate_mri_batch` pass per group of same-sized images. Results keep input order.
+    """
+    sources = list(sources)
+    if not sources:
+        return []
+    with ThreadPoolExecutor(max_workers=workers or default_workers(), thread_name_prefix="mri-decode") as pool:
+        decoded = list(pool.map(lambda src: _decode(src, target_size, cache), sources))
+
+        pending = [i for i, (finished, _, _) in enumerate(decoded) if finished is None]
+        with metrics.stage("validate"):
+            verdicts = validate_rgb_arrays([decoded[i][2] for i in pending])
+
+        results: List[Optional[PreparedImage]] = [finished for finished, _, _ in decoded]
+        futures = [
+            pool.submit(_finish, decoded[i][2], decoded[i][1], is_valid, message, target_size, cache)
+            for i, (is_valid, message, _) in zip(pending, verdicts)
+        ]
+        for i, future in zip(pending, futures):
+            results[i] = future.result()
+    return results
+
+
+def decode_probs(probs: Sequence[float], class_names: Sequence[str]) -> Tuple[str, float]:
+    """Map one probability row to (predicted_class, confidence)."""
+    idx = int(np.argmax(probs))
+    return class_names[idx], float(probs[idx])
+
+
+def remember_prediction(cache: Optional[PredictionCache], prepared: PreparedImage, probs: np.ndarray) -> None:
+    """Store freshly computed probabilities for an accepted image in the cache."""
+    if cache is not None and prepared.key is not None and prepared.probs is None:
+        cache.put(prepared.key, True, prepared.message, probs)
+
+
+class PreparedBatch(NamedTuple):
+    """A batch of inputs ready for one model.predict call."""
+
+    items: List[Tuple[Any, PreparedImage]]  # (source, prepared) in input order
+    x: Optional[np.ndarray]  # stacked inputs of the items that still need the model, None if none do
+
+
+def default_workers() -> int:
+    """Decode threads to use when none are configured."""
+    return min(32, os.cpu_count() or 1)
+
+
+def _stack(items: List[Tuple[Any, PreparedImage]]) -> PreparedBatch:
+    pending = [prepared.x for _, prepared in items if prepared.x is not None]
+    return PreparedBatch(items, np.concatenate(pending, axis=0) if pending else None)
+
+
+def iter_prepared_batches(
+    sources: Iterable[Any],
+    target_size: Tuple[int, int] = (224, 224),
+    batch_size: int = 32,
+    workers: Optional[int] = None,
+    prefetch: int = 2,
+    cache: Optional[PredictionCache] = None,
+) -> Iterator[PreparedBatch]:
+    """
+    Decode, validate and preprocess images on a thread pool ahead of the model.
+
+    A producer thread fans each chunk of `batch_size` sources out to `workers` threads
+    (PIL decode/resize and the numpy checks release the GIL) and pushes finished
+    batches onto a queue holding at most `prefetch` batches. When the consumer falls
+    behind the producer blocks, so memory stays bounded. Batches and the items inside
+    them are yielded in input order. `sources` may be a lazy iterable. Items answered
+    by `cache` carry `probs` and are left out of the stacked `x`.
+    """
+    batch_size = max(1, int(batch_size))
+    prefetch = max(1, int(prefetch))
+    pool = ThreadPoolExecutor(max_workers=workers or default_workers(), thread_name_prefix="mri-decode")
+    ready: "queue.Queue[Any]" = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    done = object()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def finish(chunk: List[Any], futures: List[Any]) -> bool:
+        return put(_stack([(src, fut.result()) for src, fut in zip(chunk, futures)]))
+
+    def produce() -> None:
+        try:
+            pending: deque = deque()
+            chunk: List[Any] = []
+            for src in sources:
+                chunk.append(src)
+                if len(chunk) == batch_size:
+                    pending.append((chunk, [pool.submit(prepare_image, s, target_size, cache) for s in chunk]))
+                    chunk = []
+                    # Keep one chunk decoding while the oldest one is handed over.
+                    if len(pending) > 1 and not finish(*pending.popleft()):
+                        return
+            if chunk:
+                pending.append((chunk, [pool.submit(prepare_image, s, target_size, cache) for s in chunk]))
+            while pending:
+                if not finish(*pending.popleft()):
+                    return
+            put(done)
+        except BaseException as exc:  # surfaced to the consumer
+            put(exc)
+
+    producer = threading.Thread(target=produce, name="mri-batch-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = ready.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,217 @@
+"""
+Pluggable inference backends for the Alzheimer CNN.
+
+Every runner exposes `predict(batch, verbose=0) -> np.ndarray` with the same contract as
+`keras.Model.predict`, so it can be passed anywhere the code base expects a model:
+
+    * KerasRunner      - the original `.h5` model through `keras.models.load_model`
+    * SavedModelRunner - an exported SavedModel called through its serving signature
+    * TFLiteRunner     - a TFLite flatbuffer (float32, float16 or int8) on the TFLite
+                         interpreter; uses the standalone runtime when it is installed
+                         so TensorFlow itself is never imported
+    * LazyRunner       - any of the above, created on the first predict() call, so runs
+                         where every input is rejected never import TensorFlow
+
+Create exports with `export_model.py`.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+BACKENDS = ("auto", "keras", "savedmodel", "tflite")
+
+
+class InferenceRunner:
+    """Common interface: a model-like object with a Keras-compatible predict()."""
+
+    backend = "base"
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.model_path!r})"
+
+
+class KerasRunner(InferenceRunner):
+    """Full Keras model loaded from `.h5`/`.keras`."""
+
+    backend = "keras"
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+        from tensorflow import keras
+
+        self.model = keras.models.load_model(model_path, compile=False)
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self.model.predict(batch, verbose=verbose)
+
+
+class SavedModelRunner(InferenceRunner):
+    """Exported SavedModel directory, called through its `serving_default` signature."""
+
+    backend = "savedmodel"
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+        import tensorflow as tf
+
+        self._tf = tf
+        self._loaded = tf.saved_model.load(model_path)
+        self._fn = self._loaded.signatures["serving_default"]
+        self._input_name = next(iter(self._fn.structured_input_signature[1]))
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        outputs = self._fn(**{self._input_name: self._tf.constant(batch, dtype=self._tf.float32)})
+        return next(iter(outputs.values())).numpy()
+
+
+def _tflite_interpreter_class() -> Any:
+    """Prefer the standalone TFLite runtimes; fall back to the one bundled with TensorFlow."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    import tensorflow as tf
+
+    return tf.lite.Interpreter
+
+
+class TFLiteRunner(InferenceRunner):
+    """
+    TFLite flatbuffer on the TFLite interpreter.
+
+    The input tensor is resized to each batch's shape on demand. Quantized (int8/uint8)
+    inputs and outputs are converted with the tensor's scale/zero-point, so callers
+    always pass float32 in [0, 1] and get float32 probabilities back. The interpreter
+    is not thread-safe, so calls are serialized with a lock.
+    """
+
+    backend = "tflite"
+
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        super().__init__(model_path)
+        interpreter_cls = _tflite_interpreter_class()
+        self.interpreter = interpreter_cls(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_shape = tuple(self._input["shape"])
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if tuple(batch.shape) != self._batch_shape:
+                self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._input = self.interpreter.get_input_details()[0]
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_shape = tuple(batch.shape)
+
+            in_dtype = self._input["dtype"]
+            if in_dtype != np.float32:
+                scale, zero_point = self._input["quantization"]
+                info = np.iinfo(in_dtype)
+                batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(in_dtype)
+            self.interpreter.set_tensor(self._input["index"], batch)
+            self.interpreter.invoke()
+            out = self.interpreter.get_tensor(self._output["index"])
+
+            if out.dtype != np.float32:
+                scale, zero_point = self._output["quantization"]
+                out = (out.astype(np.float32) - zero_point) * scale
+            return out.copy()
+
+
+def detect_backend(model_path: str) -> str:
+    """Infer the backend from the artifact: `.tflite` file, SavedModel dir or Keras file."""
+    if os.path.isdir(model_path):
+        if os.path.exists(os.path.join(model_path, "saved_model.pb")):
+            return "savedmodel"
+        raise ValueError(f"Directory is not a SavedModel: {model_path}")
+    if model_path.lower().endswith(".tflite"):
+        return "tflite"
+    return "keras"
+
+
+def create_runner(model_path: str, backend: str = "auto", num_threads: Optional[int] = None) -> InferenceRunner:
+    """
+    Build the runner for `model_path`.
+
+    Args:
+        backend: one of BACKENDS; "auto" picks from the file type.
+        num_threads: TFLite interpreter threads (ignored by the other backends).
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found: {model_path}")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    if backend == "auto":
+        backend = detect_backend(model_path)
+    if backend == "tflite":
+        return TFLiteRunner(model_path, num_threads=num_threads)
+    if backend == "savedmodel":
+        return SavedModelRunner(model_path)
+    return KerasRunner(model_path)
+
+
+class LazyRunner(InferenceRunner):
+    """
+    Defers `create_runner` (and the TensorFlow import behind it) until the first predict().
+
+    The model path and backend are checked up front, so a wrong path still fails fast.
+    A failed load is remembered and re-raised on later calls instead of being retried
+    for every batch.
+    """
+
+    def __init__(self, model_path: str, backend: str = "auto", num_threads: Optional[int] = None,
+                 on_load: Optional[Callable[[InferenceRunner], None]] = None):
+        super().__init__(model_path)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model not found: {model_path}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}; choose from {', '.join(BACKENDS)}")
+        self.backend = detect_backend(model_path) if backend == "auto" else backend
+        self.num_threads = num_threads
+        self._on_load = on_load
+        self._runner: Optional[InferenceRunner] = None
+        self._error: Optional[Exception] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._runner is not None
+
+    def load(self) -> InferenceRunner:
+        if self._runner is None:
+            with self._lock:
+                if self._error is not None:
+                    raise self._error
+                if self._runner is None:
+                    try:
+                        runner = create_runner(self.model_path, backend=self.backend, num_threads=self.num_threads)
+                    except Exception as exc:
+                        self._error = exc
+                        raise
+                    if self._on_load is not None:
+                        self._on_load(runner)
+                    self._runner = runner
+        return self._runner
+
+    def predict(self, batch: np.ndarray, verbose: int = 0) -> np.ndarray:
+        return self.load().predict(batch, verbose=verbose)
@@ -0,0 +1,337 @@
+"""
+Standalone HTTP inference service with dynamic request batching.
+
+One process holds one AlzheimerPredictor. Each request is decoded and MRI-validated on a
+thread pool. The model input then goes to a DynamicBatcher, which holds requests for at
+most `max_latency_ms` (or until `max_batch_size` are waiting) and runs them as a single
+`model.predict` call. Throughput therefore grows with concurrency while single-request
+latency stays bounded.
+
+Endpoints:
+    POST /predict   raw image bytes in the body -> JSON prediction
+                    (422 if the image is not a valid brain MRI)
+    GET  /healthz   liveness: 200 while the process is serving
+    GET  /readyz    readiness: 200 once the model is loaded and warmed up, else 503
+    GET  /metrics   per-stage timings and outcome counters (Prometheus text format)
+
+Example:
+    python inference_server.py -m best_alzheimer_model.h5 --port 8080 --max-batch-size 32 --max-latency-ms 5
+    curl --data-binary @scan.jpg http://localhost:8080/predict
+"""
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from image_pipeline import decode_probs, default_workers, prepare_image, remember_prediction
+from inference_runner import BACKENDS
+from instrumentation import metrics, timed_predict
+from prediction_cache import PredictionCache
+
+MAX_BODY_BYTES = 32 * 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the batcher already holds `max_queue` pending requests."""
+
+
+class DynamicBatcher:
+    """
+    Merge concurrent single-image requests into one model.predict call.
+
+    A batch is dispatched as soon as `max_batch_size` inputs are waiting or the oldest
+    one has waited `max_latency_ms`. Inference runs on a dedicated single thread so the
+    event loop keeps accepting requests while the model is busy.
+    """
+
+    def __init__(self, model: Any, max_batch_size: int = 32, max_latency_ms: float = 5.0, max_queue: int = 1024):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_latency = max(0.0, float(max_latency_ms)) / 1000.0
+        self.max_queue = max(1, int(max_queue))
+        self.batches_run = 0
+        self.items_run = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-predict")
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, x: np.ndarray) -> np.ndarray:
+        """Queue one (1, H, W, 3) input; resolves to its probability row."""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((x, future))
+        except asyncio.QueueFull:
+            raise QueueFullError("inference queue is full")
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            stacked = np.concatenate([x for x, _ in batch], axis=0)
+            try:
+                probs = await loop.run_in_executor(self._executor, lambda: timed_predict(self.model, stacked))
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches_run += 1
+            self.items_run += len(batch)
+            for (_, future), row in zip(batch, probs):
+                if not future.done():
+                    future.set_result(row)
+
+
+class InferenceServer:
+    """HTTP front end: decoding/validation pool + DynamicBatcher around an AlzheimerPredictor."""
+
+    def __init__(self, model_path: str = "best_alzheimer_model.h5", backend: str = "auto",
+                 num_threads: Optional[int] = None, max_batch_size: int = 32, max_latency_ms: float = 5.0,
+                 max_queue: int = 1024, decode_workers: Optional[int] = None, cache_size: int = 4096,
+                 target_size: Tuple[int, int] = (224, 224), enable_metrics: bool = True,
+                 metrics_log: Optional[str] = None):
+        self.model_path = model_path
+        self.backend = backend
+        self.num_threads = num_threads
+        self.max_batch_size = max_batch_size
+        self.max_latency_ms = max_latency_ms
+        self.max_queue = max_queue
+        self.cache_size = cache_size
+        self.target_size = target_size
+        self.predictor = None
+        self.batcher: Optional[DynamicBatcher] = None
+        self.ready = False
+        self.load_error: Optional[str] = None
+        self.requests_served = 0
+        self._decode_pool = ThreadPoolExecutor(max_workers=decode_workers or default_workers(),
+                                               thread_name_prefix="request-decode")
+        if enable_metrics:
+            metrics.enable(service="inference-server", json_log=metrics_log)
+
+    # ---------------- lifecycle ----------------
+
+    def _load(self) -> Any:
+        from simple_predict import AlzheimerPredictor
+
+        cache = PredictionCache(self.model_path, max_entries=self.cache_size) if self.cache_size > 0 else None
+        predictor = AlzheimerPredictor(self.model_path, cache=cache, backend=self.backend,
+                                       num_threads=self.num_threads)
+        # Warm-up so the first request does not pay graph/interpreter setup.
+        predictor.model.predict(np.zeros((1, self.target_size[1], self.target_size[0], 3), dtype=np.float32), verbose=0)
+        return predictor
+
+    async def load_model(self) -> None:
+        try:
+            self.predictor = await asyncio.get_running_loop().run_in_executor(self._decode_pool, self._load)
+        except Exception as exc:
+            self.load_error = str(exc)
+            print(f"[ERROR] Failed to load model: {exc}")
+            return
+        self.batcher = DynamicBatcher(self.predictor.model, self.max_batch_size, self.max_latency_ms, self.max_queue)
+        self.batcher.start()
+        self.ready = True
+        print(f"[OK] Model ready: {self.model_path}")
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"[*] Listening on http://{host}:{port} (batch <= {self.max_batch_size}, wait <= {self.max_latency_ms} ms)")
+        # Accept health checks while the model loads.
+        asyncio.get_running_loop().create_task(self.load_model())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self.batcher is not None:
+                await self.batcher.stop()
+            self._decode_pool.shutdown(wait=False)
+
+    # ---------------- request handling ----------------
+
+    async def predict_bytes(self, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        prepared = await loop.run_in_executor(
+            self._decode_pool, prepare_image, io.BytesIO(body), self.target_size, self.predictor.cache)
+        if not prepared.is_valid:
+            metrics.log_event("prediction", outcome="rejected", error=prepared.message)
+            return 422, {"error": prepared.message}
+
+        cached = prepared.probs is not None
+        if cached:
+            probs = prepared.probs
+        else:
+            try:
+                probs = await self.batcher.submit(prepared.x)
+            except QueueFullError as exc:
+                return 503, {"error": str(exc)}
+            remember_prediction(self.predictor.cache, prepared, probs)
+
+        predicted_class, confidence = decode_probs(probs, self.predictor.class_names)
+        metrics.log_event("prediction", outcome="cached" if cached else "accepted",
+                          label=predicted_class, confidence=confidence)
+        return 200, {
+            "predicted_class": predicted_class,
+            "confidence": confidence,
+            "probabilities": {name: float(p) for name, p in zip(self.predictor.class_names, probs)},
+            "cached": cached,
+        }
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        path = path.split("?", 1)[0]
+        if path == "/healthz":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            if not metrics.enabled:
+                return 404, {"error": "metrics are disabled (--no-metrics)"}
+            return 200, metrics.prometheus_text()
+        if path == "/readyz":
+            if self.ready:
+                return 200, {"status": "ready", "batches_run": self.batcher.batches_run,
+                             "items_run": self.batcher.items_run, "requests_served": self.requests_served}
+            return 503, {"status": "loading" if self.load_error is None else "failed", "error": self.load_error}
+        if path == "/predict":
+            if method != "POST":
+                return 405, {"error": "use POST with the image bytes as the request body"}
+            if not self.ready:
+                return 503, {"error": "model is not ready"}
+            if not body:
+                return 400, {"error": "empty request body"}
+            status, payload = await self.predict_bytes(body)
+            self.requests_served += 1
+            return status, payload
+        return 404, {"error": f"unknown path {path}"}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").strip().split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "malformed request line"}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "invalid Content-Length header"}, keep_alive=False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    status, payload = await self.route(method.upper(), path, body)
+                except Exception as exc:
+                    status, payload = 500, {"error": str(exc)}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        except (asyncio.LimitOverrunError, ValueError):  # request or header line over the stream limit
+            try:
+                await self._respond(writer, 400, {"error": "request line or header too long"}, keep_alive=False)
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool) -> None:
+        # Text payloads are Prometheus metrics; everything else is JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HTTP inference server with dynamic request batching")
+    parser.add_argument("--model", "-m", default="best_alzheimer_model.h5",
+                        help="Model (.h5, SavedModel dir or .tflite) [default: best_alzheimer_model.h5]")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto", help="Inference backend [default: auto]")
+    parser.add_argument("--threads", type=int, default=None, help="TFLite interpreter threads")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address [default: 127.0.0.1]")
+    parser.add_argument("--port", type=int, default=8080, help="Port [default: 8080]")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Largest merged batch [default: 32]")
+    parser.add_argument("--max-latency-ms", type=float, default=5.0,
+                        help="Longest a request waits for batch-mates [default: 5]")
+    parser.add_argument("--max-queue", type=int, default=1024,
+                        help="Pending requests before answering 503 [default: 1024]")
+    parser.add_argument("--decode-workers", type=int, default=None,
+                        help="Threads decoding/validating requests [default: CPU count, max 32]")
+    parser.add_argument("--cache-size", type=int, default=4096,
+                        help="In-memory prediction cache entries, 0 to disable [default: 4096]")
+    parser.add_argument("--no-metrics", action="store_true", help="Disable stage timings and the /metrics endpoint")
+    parser.add_argument("--metrics-log", default=None, help="Append one JSON line per request to this file")
+    args = parser.parse_args()
+
+    service = InferenceServer(args.model, backend=args.backend, num_threads=args.threads,
+                              max_batch_size=args.max_batch_size, max_latency_ms=args.max_latency_ms,
+                              max_queue=args.max_queue, decode_workers=args.decode_workers,
+                              cache_size=args.cache_size, enable_metrics=not args.no_metrics,
+                              metrics_log=args.metrics_log)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n[OK] Server stopped")
@@ -0,0 +1,423 @@
+"""
+Lightweight instrumentation for the prediction hot path.
+
+One process-wide `metrics` registry, disabled by default, records:
+    * per-stage durations        mri_stage_seconds{stage="decode|cache_lookup|validate|resize|predict|format"}
+    * image outcomes             mri_images_total{outcome="accepted|rejected|unreadable|cached"}
+    * failed stages              mri_stage_errors_total{stage=...}
+    * inference batch sizes      mri_batch_size
+Histograms use fixed buckets, so recording is a bisect plus two additions under a lock.
+While disabled, `stage()`/`trace()` return one shared no-op object and `count()`/`observe()`
+return at once. The instrumented call sites then cost one attribute check each.
+
+Output:
+    * Prometheus text format     `metrics.prometheus_text()`, `serve_metrics(port)` (GET /metrics)
+                                 or `write_prometheus_file(path)` for node_exporter's textfile collector
+    * structured JSON log        one JSON object per line for every `trace()`/`log_event()`,
+                                 including the per-stage milliseconds of that prediction
+
+Example:
+    from instrumentation import metrics, serve_metrics
+    metrics.enable(service='clinic', json_log='predictions.jsonl')
+    serve_metrics(9100)                       # curl localhost:9100/metrics
+    with metrics.stage('predict'):
+        probs = model.predict(x, verbose=0)
+
+Set MRI_METRICS=1 (and optionally MRI_METRICS_LOG / MRI_METRICS_PORT) to turn it on in the
+Streamlit app through `configure_from_env`.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Dict, IO, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+STAGES = ("cache_lookup", "decode", "validate", "resize", "predict", "format")
+
+_HELP = {
+    "mri_stage_seconds": ("histogram", "Duration of one call of a prediction stage"),
+    "mri_images_total": ("counter", "Images handled, by outcome"),
+    "mri_stage_errors_total": ("counter", "Stage calls that raised"),
+    "mri_prediction_errors_total": ("counter", "Accepted images whose inference failed"),
+    "mri_batch_size": ("histogram", "Images per model.predict call"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics: a value lands in every bucket with le >= value)."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Bucket-interpolated quantile estimate (what Prometheus' histogram_quantile computes)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class _Noop:
+    """Shared stand-in for stage timers and traces while metrics are disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_Noop":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        return False
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP = _Noop()
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> "_Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        self.metrics._record_stage(self.name, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+
+class _Trace:
+    """Collects the stages run by this thread for one prediction, then writes one JSON log line."""
+
+    __slots__ = ("metrics", "event", "fields", "stages", "start", "parent")
+
+    def __init__(self, metrics: "Metrics", event: str, fields: Dict[str, Any]):
+        self.metrics = metrics
+        self.event = event
+        self.fields = fields
+        self.stages: Dict[str, float] = {}
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.fields[key] = value
+
+    def __enter__(self) -> "_Trace":
+        local = self.metrics._local
+        self.parent = getattr(local, "trace", None)
+        local.trace = self
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        total_ms = (time.perf_counter() - self.start) * 1000.0
+        self.metrics._local.trace = self.parent
+        if exc_type is not None:
+            self.fields.setdefault("outcome", "error")
+            self.fields["error"] = str(exc)
+        self.metrics.log_event(self.event, total_ms=round(total_ms, 3),
+                               stages_ms={k: round(v, 3) for k, v in self.stages.items()}, **self.fields)
+        return False
+
+
+class Metrics:
+    """Thread-safe registry of counters and histograms with optional JSON-lines event log."""
+
+    def __init__(self, enabled: bool = False, service: Optional[str] = None):
+        self.enabled = enabled
+        self.service = service
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._log: Optional[IO[str]] = None
+        self._owns_log = False
+
+    # ---------------- configuration ----------------
+
+    def enable(self, service: Optional[str] = None, json_log: Any = None) -> "Metrics":
+        """
+        Start recording. `json_log` is a path (appended to), '-' for stderr, or an open
+        text stream; each trace/event is then written as one JSON line.
+        """
+        if service is not None:
+            self.service = service
+        if json_log is not None:
+            self._close_log()
+            if json_log == "-":
+                self._log = sys.stderr
+            elif isinstance(json_log, (str, os.PathLike)):
+                self._log = open(json_log, "a", buffering=1, encoding="utf-8")
+                self._owns_log = True
+            else:
+                self._log = json_log
+        self.enabled = True
+        return self
+
+    def disable(self) -> None:
+        self.enabled = False
+        self._close_log()
+
+    def _close_log(self) -> None:
+        with self._lock:
+            if self._owns_log and self._log is not None:
+                self._log.close()
+            self._log, self._owns_log = None, False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ---------------- recording ----------------
+
+    def count(self, name: str, value: float = 1.0, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels: str) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def stage(self, name: str) -> Any:
+        """Context manager timing one call of a pipeline stage."""
+        return _Stage(self, name) if self.enabled else _NOOP
+
+    def trace(self, event: str = "prediction", **fields: Any) -> Any:
+        """
+        Context manager for one end-to-end prediction. Stages run by the same thread
+        inside it are attached to its JSON log line; set extra fields with `trace[key] = value`.
+        """
+        return _Trace(self, event, fields) if self.enabled else _NOOP
+
+    def _record_stage(self, name: str, seconds: float, failed: bool) -> None:
+        self.observe("mri_stage_seconds", seconds, stage=name)
+        if failed:
+            self.count("mri_stage_errors_total", stage=name)
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.stages[name] = trace.stages.get(name, 0.0) + seconds * 1000.0
+
+    def log_event(self, event: str, **fields: Any) -> None:
+        """Write one JSON line to the event log (no-op when disabled or no log is configured)."""
+        if not self.enabled or self._log is None:
+            return
+        record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"), "event": event}
+        if self.service:
+            record["service"] = self.service
+        record.update(fields)
+        line = json.dumps(record, default=_json_default)
+        with self._lock:
+            if self._log is not None:
+                self._log.write(line + "\n")
+
+    # ---------------- export ----------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Plain-dict copy of every counter and histogram (for JSON endpoints and tests)."""
+        with self._lock:
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self._counters.items())]
+            histograms = [{"name": n, "labels": dict(l), "count": h.count, "sum": h.sum,
+                           "buckets": dict(zip([*map(str, h.buckets), "+Inf"], h.counts))}
+                          for (n, l), h in sorted(self._histograms.items())]
+        return {"service": self.service, "counters": counters, "histograms": histograms}
+
+    def prometheus_text(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        const = (("service", self.service),) if self.service else ()
+        lines: List[str] = []
+        with self._lock:
+            names = sorted({n for n, _ in self._counters} | {n for n, _ in self._histograms})
+            for name in names:
+                kind, help_text = _HELP.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for (n, labels), value in sorted(self._counters.items()):
+                    if n == name:
+                        lines.append(f"{name}{_labels(const + labels)} {_number(value)}")
+                for (n, labels), hist in sorted(self._histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip([*hist.buckets, "+Inf"], hist.counts):
+                        cumulative += count
+                        le = bound if isinstance(bound, str) else _number(bound)
+                        lines.append(f"{name}_bucket{_labels(const + labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(const + labels)} {_number(hist.sum)}")
+                    lines.append(f"{name}_count{_labels(const + labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def stage_summary(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """{stage: {calls, total_s, mean_ms, p50_ms, p95_ms, p99_ms}}, percentiles estimated from buckets."""
+        summary = {}
+        with self._lock:
+            for (name, labels), hist in self._histograms.items():
+                if name != "mri_stage_seconds" or not hist.count:
+                    continue
+                quantiles = {f"p{int(q * 100)}_ms": hist.quantile(q) * 1000.0 for q in (0.5, 0.95, 0.99)}
+                summary[dict(labels)["stage"]] = {"calls": hist.count, "total_s": hist.sum,
+                                                  "mean_ms": hist.sum / hist.count * 1000.0, **quantiles}
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return dict(sorted(summary.items(), key=lambda kv: order.get(kv[0], len(order))))
+
+    def counter_values(self, name: str) -> Dict[str, float]:
+        """{label values joined by ',': value} of one counter."""
+        with self._lock:
+            return {",".join(v for _, v in labels) or name: value
+                    for (n, labels), value in self._counters.items() if n == name}
+
+    def format_summary(self) -> str:
+        """Human-readable stage table plus outcome counts, for CLI output."""
+        lines = [f"{'Stage':14} {'calls':>7} {'total s':>9} {'mean ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+        for stage, s in self.stage_summary().items():
+            lines.append(f"{stage:14} {s['calls']:7d} {s['total_s']:9.3f} {s['mean_ms']:9.2f} "
+                         f"{s['p50_ms']:8.2f} {s['p95_ms']:8.2f} {s['p99_ms']:8.2f}")
+        outcomes = self.counter_values("mri_images_total")
+        if outcomes:
+            lines.append("Images: " + ", ".join(f"{k}={int(v)}" for k, v in sorted(outcomes.items())))
+        errors = sum(self.counter_values("mri_prediction_errors_total").values())
+        if errors:
+            lines.append(f"Inference errors: {int(errors)}")
+        return "\n".join(lines)
+
+
+def _labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+metrics = Metrics()
+
+# ============================================
+# HOT-PATH HELPERS
+# ============================================
+
+def timed_predict(model: Any, batch: np.ndarray) -> np.ndarray:
+    """`model.predict(batch, verbose=0)` timed as the 'predict' stage, with its batch size recorded."""
+    if not metrics.enabled:
+        return model.predict(batch, verbose=0)
+    metrics.observe("mri_batch_size", len(batch), buckets=BATCH_BUCKETS)
+    try:
+        with metrics.stage("predict"):
+            return model.predict(batch, verbose=0)
+    except Exception:
+        metrics.count("mri_prediction_errors_total", len(batch))
+        raise
+
+# ============================================
+# EXPORT
+# ============================================
+
+_servers: Dict[Tuple[str, int], Any] = {}
+_servers_lock = threading.Lock()
+
+
+def serve_metrics(port: int, host: str = "127.0.0.1", registry: Optional[Metrics] = None) -> Any:
+    """
+    Serve GET /metrics (Prometheus text) and /metrics.json on a daemon thread.
+    Idempotent per (host, port), so re-running a Streamlit script does not rebind.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    registry = registry or metrics
+    with _servers_lock:
+        if (host, port) in _servers:
+            return _servers[(host, port)]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    body, ctype = registry.prometheus_text().encode("utf-8"), "text/plain; version=0.0.4"
+                elif path == "/metrics.json":
+                    body, ctype = json.dumps(registry.snapshot()).encode("utf-8"), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # keep scrapes out of stderr
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        _servers[(host, port)] = server
+        return server
+
+
+def write_prometheus_file(path: str, registry: Optional[Metrics] = None) -> None:
+    """Atomically write the Prometheus text to `path` (node_exporter textfile collector)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write((registry or metrics).prometheus_text())
+    os.replace(tmp, path)
+
+
+def configure_from_env(service: Optional[str] = None) -> Metrics:
+    """Enable `metrics` from MRI_METRICS=1, MRI_METRICS_LOG=<path|->, MRI_METRICS_PORT=<port>."""
+    if os.environ.get("MRI_METRICS", "").lower() in ("1", "true", "yes", "on") and not metrics.enabled:
+        metrics.enable(service=service, json_log=os.environ.get("MRI_METRICS_LOG") or None)
+        port = os.environ.get("MRI_METRICS_PORT")
+        if port:
+            serve_metrics(int(port), host=os.environ.get("MRI_METRICS_HOST", "127.0.0.1"))
+    return metrics
@@ -26,6 +26,11 @@ def main():
     
     # Import and run Streamlit directly
     try:
+        # The server runs in this process, so load the shared model while it starts;
+        # the first browser session then finds it already in memory.
+        from model_registry import warm_up_in_background
+        warm_up_in_background(model_path)
+        
         import streamlit.web.cli as stcli
         sys.argv = ["streamlit", "run", "app.py", "--server.port", "8501", "--server.address", "localhost"]
         stcli.main()
@@ -0,0 +1,92 @@
+"""
+Process-wide registry of loaded Keras models.
+
+The Streamlit app runs its script once per browser session, so anything kept in
+`st.session_state` is loaded (and held in memory) once per session. This registry keeps
+exactly one copy of each model file per process, keyed by absolute path and mtime, so
+every session shares the same weights and a retrained file is picked up automatically.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+_models: Dict[Tuple[str, int], Any] = {}
+_lock = threading.Lock()  # guards the dicts only; never held while TensorFlow loads
+_load_locks: Dict[str, threading.Lock] = {}  # one per model path, held for the whole load
+
+
+def _warm_up(model: Any) -> None:
+    """Run one dummy forward pass so the first real request skips graph building."""
+    shape = getattr(model, "input_shape", None)
+    if not shape or any(dim is None for dim in shape[1:]):
+        shape = (None, 224, 224, 3)
+    model.predict(np.zeros((1,) + tuple(shape[1:]), dtype=np.float32), verbose=0)
+
+
+def get_model(model_path: str = "best_alzheimer_model.h5", warm_up: bool = True) -> Any:
+    """
+    Return the shared model for `model_path`, loading it on first use.
+
+    Concurrent callers for the same file wait for a single load instead of each
+    loading their own copy; other models and `is_loaded` are not blocked meanwhile.
+    Raises FileNotFoundError if the file does not exist.
+    """
+    path = os.path.abspath(model_path)
+    key = (path, os.stat(path).st_mtime_ns)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        load_lock = _load_locks.setdefault(path, threading.Lock())
+    with load_lock:
+        model = _models.get(key)
+        if model is None:
+            from tensorflow import keras
+
+            model = keras.models.load_model(path, compile=False)
+            if warm_up:
+                _warm_up(model)
+            with _lock:
+                # Drop stale versions of the same file so memory stays flat across retrains.
+                for stale in [k for k in _models if k[0] == path]:
+                    del _models[stale]
+                _models[key] = model
+    return model
+
+
+def is_loaded(model_path: str) -> bool:
+    """True if the current version of `model_path` is already in memory (never waits for a load)."""
+    path = os.path.abspath(model_path)
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        return False
+    return key in _models
+
+
+def evict_model(model_path: str) -> None:
+    """Forget every loaded version of `model_path` (the next get_model reloads it)."""
+    path = os.path.abspath(model_path)
+    with _lock:
+        for stale in [k for k in _models if k[0] == path]:
+            del _models[stale]
+
+
+def warm_up_in_background(model_path: str = "best_alzheimer_model.h5") -> Optional[threading.Thread]:
+    """Start loading + warming `model_path` on a daemon thread; no-op if the file is missing."""
+    if not os.path.exists(model_path):
+        return None
+
+    def _load() -> None:
+        try:
+            get_model(model_path)
+        except Exception as exc:  # the first request will surface the error again
+            print(f"[!] Model warm-up failed: {exc}")
+
+    thread = threading.Thread(target=_load, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
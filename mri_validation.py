@@ -3,11 +3,13 @@ Strict MRI input validation shared by CLI and Streamlit app.
 """
 from __future__ import annotations
 
-from typing import Tuple, Union
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from PIL import Image
 
+ImageSource = Union[str, Image.Image, np.ndarray]
+
 
 def _open_as_rgb(image_or_path: Union[str, Image.Image]) -> Image.Image:
     if isinstance(image_or_path, Image.Image):
@@ -15,89 +17,167 @@ def _open_as_rgb(image_or_path: Union[str, Image.Image]) -> Image.Image:
     return Image.open(image_or_path).convert("RGB")
 
 
-def validate_mri_scan(image_or_path: Union[str, Image.Image]) -> Tuple[bool, str]:
+def load_rgb_array(image_or_path: ImageSource) -> np.ndarray:
+    """
+    Decode an image exactly once into an (H, W, 3) uint8 RGB array.
+
+    Accepts a path, a file-like object, a PIL image or an already decoded
+    array (grayscale arrays are broadcast to three channels).
+    """
+    if isinstance(image_or_path, np.ndarray):
+        arr = image_or_path
+        if arr.ndim == 2:
+            arr = np.stack([arr, arr, arr], axis=-1)
+        if arr.ndim != 3 or arr.shape[2] != 3:
+            raise ValueError(f"expected an (H, W, 3) RGB array, got shape {arr.shape}")
+        return np.ascontiguousarray(arr, dtype=np.uint8)
+    return np.asarray(_open_as_rgb(image_or_path), dtype=np.uint8)
+
+
+REJECTION_MESSAGE = "Invalid input. Please provide a valid MRI scanned brain image."
+ACCEPTED_MESSAGE = "Accepted: MRI-like brain scan."
+
+
+def _batch_reasons(batch: np.ndarray) -> List[List[str]]:
+    """Evaluate every MRI heuristic for an (N, H, W, 3) uint8 stack in one vectorized pass."""
+    n, h, w = batch.shape[:3]
+    reasons: List[List[str]] = [[] for _ in range(n)]
+
+    def flag(mask: np.ndarray, reason: str) -> None:
+        for i in np.flatnonzero(mask):
+            reasons[i].append(reason)
+
+    # 1) Basic geometry: MRI slices are usually square-ish and not tiny.
+    aspect = min(h, w) / max(h, w)
+    if min(h, w) < 128:
+        flag(np.ones(n, dtype=bool), "image is too small for MRI analysis")
+    if aspect < 0.75:
+        flag(np.ones(n, dtype=bool), "aspect ratio is not typical for MRI slices")
+
+    # 2) Color checks: MRI scans are grayscale/near-grayscale.
+    arr = batch.astype(np.float32)
+    r, g, b = arr[..., 0], arr[..., 1], arr[..., 2]
+    axes = (1, 2)
+    rg = r - g
+    mad_mean = (np.mean(np.abs(rg), axis=axes) + np.mean(np.abs(r - b), axis=axes) + np.mean(np.abs(g - b), axis=axes)) / 3.0
+    yb = 0.5 * (r + g) - b
+    colorfulness = np.sqrt(np.var(rg, axis=axes) + np.var(yb, axis=axes)) + 0.3 * np.sqrt(
+        np.mean(rg, axis=axes) ** 2 + np.mean(yb, axis=axes) ** 2
+    )
+    del rg, yb
+    # Same integer saturation PIL's RGB->HSV conversion produces, without the round-trip.
+    max_c = arr.max(axis=-1)
+    min_c = arr.min(axis=-1)
+    sat = np.floor(np.where(max_c > 0, (max_c - min_c) / np.maximum(max_c, 1.0), 0.0) * 255.0) / 255.0
+    mean_saturation = np.mean(sat, axis=axes)
+    del max_c, min_c, sat
+
+    flag(mad_mean > 6.5, "image is not grayscale enough for MRI")
+    flag(colorfulness > 12.0, "image is too colorful for MRI")
+    flag(mean_saturation > 0.12, "image saturation is too high for MRI")
+
+    # 3) MRI framing checks: many MRI slices have dark background with central brain structure.
+    gray = 0.299 * r + 0.587 * g + 0.114 * b
+    del arr, r, g, b
+
+    dark_ratio = np.mean(gray < 25.0, axis=axes)
+    flag(dark_ratio < 0.03, "background is not dark enough for typical MRI framing")
+
+    patch_h = max(8, int(h * 0.12))
+    patch_w = max(8, int(w * 0.12))
+    # The four corner patches have equal size, so the mean of their means is the pooled mean.
+    corner_mean = (
+        np.mean(gray[:, :patch_h, :patch_w], axis=axes)
+        + np.mean(gray[:, :patch_h, -patch_w:], axis=axes)
+        + np.mean(gray[:, -patch_h:, :patch_w], axis=axes)
+        + np.mean(gray[:, -patch_h:, -patch_w:], axis=axes)
+    ) / 4.0
+    flag(corner_mean > 90.0, "corner regions are too bright for typical MRI background")
+
+    y0, y1 = int(h * 0.3), int(h * 0.7)
+    x0, x1 = int(w * 0.3), int(w * 0.7)
+    center = gray[:, y0:y1, x0:x1]
+    center_mean = np.mean(center, axis=axes)
+    center_std = np.std(center, axis=axes)
+
+    flag(center_mean < corner_mean + 8.0, "central anatomy contrast does not look like MRI")
+    flag(center_std < 12.0, "central region lacks expected MRI structural variation")
+
+    # 4) Structure check: require some edge content.
+    grad = np.zeros_like(gray)
+    grad[:, :, 1:] += np.abs(np.diff(gray, axis=2))
+    grad[:, 1:, :] += np.abs(np.diff(gray, axis=1))
+    edge_density = np.mean(grad > 18.0, axis=axes)
+    flag(edge_density < 0.015, "image lacks structural edge content expected in MRI")
+
+    return reasons
+
+
+def validate_mri_batch(batch: np.ndarray) -> List[Tuple[bool, str, List[str]]]:
+    """
+    Vectorized strict validation for a stack of same-sized images.
+
+    Args:
+        batch: (N, H, W, 3) uint8 array, e.g. from np.stack of `load_rgb_array` outputs.
+            Peak memory is roughly 16 bytes per pixel, so very large folders should be
+            validated in chunks.
+
+    Returns:
+        One (is_valid, message, reasons) tuple per image, in input order.
+    """
+    batch = np.asarray(batch)
+    if batch.ndim != 4 or batch.shape[-1] != 3:
+        raise ValueError(f"expected an (N, H, W, 3) array, got shape {batch.shape}")
+    if len(batch) == 0:
+        return []
+
+    results = []
+    for image_reasons in _batch_reasons(batch):
+        if image_reasons:
+            results.append((False, REJECTION_MESSAGE, image_reasons))
+        else:
+            results.append((True, ACCEPTED_MESSAGE, []))
+    return results
+
+
+def validate_rgb_arrays(arrays: Sequence[np.ndarray], chunk_size: int = 64) -> List[Tuple[bool, str, List[str]]]:
+    """
+    Validate decoded (H, W, 3) uint8 images of mixed sizes.
+
+    Images are grouped by shape and each group goes through `validate_mri_batch`
+    in chunks of `chunk_size`, which bounds the float32 working set. Results keep
+    input order.
+    """
+    results: List[Optional[Tuple[bool, str, List[str]]]] = [None] * len(arrays)
+    groups: Dict[Tuple[int, ...], List[int]] = {}
+    for i, arr in enumerate(arrays):
+        groups.setdefault(arr.shape, []).append(i)
+
+    for indices in groups.values():
+        for start in range(0, len(indices), chunk_size):
+            chunk = indices[start:start + chunk_size]
+            try:
+                verdicts = validate_mri_batch(np.stack([arrays[i] for i in chunk]))
+            except Exception as exc:
+                verdicts = [(False, f"Unable to validate image: {exc}", [str(exc)])] * len(chunk)
+            for i, verdict in zip(chunk, verdicts):
+                results[i] = verdict
+    return results
+
+
+def validate_mri_scan(image_or_path: ImageSource) -> Tuple[bool, str]:
     """
     Strict heuristic validation that blocks non-MRI photos.
 
+    Pass the array from `load_rgb_array` to avoid decoding the file again.
+
     Returns:
         (is_valid, message)
     """
     try:
-        img = _open_as_rgb(image_or_path)
-        arr = np.asarray(img, dtype=np.float32)
-        h, w = arr.shape[:2]
-
-        reasons = []
-
-        # 1) Basic geometry: MRI slices are usually square-ish and not tiny.
-        aspect = min(h, w) / max(h, w)
-        if min(h, w) < 128:
-            reasons.append("image is too small for MRI analysis")
-        if aspect < 0.75:
-            reasons.append("aspect ratio is not typical for MRI slices")
-
-        # 2) Color checks: MRI scans are grayscale/near-grayscale.
-        r, g, b = arr[:, :, 0], arr[:, :, 1], arr[:, :, 2]
-        mad_mean = (np.mean(np.abs(r - g)) + np.mean(np.abs(r - b)) + np.mean(np.abs(g - b))) / 3.0
-        rg = r - g
-        yb = 0.5 * (r + g) - b
-        colorfulness = float(np.sqrt(np.var(rg) + np.var(yb)) + 0.3 * np.sqrt(np.mean(rg) ** 2 + np.mean(yb) ** 2))
-        hsv_sat = np.asarray(img.convert("HSV"), dtype=np.float32)[:, :, 1] / 255.0
-        mean_saturation = float(np.mean(hsv_sat))
-
-        if mad_mean > 6.5:
-            reasons.append("image is not grayscale enough for MRI")
-        if colorfulness > 12.0:
-            reasons.append("image is too colorful for MRI")
-        if mean_saturation > 0.12:
-            reasons.append("image saturation is too high for MRI")
-
-        # 3) MRI framing checks: many MRI slices have dark background with central brain structure.
-        gray = 0.299 * r + 0.587 * g + 0.114 * b
-
-        dark_ratio = float(np.mean(gray < 25.0))
-        if dark_ratio < 0.03:
-            reasons.append("background is not dark enough for typical MRI framing")
-
-        patch_h = max(8, int(h * 0.12))
-        patch_w = max(8, int(w * 0.12))
-        corners = np.concatenate(
-            [
-                gray[:patch_h, :patch_w].ravel(),
-                gray[:patch_h, -patch_w:].ravel(),
-                gray[-patch_h:, :patch_w].ravel(),
-                gray[-patch_h:, -patch_w:].ravel(),
-            ]
-        )
-        corner_mean = float(np.mean(corners))
-        if corner_mean > 90.0:
-            reasons.append("corner regions are too bright for typical MRI background")
-
-        y0, y1 = int(h * 0.3), int(h * 0.7)
-        x0, x1 = int(w * 0.3), int(w * 0.7)
-        center = gray[y0:y1, x0:x1]
-        center_mean = float(np.mean(center))
-        center_std = float(np.std(center))
-
-        if center_mean < corner_mean + 8.0:
-            reasons.append("central anatomy contrast does not look like MRI")
-        if center_std < 12.0:
-            reasons.append("central region lacks expected MRI structural variation")
-
-        # 4) Structure check: require some edge content.
-        gx = np.abs(np.diff(gray, axis=1))
-        gy = np.abs(np.diff(gray, axis=0))
-        grad = np.zeros_like(gray)
-        grad[:, 1:] += gx
-        grad[1:, :] += gy
-        edge_density = float(np.mean(grad > 18.0))
-        if edge_density < 0.015:
-            reasons.append("image lacks structural edge content expected in MRI")
-
-        if reasons:
-            return False, "Invalid input. Please provide a valid MRI scanned brain image."
-
-        return True, "Accepted: MRI-like brain scan."
+        rgb = load_rgb_array(image_or_path)
+        is_valid, message, _ = validate_mri_batch(rgb[np.newaxis])[0]
+        return is_valid, message
 
     except Exception as exc:
         return False, f"Unable to validate image: {exc}"
@@ -2,6 +2,10 @@
 Lightweight prediction script - NO dataset evaluation, only processes user-provided images
 Fast and efficient for single image or batch predictions
 
+Start-up stays light: TensorFlow is imported only when the first accepted scan reaches
+the model, so `--help`, `--validate-only` and runs where every input is rejected never
+load it.
+
 CRITICAL MEDICAL SAFETY NOTE:
 This tool is designed ONLY for brain MRI imaging analysis.
 It CANNOT diagnose Alzheimer's from normal photographs, faces, or selfies.
@@ -9,10 +13,14 @@ All inputs MUST be validated as legitimate brain MRI scans before processing.
 """
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from PIL import Image
-from tensorflow import keras
-from mri_validation import validate_mri_scan as strict_validate_mri_scan
+from inference_runner import BACKENDS, LazyRunner, create_runner
+from mri_validation import load_rgb_array, validate_mri_batch, validate_mri_scan as strict_validate_mri_scan
+from image_pipeline import default_workers, prepare_image, remember_prediction, to_model_input
+from instrumentation import metrics, timed_predict, write_prometheus_file
+from prediction_cache import PredictionCache
+from prediction_daemon import DaemonError, connect_daemon
 
 # ============================================
 # MEDICAL SAFETY: MRI SCAN VALIDATION
@@ -30,13 +38,20 @@ def _get_class_names_fallback():
     """Get class names for the model"""
     return ['NonDemented', 'VeryMildDemented', 'MildDemented', 'ModerateDemented']
 
-def load_trained_model(model_path='best_alzheimer_model.h5'):
-    """Load a trained Keras model. Returns the model or raises an error."""
+def load_trained_model(model_path='best_alzheimer_model.h5', backend='auto', num_threads=None, lazy=False):
+    """
+    Load a trained model (Keras .h5, exported SavedModel dir or .tflite).
+    Returns an object with a Keras-style predict() or raises an error.
+    With lazy=True the model (and TensorFlow) is only loaded on the first predict().
+    """
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model file not found: {model_path}")
+    if lazy:
+        return LazyRunner(model_path, backend=backend, num_threads=num_threads,
+                          on_load=lambda r: print(f"[OK] Loaded model: {model_path} ({r.backend})"))
     try:
-        loaded = keras.models.load_model(model_path, compile=False)
-        print(f"[OK] Loaded model: {model_path}")
+        loaded = create_runner(model_path, backend=backend, num_threads=num_threads)
+        print(f"[OK] Loaded model: {model_path} ({loaded.backend})")
         return loaded
     except Exception as e:
         raise RuntimeError(f"Failed to load model: {e}")
@@ -46,60 +61,258 @@ def preprocess_image(image_path, target_size=(224, 224)):
     Load an image file, convert to RGB, resize, scale to [0,1], and return a batch tensor.
     Fast preprocessing without any augmentation.
     """
-    img = Image.open(image_path).convert('RGB')
-    img = img.resize(target_size)
-    arr = np.array(img, dtype=np.float32) / 255.0
-    arr = np.expand_dims(arr, axis=0)  # Add batch dimension
-    return arr
+    return to_model_input(load_rgb_array(image_path), target_size=target_size)
 
-def predict_image(model, image_path, class_names=None, target_size=(224, 224)):
+def predict_image(model, image_path, class_names=None, target_size=(224, 224), cache=None):
     """
     Predict single image and return (label, confidence, all_probabilities).
-    FAST - No dataset evaluation!
+    FAST - No dataset evaluation! With a PredictionCache, repeated scans skip
+    validation and the model entirely.
     
     CRITICAL: This function should ONLY be used with legitimate brain MRI scans.
     """
     if class_names is None:
         class_names = _get_class_names_fallback()
     
-    # Validate image is an MRI scan
-    is_valid, validation_msg = validate_mri_scan(image_path)
-    if not is_valid:
-        print(f"\n[VALIDATION ERROR] {validation_msg}")
-        return None, None, None
+    with metrics.trace("prediction", source=str(image_path)) as trace:
+        # Decode once, validate as MRI, preprocess from the same pixels
+        prepared = prepare_image(image_path, target_size=target_size, cache=cache)
+        if not prepared.is_valid:
+            trace["outcome"] = "rejected"
+            print(f"\n[VALIDATION ERROR] {prepared.message}")
+            return None, None, None
+        
+        if prepared.probs is not None:  # cache hit
+            label, prob, probs = _decode_probs(prepared.probs, class_names)
+            trace["outcome"] = "cached"
+        else:
+            label, prob, probs = predict_batch(model, prepared.x, class_names=class_names)[0]
+            remember_prediction(cache, prepared, probs)
+            trace["outcome"] = "accepted"
+        trace["label"], trace["confidence"] = label, prob
+        return label, prob, probs
+
+def validate_files(paths, workers=None):
+    """
+    MRI validation only - no model, no TensorFlow.
+    Returns list of (path, is_valid, message, reasons) in input order.
+    """
+    def check(path):
+        try:
+            is_valid, message, reasons = validate_mri_batch(load_rgb_array(path)[np.newaxis])[0]
+            return path, is_valid, message, reasons
+        except Exception as e:
+            return path, False, f"Unable to validate image: {e}", []
     
-    x = preprocess_image(image_path, target_size=target_size)
-    preds = model.predict(x, verbose=0)  # Silent prediction
-    probs = preds[0]
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as pool:
+        return list(pool.map(check, paths))
+
+def _decode_probs(probs, class_names):
+    """Map one probability row to (label, confidence, all_probabilities)."""
     idx = int(np.argmax(probs))
     label = class_names[idx] if idx < len(class_names) else str(idx)
     return label, float(probs[idx]), probs
 
-def predict_folder(model, folder_path, class_names=None, exts=('.jpg', '.jpeg', '.png'), target_size=(224, 224)):
+def predict_batch(model, batch, class_names=None):
+    """
+    Run ONE forward pass over a stacked (N, H, W, 3) batch of preprocessed images.
+    Returns a list of (label, confidence, all_probabilities), one per row.
+    """
+    if class_names is None:
+        class_names = _get_class_names_fallback()
+    
+    preds = timed_predict(model, batch)  # Silent prediction
+    with metrics.stage("format"):
+        return [_decode_probs(probs, class_names) for probs in preds]
+
+def predict_folder(model, folder_path, class_names=None, exts=('.jpg', '.jpeg', '.png'), target_size=(224, 224), batch_size=32, cache=None):
     """
     Run predictions on all image files in a folder.
     Returns list of (path, label, confidence).
-    FAST - Process all images without dataset evaluation!
+    FAST - Images are validated and preprocessed one by one, then stacked into
+    batches of `batch_size` so each batch costs a single model.predict call.
+    Scans already in `cache` are answered without touching the model.
     """
-    results = []
+    if class_names is None:
+        class_names = _get_class_names_fallback()
+    
     files = sorted([f for f in os.listdir(folder_path) if f.lower().endswith(exts)])
     if not files:
         print(f"[!] No image files found in {folder_path}")
-        return results
+        return []
     
     print(f"Processing {len(files)} images...\n")
+    return _predict_paths(model, [os.path.join(folder_path, fname) for fname in files], class_names,
+                          target_size=target_size, batch_size=batch_size, cache=cache)
+
+def _predict_paths(model, paths, class_names, target_size=(224, 224), batch_size=32, cache=None, first=1, total=None):
+    """predict_folder's batch loop for a list of paths, numbered from `first` out of `total`."""
+    results = []
+    total = total or len(paths)
+    batch_size = max(1, int(batch_size))
     
-    for i, fname in enumerate(files, 1):
-        path = os.path.join(folder_path, fname)
-        try:
-            label, prob, _ = predict_image(model, path, class_names=class_names, target_size=target_size)
-            if label is None:
-                print(f"[{i}/{len(files)}] {fname:30} -> [SKIPPED]: validation failed")
+    for start in range(0, len(paths), batch_size):
+        chunk = [os.path.basename(path) for path in paths[start:start + batch_size]]
+        # Per-file output is buffered so lines keep folder order within a batch
+        lines = [[] for _ in chunk]
+        ready = []  # (offset, path, prepared image)
+        
+        for offset, fname in enumerate(chunk):
+            i = first + start + offset
+            path = paths[start + offset]
+            try:
+                prepared = prepare_image(path, target_size=target_size, cache=cache)
+                if not prepared.is_valid:
+                    metrics.log_event("prediction", source=path, outcome="rejected", error=prepared.message)
+                    lines[offset].append(f"\n[VALIDATION ERROR] {prepared.message}")
+                    lines[offset].append(f"[{i}/{total}] {fname:30} -> [SKIPPED]: validation failed")
+                    continue
+                ready.append((offset, path, prepared))
+            except Exception as e:
+                metrics.log_event("prediction", source=path, outcome="error", error=str(e))
+                lines[offset].append(f"[{i}/{total}] {fname:30} -> [ERROR]: {e}")
+        
+        to_run = [item for item in ready if item[2].probs is None]
+        preds = {}
+        if to_run:
+            try:
+                batch = np.concatenate([prepared.x for _, _, prepared in to_run], axis=0)
+                for (offset, _, prepared), pred in zip(to_run, predict_batch(model, batch, class_names=class_names)):
+                    preds[offset] = pred
+                    remember_prediction(cache, prepared, pred[2])
+            except Exception as e:
+                for offset, path, _ in to_run:
+                    metrics.log_event("prediction", source=path, outcome="error", error=str(e))
+                    lines[offset].append(f"[{first + start + offset}/{total}] {chunk[offset]:30} -> [ERROR]: {e}")
+        
+        for offset, path, prepared in ready:
+            if prepared.probs is not None:
+                preds[offset] = _decode_probs(prepared.probs, class_names)
+            if offset not in preds:
                 continue
+            label, prob, _ = preds[offset]
             results.append((path, label, prob))
-            print(f"[{i}/{len(files)}] {fname:30} -> {label:20} ({prob*100:5.1f}%)")
-        except Exception as e:
-            print(f"[{i}/{len(files)}] {fname:30} -> [ERROR]: {e}")
+            metrics.log_event("prediction", source=path, outcome="cached" if prepared.probs is not None else "accepted",
+                              label=label, confidence=prob)
+            lines[offset].append(f"[{first + start + offset}/{total}] {chunk[offset]:30} -> {label:20} ({prob*100:5.1f}%)")
+        
+        for file_lines in lines:
+            for line in file_lines:
+                print(line)
+    
+    return results
+
+def predict_folder_sharded(model_path, folder_path, class_names=None, exts=('.jpg', '.jpeg', '.png'), target_size=(224, 224),
+                           batch_size=32, workers=2, backend='auto', intra_op_threads=None, inter_op_threads=1, cache_db=None,
+                           cache_size=100_000):
+    """
+    Same output as predict_folder, but spread across `workers` processes that each
+    load the model once (see worker_pool.py). Returns list of (path, label, confidence).
+    """
+    from worker_pool import ShardedPredictor
+    
+    if class_names is None:
+        class_names = _get_class_names_fallback()
+    
+    results = []
+    files = sorted([f for f in os.listdir(folder_path) if f.lower().endswith(exts)])
+    if not files:
+        print(f"[!] No image files found in {folder_path}")
+        return results
+    
+    print(f"Processing {len(files)} images on {workers} worker processes...\n")
+    
+    paths = [os.path.join(folder_path, fname) for fname in files]
+    with ShardedPredictor(model_path, workers=workers, backend=backend, intra_op_threads=intra_op_threads,
+                          inter_op_threads=inter_op_threads, batch_size=batch_size,
+                          target_size=target_size, cache_db=cache_db, cache_size=cache_size) as pool:
+        return _report_remote_results(paths, pool.imap(paths), class_names)
+
+def predict_folder_daemon(client, folder_path, class_names=None, exts=('.jpg', '.jpeg', '.png'), target_size=(224, 224),
+                          model=None, batch_size=32, cache=None):
+    """
+    Same output as predict_folder, answered by a running prediction_daemon.py
+    (`client` from prediction_daemon.connect_daemon). Returns list of (path, label, confidence).
+    If the daemon fails mid-run and a fallback `model` is given, only the images it had
+    not answered yet are predicted in this process (with `batch_size` and `cache`).
+    """
+    if class_names is None:
+        class_names = _get_class_names_fallback()
+    
+    files = sorted([f for f in os.listdir(folder_path) if f.lower().endswith(exts)])
+    if not files:
+        print(f"[!] No image files found in {folder_path}")
+        return []
+    
+    print(f"Processing {len(files)} images on the prediction daemon...\n")
+    
+    paths = [os.path.join(folder_path, fname) for fname in files]
+    results, answered = [], []
+    
+    def tracked():
+        for item in client.predict(paths, target_size=target_size):
+            answered.append(item)
+            yield item
+    
+    try:
+        _report_remote_results(paths, tracked(), class_names, results)
+    except (OSError, DaemonError) as e:
+        if model is None:
+            raise
+        rest = paths[len(answered):]
+        print(f"[!] Prediction daemon failed ({e}); predicting the remaining {len(rest)} images in this process")
+        results += _predict_paths(model, rest, class_names, target_size=target_size, batch_size=batch_size,
+                                  cache=cache, first=len(answered) + 1, total=len(paths))
+    finally:
+        client.close()
+    return results
+
+def predict_image_daemon(client, image_path, class_names=None, target_size=(224, 224)):
+    """predict_image through a running prediction daemon: (label, confidence, all_probabilities)."""
+    if class_names is None:
+        class_names = _get_class_names_fallback()
+    
+    _, status, message, probs = next(iter(client.predict([image_path], target_size=target_size)))
+    if status == 'rejected':
+        print(f"\n[VALIDATION ERROR] {message}")
+        return None, None, None
+    if status == 'error':
+        raise RuntimeError(message)
+    return _decode_probs(np.asarray(probs, dtype=np.float32), class_names)
+
+def _with_daemon_fallback(client, via_daemon, in_process):
+    """
+    Run via_daemon(); if the daemon goes away, warn and redo the work with in_process().
+    Only for calls that print nothing before the daemon answers (single images).
+    """
+    try:
+        return via_daemon()
+    except (OSError, DaemonError) as e:
+        print(f"[!] Prediction daemon failed ({e}); continuing in this process")
+        return in_process()
+    finally:
+        client.close()
+
+def _report_remote_results(paths, stream, class_names, results=None):
+    """
+    Print (path, status, message, probs) results from worker processes or the daemon like
+    predict_folder. Accepted ones are appended to `results` as they arrive (and returned).
+    """
+    results = [] if results is None else results
+    for i, (path, (_, status, message, probs)) in enumerate(zip(paths, stream), 1):
+        fname = os.path.basename(path)
+        # Workers and the daemon keep their own registries; count the outcomes here
+        metrics.count("mri_images_total", outcome={'ok': 'accepted'}.get(status, status))
+        metrics.log_event("prediction", source=path, outcome=status, error=message if status != 'ok' else None)
+        if status == 'rejected':
+            print(f"\n[VALIDATION ERROR] {message}")
+            print(f"[{i}/{len(paths)}] {fname:30} -> [SKIPPED]: validation failed")
+        elif status == 'error':
+            print(f"[{i}/{len(paths)}] {fname:30} -> [ERROR]: {message}")
+        else:
+            label, prob, _ = _decode_probs(np.asarray(probs), class_names)
+            results.append((path, label, prob))
+            print(f"[{i}/{len(paths)}] {fname:30} -> {label:20} ({prob*100:5.1f}%)")
     
     return results
 
@@ -123,8 +336,30 @@ Examples:
   # Use custom model
   python predict.py -i image.jpg -m my_model.h5
   
+  # Use an exported TFLite model (see export_model.py)
+  python predict.py -i image.jpg -m exported/alzheimer_model.tflite --threads 4
+  
   # Custom image size
   python predict.py -i image.jpg -s 224 224
+  
+  # Larger inference batches for big folders
+  python predict.py -i path/to/folder/ --batch-size 64
+  
+  # Large folders on many-core hosts: 8 processes x 4 TF threads each
+  python predict.py -i path/to/folder/ --workers 8 --intra-op-threads 4
+  
+  # Reuse earlier results for scans that were already analyzed
+  python predict.py -i path/to/folder/ --cache-db predictions.sqlite
+  
+  # Only check which files are valid brain MRI scans (never loads TensorFlow)
+  python predict.py -i path/to/folder/ --validate-only
+  
+  # Per-stage timings (decode/validate/resize/predict) + JSON log per scan
+  python predict.py -i path/to/folder/ --metrics --metrics-log predictions.jsonl
+  
+  # Keep the model resident between calls: start the daemon once, predict.py uses it automatically
+  python prediction_daemon.py -m best_alzheimer_model.h5 &
+  python predict.py -i path/to/image.jpg
         """
     )
     
@@ -136,7 +371,19 @@ Examples:
     parser.add_argument(
         '--model', '-m', 
         default='best_alzheimer_model.h5', 
-        help='Path to trained model (.h5) [default: best_alzheimer_model.h5]'
+        help='Path to trained model (.h5, SavedModel dir or .tflite) [default: best_alzheimer_model.h5]'
+    )
+    parser.add_argument(
+        '--backend',
+        choices=BACKENDS,
+        default='auto',
+        help='Inference backend [default: auto, picked from the model file type]'
+    )
+    parser.add_argument(
+        '--threads',
+        type=int,
+        default=None,
+        help='Interpreter threads for the TFLite backend [default: TFLite default]'
     )
     parser.add_argument(
         '--size', '-s',
@@ -146,26 +393,151 @@ Examples:
         default=(224, 224), 
         help='Target image size W H [default: 224 224]'
     )
+    parser.add_argument(
+        '--batch-size', '-b',
+        type=int,
+        default=32,
+        help='Images per model.predict call in folder mode [default: 32]'
+    )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=1,
+        help='Worker processes for folder mode, each loading the model once [default: 1]'
+    )
+    parser.add_argument(
+        '--intra-op-threads',
+        type=int,
+        default=None,
+        help='TF intra-op threads per worker [default: CPU count / workers]'
+    )
+    parser.add_argument(
+        '--inter-op-threads',
+        type=int,
+        default=1,
+        help='TF inter-op threads per worker [default: 1]'
+    )
+    parser.add_argument(
+        '--cache-db',
+        default=None,
+        help='SQLite file caching predictions by image content + model identity [default: off]'
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=100_000,
+        help='Maximum cached predictions kept in --cache-db [default: 100000]'
+    )
+    parser.add_argument(
+        '--validate-only',
+        action='store_true',
+        help='Only run MRI validation and report accepted/rejected files; exit code 1 if any is rejected'
+    )
+    parser.add_argument(
+        '--metrics',
+        action='store_true',
+        help='Print per-stage timings and outcome counts at the end'
+    )
+    parser.add_argument(
+        '--metrics-log',
+        default=None,
+        help='Append one JSON line per scan (with stage timings) to this file, "-" for stderr'
+    )
+    parser.add_argument(
+        '--metrics-file',
+        default=None,
+        help='Write Prometheus text metrics to this file at the end (node_exporter textfile collector)'
+    )
+    parser.add_argument(
+        '--socket',
+        default=None,
+        help='Unix socket of a running prediction_daemon.py [default: $ALZHEIMER_PREDICT_SOCKET or per-user temp socket]'
+    )
+    parser.add_argument(
+        '--no-daemon',
+        action='store_true',
+        help='Always load the model in this process, even if a prediction daemon is running'
+    )
     
     args = parser.parse_args()
+    if args.metrics or args.metrics_log or args.metrics_file:
+        metrics.enable(service='predict', json_log=args.metrics_log)
+    
+    exts = ('.jpg', '.jpeg', '.png', '.bmp')
+    if args.validate_only:
+        if os.path.isdir(args.input):
+            paths = [os.path.join(args.input, f) for f in sorted(os.listdir(args.input)) if f.lower().endswith(exts)]
+        elif os.path.isfile(args.input):
+            paths = [args.input]
+        else:
+            print(f"[ERROR] Input path not found: {args.input}")
+            sys.exit(1)
+        verdicts = validate_files(paths)
+        for i, (path, is_valid, message, reasons) in enumerate(verdicts, 1):
+            status = "[VALID]" if is_valid else f"[REJECTED]: {'; '.join(reasons) or message}"
+            print(f"[{i}/{len(paths)}] {os.path.basename(path):30} -> {status}")
+        n_valid = sum(1 for v in verdicts if v[1])
+        print(f"\n[*] {n_valid} of {len(verdicts)} files are valid brain MRI scans")
+        sys.exit(0 if n_valid == len(verdicts) else 1)
     
-    # Load model (FAST - no dataset loading!)
-    print("[*] Loading model...")
-    mdl = load_trained_model(args.model)
     classes = _get_class_names_fallback()
+    sharded = args.workers > 1 and os.path.isdir(args.input)
+    
+    # A running prediction daemon already has the model in memory: no load at all
+    client = None
+    if not sharded and not args.no_daemon:
+        client = connect_daemon(args.model, socket_path=args.socket)
+        if client is not None:
+            print(f"[*] Using prediction daemon (pid {client.info.get('pid')}) on {client.socket_path}")
+            # The daemon runs with its own start-up settings; these only apply to an in-process fallback
+            ignored = [flag for flag, dest in (('--backend', 'backend'), ('--threads', 'threads'),
+                                               ('--batch-size', 'batch_size'), ('--cache-db', 'cache_db'),
+                                               ('--cache-size', 'cache_size'))
+                       if getattr(args, dest) != parser.get_default(dest)]
+            if ignored:
+                print(f"[!] {', '.join(ignored)} ignored: the daemon uses the settings it was started with "
+                      f"(pass --no-daemon to apply them)")
+    
+    # Model is loaded on the first accepted scan (FAST - no dataset loading, and no
+    # TensorFlow at all if every input is rejected); in sharded mode only the workers load it
+    if not sharded:
+        mdl = load_trained_model(args.model, backend=args.backend, num_threads=args.threads, lazy=True)
+        cache = PredictionCache(args.model, db_path=args.cache_db, max_db_entries=args.cache_size) if args.cache_db else None
     
     print(f"[*] Using classes: {', '.join(classes)}\n")
     
     # Process input
     if os.path.isdir(args.input):
         # Batch prediction
-        results = predict_folder(
-            mdl,
-            args.input,
-            class_names=classes,
-            exts=('.jpg', '.jpeg', '.png', '.bmp'),
-            target_size=tuple(args.size),
-        )
+        if sharded:
+            results = predict_folder_sharded(
+                args.model,
+                args.input,
+                class_names=classes,
+                exts=exts,
+                target_size=tuple(args.size),
+                batch_size=args.batch_size,
+                workers=args.workers,
+                backend=args.backend,
+                intra_op_threads=args.intra_op_threads or args.threads,
+                inter_op_threads=args.inter_op_threads,
+                cache_db=args.cache_db,
+                cache_size=args.cache_size,
+            )
+        elif client is not None:
+            results = predict_folder_daemon(client, args.input, class_names=classes, exts=exts,
+                                            target_size=tuple(args.size), model=mdl,
+                                            batch_size=args.batch_size, cache=cache)
+        else:
+            results = predict_folder(
+                mdl,
+                args.input,
+                class_names=classes,
+                exts=exts,
+                target_size=tuple(args.size),
+                batch_size=args.batch_size,
+                cache=cache,
+            )
         
         if results:
             print(f"\n{'='*70}")
@@ -184,7 +556,14 @@ Examples:
     elif os.path.isfile(args.input):
         # Single image prediction
         print(f"Analyzing: {args.input}\n")
-        lbl, pr, probs = predict_image(mdl, args.input, class_names=classes, target_size=tuple(args.size))
+        if client is not None:
+            lbl, pr, probs = _with_daemon_fallback(
+                client,
+                lambda: predict_image_daemon(client, args.input, class_names=classes, target_size=tuple(args.size)),
+                lambda: predict_image(mdl, args.input, class_names=classes, target_size=tuple(args.size), cache=cache),
+            )
+        else:
+            lbl, pr, probs = predict_image(mdl, args.input, class_names=classes, target_size=tuple(args.size), cache=cache)
         
         if lbl is None:  # Validation failed
             print("\n" + "="*70)
@@ -223,4 +602,11 @@ Examples:
         print(f"[ERROR] Input path not found: {args.input}")
         sys.exit(1)
     
+    if args.metrics:
+        print("\n[*] STAGE TIMINGS")
+        print(metrics.format_summary())
+    if args.metrics_file:
+        write_prometheus_file(args.metrics_file)
+        print(f"[OK] Metrics written: {args.metrics_file}")
+    
     print("\n[OK] Done! (Fast - no dataset evaluation needed)")
@@ -0,0 +1,202 @@
+"""
+Content-addressed prediction cache shared by the CLI, the Python API and the Streamlit app.
+
+Entries are keyed by a hash of the raw image bytes plus the identity of the model file
+(absolute path, size and mtime), so re-uploading the same scan skips both MRI validation
+and the CNN, while retraining or swapping the model invalidates everything automatically.
+
+Two tiers:
+    * an in-memory LRU (always on)
+    * an optional SQLite file with a row cap, evicting the least recently used rows
+
+Disk writes (new entries and last-used updates of disk hits) are buffered and written in
+one transaction every `flush_every` changes or `flush_interval` seconds, and on
+`flush()`/`close()`. The row count is tracked in memory, so eviction only runs (as one
+batch down to 90% of the cap) when the cap is actually passed.
+"""
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+
+class CachedPrediction(NamedTuple):
+    """A stored validation verdict and, for accepted scans, the class probabilities."""
+
+    is_valid: bool
+    message: str
+    probs: Optional[Tuple[float, ...]]
+
+
+def model_identity(model_path: str) -> str:
+    """Identify a model file by absolute path, size and modification time."""
+    stat = os.stat(model_path)
+    return f"{os.path.abspath(model_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class PredictionCache:
+    """Two-tier (memory LRU + optional SQLite) cache of per-image predictions."""
+
+    def __init__(
+        self,
+        model_path: str,
+        max_entries: int = 1024,
+        db_path: Optional[str] = None,
+        max_db_entries: int = 100_000,
+        flush_every: int = 64,
+        flush_interval: float = 2.0,
+    ):
+        self.model_id = model_identity(model_path)
+        self.max_entries = max(1, int(max_entries))
+        self.max_db_entries = max(1, int(max_db_entries))
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, CachedPrediction]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.flush_every = max(1, int(flush_every))
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, Tuple[CachedPrediction, float]] = {}  # unwritten puts
+        self._touched: Dict[str, float] = {}  # unwritten last_used updates of disk hits
+        self._last_flush = time.monotonic()
+        self._db_rows = 0
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, timeout=30.0, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " key TEXT PRIMARY KEY,"
+                " is_valid INTEGER NOT NULL,"
+                " message TEXT NOT NULL,"
+                " probs TEXT,"
+                " last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)")
+            self._db.commit()
+            (self._db_rows,) = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def key_for(self, data: bytes, target_size: Sequence[int] = (224, 224)) -> str:
+        """Cache key for raw image bytes under this model and input size."""
+        digest = hashlib.sha256()
+        digest.update(self.model_id.encode("utf-8"))
+        digest.update(f"|{target_size[0]}x{target_size[1]}|".encode("ascii"))
+        digest.update(data)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[CachedPrediction]:
+        """Look a key up in memory, then on disk (promoting disk hits to memory)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            if key in self._pending:  # evicted from memory before it reached the disk
+                entry = self._pending[key][0]
+                self._remember(key, entry)
+                self.hits += 1
+                return entry
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT is_valid, message, probs FROM predictions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._touched[key] = time.time()
+                    self._maybe_flush()
+                    probs = tuple(json.loads(row[2])) if row[2] is not None else None
+                    entry = CachedPrediction(bool(row[0]), row[1], probs)
+                    self._remember(key, entry)
+                    self.hits += 1
+                    return entry
+            self.misses += 1
+            return None
+
+    def put(self, key: str, is_valid: bool, message: str, probs: Optional[Sequence[float]] = None) -> None:
+        """Store a verdict (and probabilities for accepted scans) in both tiers."""
+        entry = CachedPrediction(bool(is_valid), message, tuple(float(p) for p in probs) if probs is not None else None)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._pending[key] = (entry, time.time())
+                self._maybe_flush()
+
+    def flush(self) -> None:
+        """Write buffered disk-tier changes in one transaction."""
+        with self._lock:
+            self._flush()
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._pending.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+                self._db_rows = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: str, entry: CachedPrediction) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _maybe_flush(self) -> None:
+        if (len(self._pending) + len(self._touched) >= self.flush_every
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self._flush()
+
+    def _flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if self._db is None or not (self._pending or self._touched):
+            return
+        with self._db:  # one transaction
+            self._db.executemany(
+                "INSERT OR REPLACE INTO predictions (key, is_valid, message, probs, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(key, int(entry.is_valid), entry.message,
+                  json.dumps(entry.probs) if entry.probs is not None else None, used)
+                 for key, (entry, used) in self._pending.items()],
+            )
+            self._db.executemany("UPDATE predictions SET last_used = ? WHERE key = ?",
+                                 [(used, key) for key, used in self._touched.items()])
+            # Upper bound (replaced keys are counted too); recounted exactly before evicting.
+            self._db_rows += len(self._pending)
+            if self._db_rows > self.max_db_entries:
+                self._evict_db()
+        self._pending.clear()
+        self._touched.clear()
+
+    def _evict_db(self) -> None:
+        (self._db_rows,) = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()
+        excess = self._db_rows - self.max_db_entries
+        if excess > 0:
+            # Trim to 90% of the cap so eviction runs once per ~10% of new rows, not per insert.
+            excess += self.max_db_entries // 10
+            self._db.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+            self._db_rows -= excess
+
+
+def _flush_at_exit(ref: "weakref.ReferenceType[PredictionCache]") -> None:
+    cache = ref()
+    if cache is not None:
+        cache.close()
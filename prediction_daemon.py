@@ -0,0 +1,393 @@
+"""
+Resident prediction daemon behind a Unix domain socket, plus the thin client predict.py uses.
+
+`python predict.py -i scan.jpg` normally pays for a new interpreter, the TensorFlow import
+and the model load on every call, which is seconds of fixed cost around a sub-100 ms
+forward pass. The daemon loads the model once and keeps it in memory. predict.py
+connects to the socket first and only falls back to in-process inference when no daemon
+is listening, or when the daemon holds a different model (path, size or mtime differ).
+
+Protocol: newline-delimited JSON over a SOCK_STREAM Unix socket, one request per line:
+    {"op": "ping"}                                   -> {"ok": true, "model": ..., "model_id": ..., ...}
+    {"op": "predict", "paths": [...], "target_size": [224, 224]}
+        -> one {"results": [[path, status, message, probs], ...]} line per batch,
+           then {"ok": true, "done": true}
+    {"op": "shutdown"}                               -> {"ok": true}
+Results use worker_pool's (path, status, message, probs) format, with status 'ok',
+'rejected' or 'error'. The client and daemon share a host, so paths are sent instead of
+image bytes. The socket is created with mode 0600, so only the owning user can connect.
+
+Example:
+    python prediction_daemon.py -m best_alzheimer_model.h5 &
+    python predict.py -i scan.jpg            # answered by the daemon
+    python prediction_daemon.py --stop
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from image_pipeline import iter_prepared_batches, remember_prediction
+from inference_runner import BACKENDS, create_runner
+from instrumentation import metrics, serve_metrics, timed_predict
+from prediction_cache import PredictionCache, model_identity
+from worker_pool import WorkerResult
+
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+SOCKET_ENV = "ALZHEIMER_PREDICT_SOCKET"
+
+
+def default_socket_path() -> str:
+    """$ALZHEIMER_PREDICT_SOCKET, else a per-user socket in the temp directory."""
+    uid = os.getuid() if hasattr(os, "getuid") else "user"
+    return os.environ.get(SOCKET_ENV) or os.path.join(tempfile.gettempdir(), f"alzheimer_predict_{uid}.sock")
+
+
+def _send(sock_file: Any, payload: Dict[str, Any]) -> None:
+    sock_file.write(json.dumps(payload).encode("utf-8") + b"\n")
+    sock_file.flush()
+
+
+# ============================================
+# DAEMON
+# ============================================
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_Server"
+
+    def handle(self) -> None:
+        daemon = self.server.prediction_daemon
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+            if not line:
+                return
+            daemon.touch()
+            try:
+                request = json.loads(line)
+            except ValueError:
+                _send(self.wfile, {"ok": False, "error": "malformed request (expected one JSON object per line)"})
+                return
+            op = request.get("op")
+            daemon.begin_request()
+            try:
+                if op == "ping":
+                    _send(self.wfile, {"ok": True, **daemon.info()})
+                elif op == "predict":
+                    target_size = tuple(request.get("target_size") or (224, 224))
+                    for chunk in daemon.predict_paths(request.get("paths") or [], target_size):
+                        _send(self.wfile, {"results": chunk})
+                    _send(self.wfile, {"ok": True, "done": True})
+                elif op == "shutdown":
+                    _send(self.wfile, {"ok": True})
+                    daemon.stop()
+                    return
+                else:
+                    _send(self.wfile, {"ok": False, "error": f"unknown op {op!r}"})
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            finally:
+                daemon.end_request()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, daemon: "PredictionDaemon"):
+        self.prediction_daemon = daemon
+        old_umask = os.umask(0o177)  # socket is created 0600
+        try:
+            super().__init__(socket_path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+
+class PredictionDaemon:
+    """Holds one model in memory and serves prediction requests on a Unix socket."""
+
+    def __init__(self, model_path: str = "best_alzheimer_model.h5", socket_path: Optional[str] = None,
+                 backend: str = "auto", num_threads: Optional[int] = None, batch_size: int = 32,
+                 cache_db: Optional[str] = None, idle_timeout: Optional[float] = None):
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix domain sockets are not available on this platform")
+        self.model_path = model_path
+        self.socket_path = socket_path or default_socket_path()
+        self.batch_size = max(1, int(batch_size))
+        self.idle_timeout = idle_timeout
+        self.model_id = model_identity(model_path)
+        self.runner = create_runner(model_path, backend=backend, num_threads=num_threads)
+        self.cache = PredictionCache(model_path, db_path=cache_db) if cache_db else None
+        self.started = time.time()
+        self.requests = 0
+        self.images = 0
+        self._last_activity = time.monotonic()
+        self._in_flight = 0
+        self._activity_lock = threading.Lock()
+        self._predict_lock = threading.Lock()  # one forward pass at a time (Keras models are not thread-safe)
+        self._server: Optional[_Server] = None
+
+    # ---------------- lifecycle ----------------
+
+    def _claim_socket(self) -> None:
+        """Remove a stale socket file; refuse to start if another daemon is answering on it."""
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)  # left behind by a daemon that died
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"Another prediction daemon is already listening on {self.socket_path}")
+
+    def serve_forever(self) -> None:
+        # Warm-up so the first request does not pay graph/interpreter setup
+        self.runner.predict(np.zeros((1, 224, 224, 3), dtype=np.float32), verbose=0)
+        self._claim_socket()
+        self._server = _Server(self.socket_path, self)
+        if self.idle_timeout:
+            threading.Thread(target=self._idle_watch, name="daemon-idle", daemon=True).start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        if self._server is not None:
+            # shutdown() blocks until serve_forever returns, so never call it on the serving thread
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def touch(self) -> None:
+        self._last_activity = time.monotonic()
+
+    def begin_request(self) -> None:
+        with self._activity_lock:
+            self._in_flight += 1
+        self.touch()
+
+    def end_request(self) -> None:
+        with self._activity_lock:
+            self._in_flight -= 1
+        self.touch()
+
+    def _idle_watch(self) -> None:
+        """Stop after `idle_timeout` seconds with no request running (long requests never count as idle)."""
+        while True:
+            time.sleep(min(5.0, self.idle_timeout))
+            if not self._in_flight and time.monotonic() - self._last_activity > self.idle_timeout:
+                print(f"[*] Idle for {self.idle_timeout:g}s, shutting down")
+                self.stop()
+                return
+
+    # ---------------- requests ----------------
+
+    def info(self) -> Dict[str, Any]:
+        return {"model": os.path.abspath(self.model_path), "model_id": self.model_id,
+                "backend": self.runner.backend, "pid": os.getpid(), "uptime_s": time.time() - self.started,
+                "requests": self.requests, "images": self.images}
+
+    def predict_paths(self, paths: Iterable[str], target_size: Tuple[int, int] = (224, 224)) -> Iterator[List[WorkerResult]]:
+        """Yield one list of (path, status, message, probs) per batch, in input order."""
+        self.requests += 1
+        batches = iter_prepared_batches([str(p) for p in paths], target_size=target_size,
+                                        batch_size=self.batch_size, cache=self.cache)
+        for batch in batches:
+            batch_error = None
+            preds = iter(())
+            if batch.x is not None:
+                try:
+                    with self._predict_lock:
+                        preds = iter(timed_predict(self.runner, batch.x))
+                except Exception as exc:  # reported per file; the daemon keeps serving
+                    batch_error = str(exc)
+            results = []
+            for path, p in batch.items:
+                if not p.is_valid:
+                    results.append((path, "rejected", p.message, None))
+                elif p.probs is not None:
+                    results.append((path, "ok", p.message, [float(v) for v in p.probs]))
+                elif batch_error is not None:
+                    results.append((path, "error", batch_error, None))
+                else:
+                    probs = next(preds)
+                    remember_prediction(self.cache, p, probs)
+                    results.append((path, "ok", p.message, [float(v) for v in probs]))
+            self.images += len(results)
+            self.touch()
+            yield results
+
+
+# ============================================
+# CLIENT
+# ============================================
+
+class DaemonError(RuntimeError):
+    """The daemon answered with an error or closed the connection mid-request."""
+
+
+class DaemonClient:
+    """Connection to a running PredictionDaemon."""
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: Optional[float] = 300.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.info: Dict[str, Any] = {}  # daemon's ping reply, filled by connect_daemon
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(self.socket_path)
+        except OSError:
+            self._sock.close()
+            raise
+        self._file = self._sock.makefile("rwb")
+
+    def _request(self, payload: Dict[str, Any]) -> None:
+        _send(self._file, payload)
+
+    def _read(self) -> Dict[str, Any]:
+        line = self._file.readline()
+        if not line:
+            raise DaemonError("prediction daemon closed the connection")
+        reply = json.loads(line)
+        if reply.get("ok") is False:
+            raise DaemonError(reply.get("error", "prediction daemon error"))
+        return reply
+
+    def ping(self) -> Dict[str, Any]:
+        self._request({"op": "ping"})
+        return self._read()
+
+    def predict(self, paths: Iterable[str], target_size: Tuple[int, int] = (224, 224)) -> Iterator[WorkerResult]:
+        """Stream (path, status, message, probs) for every path, in input order."""
+        self._request({"op": "predict", "paths": [os.path.abspath(p) for p in paths],
+                       "target_size": list(target_size)})
+        while True:
+            reply = self._read()
+            if reply.get("done"):
+                return
+            for path, status, message, probs in reply["results"]:
+                yield path, status, message, probs
+
+    def shutdown(self) -> None:
+        self._request({"op": "shutdown"})
+        self._read()
+
+    def close(self) -> None:
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self) -> "DaemonClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def connect_daemon(model_path: Optional[str] = None, socket_path: Optional[str] = None,
+                   timeout: Optional[float] = 300.0) -> Optional[DaemonClient]:
+    """
+    Client for a running daemon, or None when none is listening. With `model_path`, a
+    daemon serving a different model (or an older version of the file) also gives None.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        client = DaemonClient(socket_path, timeout=2.0)
+    except OSError:
+        return None
+    try:
+        info = client.ping()
+        if model_path is not None and info.get("model_id") != model_identity(model_path):
+            client.close()
+            return None
+    except (OSError, ValueError, DaemonError):
+        client.close()
+        return None
+    client._sock.settimeout(timeout)
+    client.info = info
+    return client
+
+
+# ============================================
+# CLI INTERFACE
+# ============================================
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Keep the Alzheimer model resident and answer predict.py over a Unix socket",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Start the daemon (predict.py picks it up automatically)
+  python prediction_daemon.py -m best_alzheimer_model.h5 &
+
+  # Exit after 30 idle minutes
+  python prediction_daemon.py --idle-timeout 1800 &
+
+  # Check / stop it
+  python prediction_daemon.py --status
+  python prediction_daemon.py --stop
+        """
+    )
+    parser.add_argument("--model", "-m", default="best_alzheimer_model.h5",
+                        help="Model (.h5, SavedModel dir or .tflite) [default: best_alzheimer_model.h5]")
+    parser.add_argument("--socket", default=None,
+                        help=f"Socket path [default: ${SOCKET_ENV} or {default_socket_path()}]")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto", help="Inference backend [default: auto]")
+    parser.add_argument("--threads", type=int, default=None, help="TFLite interpreter threads")
+    parser.add_argument("--batch-size", "-b", type=int, default=32, help="Images per model.predict call [default: 32]")
+    parser.add_argument("--cache-db", default=None, help="SQLite prediction cache shared across requests")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="Exit after this many idle seconds")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    parser.add_argument("--status", action="store_true", help="Show the running daemon and exit")
+    parser.add_argument("--stop", action="store_true", help="Stop the running daemon and exit")
+    args = parser.parse_args()
+
+    if args.status or args.stop:
+        client = connect_daemon(socket_path=args.socket)
+        if client is None:
+            print(f"[!] No prediction daemon on {args.socket or default_socket_path()}")
+            sys.exit(1)
+        with client:
+            if args.stop:
+                client.shutdown()
+                print(f"[OK] Daemon (pid {client.info['pid']}) stopped")
+            else:
+                info = client.info
+                print(f"[OK] Daemon pid {info['pid']}: {info['model']} ({info['backend']}), "
+                      f"up {info['uptime_s']:.0f}s, {info['requests']} requests, {info['images']} images")
+        sys.exit(0)
+
+    if not os.path.exists(args.model):
+        print(f"[ERROR] Model not found: {args.model}")
+        sys.exit(1)
+    if args.metrics_port:
+        metrics.enable(service="prediction-daemon")
+        serve_metrics(args.metrics_port)
+
+    print(f"[*] Loading model {args.model}...")
+    service = PredictionDaemon(args.model, socket_path=args.socket, backend=args.backend, num_threads=args.threads,
+                               batch_size=args.batch_size, cache_db=args.cache_db, idle_timeout=args.idle_timeout)
+    print(f"[OK] Serving {args.model} ({service.runner.backend}) on {service.socket_path} (pid {os.getpid()})")
+    try:
+        service.serve_forever()
+    except RuntimeError as exc:
+        print(f"[ERROR] {exc}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+    print("[OK] Daemon stopped")
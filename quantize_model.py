@@ -0,0 +1,271 @@
+"""
+Post-training quantization of the Alzheimer CNN with an accuracy-regression report.
+
+Builds float16 and int8 TFLite variants of the trained `.h5` model, calibrating the
+int8 variant on a sample of the OriginalDataset. Every variant, plus the float32 Keras
+baseline, is then evaluated on a held-out sample of the same dataset (disjoint from the
+calibration images). The report lists accuracy, per-class recall, agreement with the
+float32 predictions, latency and model size, and marks whether each variant stays
+within the allowed accuracy/recall drop.
+
+An unquantized float32 TFLite conversion is always built as well, and speedups are
+reported against it: comparing quantized TFLite variants with Keras `model.predict`
+would mix interpreter overhead with the effect of quantization.
+
+Example:
+    python quantize_model.py -m best_alzheimer_model.h5 -d archive/OriginalDataset -o quantized/
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from export_model import convert_savedmodel_to_tflite, export_savedmodel, load_keras_model
+from image_pipeline import to_model_input
+from inference_runner import KerasRunner, TFLiteRunner
+from mri_validation import load_rgb_array
+
+CLASS_NAMES = ['NonDemented', 'VeryMildDemented', 'MildDemented', 'ModerateDemented']
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# ============================================
+# DATASET SAMPLING
+# ============================================
+
+def sample_dataset(data_dir, class_names, calibration_per_class=50, eval_per_class=100, seed=42):
+    """
+    Split a class-per-folder dataset into a calibration sample and a disjoint evaluation sample.
+    Returns (calibration_paths, eval_paths, eval_labels).
+    """
+    rng = random.Random(seed)
+    calibration, eval_paths, eval_labels = [], [], []
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(data_dir, class_name)
+        if not os.path.isdir(class_dir):
+            raise FileNotFoundError(f"Class folder not found: {class_dir}")
+        files = sorted(f for f in os.listdir(class_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+        rng.shuffle(files)
+        paths = [os.path.join(class_dir, f) for f in files]
+        calibration.extend(paths[:calibration_per_class])
+        held_out = paths[calibration_per_class:calibration_per_class + eval_per_class]
+        eval_paths.extend(held_out)
+        eval_labels.extend([label] * len(held_out))
+    return calibration, eval_paths, np.asarray(eval_labels, dtype=np.int64)
+
+
+def load_inputs(paths, target_size=(224, 224)):
+    """Decode + preprocess exactly like the inference path, as one (N, H, W, 3) batch."""
+    return np.concatenate([to_model_input(load_rgb_array(p), target_size) for p in paths], axis=0)
+
+# ============================================
+# QUANTIZATION
+# ============================================
+
+def quantize(saved_model_dir, output_path, mode, calibration_paths=None, target_size=(224, 224)):
+    """
+    Write a TFLite variant. `mode` is 'float32' (plain conversion), 'float16' or 'int8'.
+    int8 uses full-integer kernels calibrated on `calibration_paths`; inputs and
+    outputs stay float32 so the variant is a drop-in for the float model.
+    Returns the flatbuffer size in bytes.
+    """
+    import tensorflow as tf
+
+    def configure(converter):
+        if mode == 'float32':
+            return
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if mode == 'float16':
+            converter.target_spec.supported_types = [tf.float16]
+        elif mode == 'int8':
+            if not calibration_paths:
+                raise ValueError("int8 quantization needs calibration images")
+
+            def representative_dataset():
+                for path in calibration_paths:
+                    yield [to_model_input(load_rgb_array(path), target_size)]
+
+            converter.representative_dataset = representative_dataset
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        else:
+            raise ValueError(f"Unknown quantization mode: {mode}")
+
+    return convert_savedmodel_to_tflite(saved_model_dir, output_path, configure=configure)
+
+# ============================================
+# EVALUATION
+# ============================================
+
+def predict_all(runner, paths, batch_size=32, target_size=(224, 224)):
+    """Class probabilities for every path, batch by batch."""
+    outputs = []
+    for start in range(0, len(paths), batch_size):
+        outputs.append(runner.predict(load_inputs(paths[start:start + batch_size], target_size), verbose=0))
+    return np.concatenate(outputs, axis=0)
+
+
+def measure_latency(runner, paths, samples=50, target_size=(224, 224)):
+    """Single-image latency in milliseconds (after one warm-up call)."""
+    inputs = [to_model_input(load_rgb_array(p), target_size) for p in paths[:samples]]
+    if not inputs:
+        return {'mean_ms': None, 'p50_ms': None, 'p95_ms': None}
+    runner.predict(inputs[0], verbose=0)
+    timings = []
+    for x in inputs:
+        start = time.perf_counter()
+        runner.predict(x, verbose=0)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return {
+        'mean_ms': float(np.mean(timings)),
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p95_ms': float(np.percentile(timings, 95)),
+    }
+
+
+def evaluate_variant(name, runner, size_bytes, eval_paths, eval_labels, class_names,
+                     reference_preds=None, batch_size=32, latency_samples=50, target_size=(224, 224)):
+    """Accuracy, per-class recall, agreement with the reference, latency and size for one variant."""
+    probs = predict_all(runner, eval_paths, batch_size=batch_size, target_size=target_size)
+    preds = np.argmax(probs, axis=1)
+    recall = {}
+    for label, class_name in enumerate(class_names):
+        mask = eval_labels == label
+        recall[class_name] = float(np.mean(preds[mask] == label)) if mask.any() else None
+    report = {
+        'variant': name,
+        'size_mb': size_bytes / 1e6,
+        'accuracy': float(np.mean(preds == eval_labels)) if len(eval_labels) else None,
+        'per_class_recall': recall,
+        'agreement_with_float32': float(np.mean(preds == reference_preds)) if reference_preds is not None else 1.0,
+        'latency': measure_latency(runner, eval_paths, samples=latency_samples, target_size=target_size),
+    }
+    return report, preds
+
+
+def flag_regressions(reports, max_accuracy_drop=0.01, max_recall_drop=0.03):
+    """Mark each quantized variant safe/unsafe relative to the float32 baseline."""
+    baseline = reports[0]
+    for report in reports[1:]:
+        problems = []
+        if baseline['accuracy'] is not None and baseline['accuracy'] - report['accuracy'] > max_accuracy_drop:
+            problems.append(f"accuracy drop {baseline['accuracy'] - report['accuracy']:.3f} > {max_accuracy_drop}")
+        for class_name, base_recall in baseline['per_class_recall'].items():
+            recall = report['per_class_recall'][class_name]
+            if base_recall is not None and recall is not None and base_recall - recall > max_recall_drop:
+                problems.append(f"{class_name} recall drop {base_recall - recall:.3f} > {max_recall_drop}")
+        report['safe_to_deploy'] = not problems
+        report['regressions'] = problems
+    baseline['safe_to_deploy'] = True
+    baseline['regressions'] = []
+    return reports
+
+
+def add_speedups(reports, reference='tflite-f32'):
+    """p50 speedup of every variant over the unquantized TFLite conversion (same runtime)."""
+    ref = next((r for r in reports if r['variant'] == reference), None)
+    ref_p50 = ref['latency']['p50_ms'] if ref is not None else None
+    for r in reports:
+        p50 = r['latency']['p50_ms']
+        r['speedup_vs_tflite_float32'] = ref_p50 / p50 if ref_p50 and p50 else None
+    return reports
+
+
+def print_report(reports):
+    print(f"\n{'='*70}")
+    print("[*] QUANTIZATION REPORT")
+    print(f"{'='*70}")
+    print(f"{'Variant':10} {'Size MB':>8} {'Acc':>7} {'Agree':>7} {'p50 ms':>8} {'p95 ms':>8} {'Speedup':>7}  Verdict")
+    print(f"{'-'*70}")
+    for r in reports:
+        lat = r['latency']
+        p50 = f"{lat['p50_ms']:8.1f}" if lat['p50_ms'] is not None else f"{'n/a':>8}"
+        p95 = f"{lat['p95_ms']:8.1f}" if lat['p95_ms'] is not None else f"{'n/a':>8}"
+        acc = f"{r['accuracy']*100:6.2f}%" if r['accuracy'] is not None else f"{'n/a':>7}"
+        speedup = f"{r['speedup_vs_tflite_float32']:6.2f}x" if r.get('speedup_vs_tflite_float32') else f"{'n/a':>7}"
+        verdict = 'baseline' if r is reports[0] else ('SAFE' if r['safe_to_deploy'] else 'REGRESSION')
+        print(f"{r['variant']:10} {r['size_mb']:8.2f} {acc} {r['agreement_with_float32']*100:6.2f}% {p50} {p95} {speedup}  {verdict}")
+    print("Speedup: p50 latency relative to the unquantized float32 TFLite model (tflite-f32)")
+    print("\n[*] PER-CLASS RECALL:")
+    for r in reports:
+        recalls = ', '.join(f"{k}={v*100:.1f}%" if v is not None else f"{k}=n/a" for k, v in r['per_class_recall'].items())
+        print(f"  {r['variant']:10} : {recalls}")
+        for problem in r['regressions']:
+            print(f"  {'':10}   [!] {problem}")
+    print(f"{'='*70}")
+
+# ============================================
+# CLI INTERFACE
+# ============================================
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Build int8/float16 variants of the trained model and compare them against float32',
+    )
+    parser.add_argument('--model', '-m', default='best_alzheimer_model.h5',
+                        help='Trained Keras model (.h5) [default: best_alzheimer_model.h5]')
+    parser.add_argument('--data', '-d', required=True,
+                        help='OriginalDataset folder (one sub-folder per class)')
+    parser.add_argument('--output', '-o', default='quantized', help='Output directory [default: quantized]')
+    parser.add_argument('--modes', nargs='+', choices=('float16', 'int8'), default=['float16', 'int8'],
+                        help='Variants to build [default: float16 int8]')
+    parser.add_argument('--classes', nargs='+', default=CLASS_NAMES,
+                        help='Class folder names in model output order')
+    parser.add_argument('--calibration-per-class', type=int, default=50,
+                        help='Calibration images per class for int8 [default: 50]')
+    parser.add_argument('--eval-per-class', type=int, default=100,
+                        help='Held-out evaluation images per class [default: 100]')
+    parser.add_argument('--latency-samples', type=int, default=50,
+                        help='Single-image timings per variant [default: 50]')
+    parser.add_argument('--threads', type=int, default=None, help='TFLite interpreter threads')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help='Largest tolerated accuracy drop vs float32 [default: 0.01]')
+    parser.add_argument('--max-recall-drop', type=float, default=0.03,
+                        help='Largest tolerated per-class recall drop vs float32 [default: 0.03]')
+    parser.add_argument('--seed', type=int, default=42, help='Sampling seed [default: 42]')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    try:
+        calibration, eval_paths, eval_labels = sample_dataset(
+            args.data, args.classes, args.calibration_per_class, args.eval_per_class, seed=args.seed)
+    except FileNotFoundError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    if not eval_paths:
+        print(f"[ERROR] No evaluation images left in {args.data}: every class has at most "
+              f"--calibration-per-class ({args.calibration_per_class}) files or --eval-per-class is 0")
+        sys.exit(1)
+    print(f"[*] Calibration images: {len(calibration)}, evaluation images: {len(eval_paths)}")
+
+    print(f"[*] Evaluating float32 baseline: {args.model}")
+    baseline_runner = KerasRunner(args.model)
+    baseline, reference_preds = evaluate_variant(
+        'float32', baseline_runner, os.path.getsize(args.model), eval_paths, eval_labels, args.classes,
+        latency_samples=args.latency_samples)
+    reports = [baseline]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saved_model_dir = os.path.join(tmp, 'savedmodel')
+        export_savedmodel(load_keras_model(args.model), saved_model_dir)
+        # Unquantized TFLite first: the speedup reference running on the same interpreter
+        for mode in ['float32'] + args.modes:
+            out_path = os.path.join(args.output, f'alzheimer_model_{mode}.tflite')
+            print(f"[*] Building {mode} variant: {out_path}")
+            size = quantize(saved_model_dir, out_path, mode, calibration_paths=calibration)
+            report, _ = evaluate_variant(
+                'tflite-f32' if mode == 'float32' else mode, TFLiteRunner(out_path, num_threads=args.threads), size, eval_paths, eval_labels,
+                args.classes, reference_preds=reference_preds, latency_samples=args.latency_samples)
+            report['path'] = out_path
+            reports.append(report)
+
+    reports = add_speedups(flag_regressions(reports, args.max_accuracy_drop, args.max_recall_drop))
+    print_report(reports)
+
+    report_path = os.path.join(args.output, 'quantization_report.json')
+    with open(report_path, 'w') as fh:
+        json.dump({'model': args.model, 'data': args.data, 'classes': args.classes, 'variants': reports}, fh, indent=2)
+    print(f"\n[OK] Report saved: {report_path}")
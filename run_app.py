@@ -8,21 +8,15 @@ import sys
 import os
 
 def check_requirements():
-    """Check if required packages are installed"""
-    try:
-        import streamlit
-        import plotly
-        import tensorflow
-        from PIL import Image  # Test PIL import specifically
-        import numpy
-        import pandas
-        import matplotlib
-        import seaborn
-        return True
-    except ImportError as e:
-        print(f"❌ Missing package: {e}")
+    """Check if required packages are installed (located, not imported - TensorFlow alone takes seconds)"""
+    from importlib.util import find_spec
+    
+    missing = [name for name in ('streamlit', 'plotly', 'tensorflow', 'PIL', 'numpy', 'pandas') if find_spec(name) is None]
+    if missing:
+        print(f"❌ Missing package: {', '.join(missing)}")
         print("\n💡 Install with: pip install -r requirements_ui.txt")
         return False
+    return True
 
 def check_model():
     """Check if model file exists"""
@@ -8,10 +8,14 @@ It CANNOT diagnose Alzheimer's from normal photographs, faces, or selfies.
 All inputs MUST be validated as legitimate brain scans before processing.
 """
 import os
-import numpy as np
-from PIL import Image
-from tensorflow import keras
+import glob
+from typing import NamedTuple, Optional
+from inference_runner import create_runner
 from mri_validation import validate_mri_scan
+from image_pipeline import decode_probs, iter_prepared_batches, prepare_image, remember_prediction
+from instrumentation import metrics, timed_predict
+from prediction_cache import PredictionCache
+from volume_inference import predict_volume
 
 # ============================================
 # MEDICAL SAFETY: BRAIN SCAN VALIDATION
@@ -22,15 +26,68 @@ def validate_brain_scan(image_path):
     return validate_mri_scan(image_path)
 
 
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class PredictionResult(NamedTuple):
+    """
+    One streamed prediction. `error` is set (and the prediction fields are None) for scans
+    that were not classified; `status` says why: 'ok', 'rejected' (failed MRI validation),
+    'unreadable' (could not be decoded) or 'error' (the model call failed).
+    """
+    path: str
+    predicted_class: Optional[str]
+    confidence: Optional[float]
+    all_probs: Optional[dict]
+    error: Optional[str] = None
+    status: str = 'ok'
+
+
+def _iter_image_paths(paths_or_folder):
+    """
+    Resolve a folder, a single file, a glob pattern (``**`` recurses) or any
+    iterable of paths into a lazy stream of image paths.
+    """
+    if isinstance(paths_or_folder, (str, os.PathLike)):
+        target = os.fspath(paths_or_folder)
+        if os.path.isdir(target):
+            for fname in sorted(os.listdir(target)):
+                if fname.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(target, fname)
+        elif os.path.isfile(target):
+            yield target
+        elif glob.has_magic(target):
+            for path in glob.iglob(target, recursive=True):
+                if path.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(path):
+                    yield path
+        else:
+            raise FileNotFoundError(f"No such file, folder or pattern: {target}")
+    else:
+        for path in paths_or_folder:
+            yield os.fspath(path)
+
+
 class AlzheimerPredictor:
     """Fast Alzheimer disease predictor - loads model once, predicts efficiently"""
     
-    def __init__(self, model_path='best_alzheimer_model.h5'):
-        """Initialize predictor with trained model"""
+    def __init__(self, model_path='best_alzheimer_model.h5', cache=None, backend='auto', num_threads=None):
+        """
+        Initialize predictor with trained model
+        
+        Args:
+            model_path: Path to trained model (.h5, exported SavedModel dir or .tflite)
+            cache: Optional PredictionCache, or True for an in-memory one.
+                Re-submitted scans are then answered without validation or inference.
+            backend: 'auto', 'keras', 'savedmodel' or 'tflite' (see inference_runner.py).
+                'tflite' gives the lowest latency and memory on CPU-only nodes.
+            num_threads: Interpreter threads for the TFLite backend
+        """
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model not found: {model_path}")
         
-        self.model = keras.models.load_model(model_path, compile=False)
+        # Any backend exposes a Keras-style predict(batch, verbose=0)
+        self.model = create_runner(model_path, backend=backend, num_threads=num_threads)
+        self.cache = PredictionCache(model_path) if cache is True else cache
         self.class_names = ['NonDemented', 'VeryMildDemented', 'MildDemented', 'ModerateDemented']
         print(f"✅ Model loaded: {model_path}")
     
@@ -53,68 +110,161 @@ class AlzheimerPredictor:
             >>> disease, conf = predictor.predict_image('brain_mri.jpg')
             >>> print(f"Prediction: {disease} ({conf*100:.1f}%)")
         """
-        # CRITICAL: Validate image is a brain scan
-        is_valid, msg = validate_brain_scan(image_path)
-        if not is_valid:
-            print(f"[VALIDATION ERROR] {msg}")
-            print("[MEDICAL SAFETY] Prediction aborted. This tool only processes brain scans (MRI, CT, PET). Normal photos, portraits, or non-medical images are strictly blocked. Please upload a valid brain scan.")
-            return None, None, None if return_all_probs else (None, None)
-        
-        # Load and preprocess image
-        img = Image.open(image_path).convert('RGB')
-        img = img.resize((224, 224))
-        arr = np.array(img, dtype=np.float32) / 255.0
-        arr = np.expand_dims(arr, axis=0)
-        
-        # Predict
-        preds = self.model.predict(arr, verbose=0)
-        probs = preds[0]
-        idx = int(np.argmax(probs))
-        confidence = float(probs[idx])
-        predicted_class = self.class_names[idx]
+        with metrics.trace("prediction", source=str(image_path)) as trace:
+            # CRITICAL: Validate image is a brain scan (decoded once, reused for preprocessing)
+            prepared = prepare_image(image_path, target_size=(224, 224), cache=self.cache)
+            if not prepared.is_valid:
+                trace["outcome"] = "rejected"
+                print(f"[VALIDATION ERROR] {prepared.message}")
+                print("[MEDICAL SAFETY] Prediction aborted. This tool only processes brain scans (MRI, CT, PET). Normal photos, portraits, or non-medical images are strictly blocked. Please upload a valid brain scan.")
+                return (None, None, None) if return_all_probs else (None, None)
+            
+            # Predict (cache hits already carry their probabilities)
+            if prepared.probs is not None:
+                probs = prepared.probs
+                trace["outcome"] = "cached"
+            else:
+                probs = timed_predict(self.model, prepared.x)[0]
+                remember_prediction(self.cache, prepared, probs)
+                trace["outcome"] = "accepted"
+            with metrics.stage("format"):
+                predicted_class, confidence = self._decode(probs)
+                all_probs = {name: float(prob) for name, prob in zip(self.class_names, probs)} if return_all_probs else None
+            trace["label"], trace["confidence"] = predicted_class, confidence
         
         if return_all_probs:
-            all_probs = {name: float(prob) for name, prob in zip(self.class_names, probs)}
             return predicted_class, confidence, all_probs
         else:
             return predicted_class, confidence
     
-    def predict_folder(self, folder_path, verbose=True):
+    def _decode(self, probs):
+        """Map one probability row to (predicted_class, confidence)"""
+        return decode_probs(probs, self.class_names)
+    
+    def iter_predictions(self, paths_or_folder, batch_size=32, workers=None, prefetch=2):
+        """
+        Stream predictions batch by batch instead of collecting a full list
+        
+        Args:
+            paths_or_folder: Folder, single image, glob pattern (e.g. 'study/**/*.jpg')
+                or any iterable of image paths (consumed lazily)
+            batch_size: Images per model.predict call
+            workers: Decode threads (default: CPU count, capped at 32)
+            prefetch: Ready batches queued ahead of the model (bounds memory)
+        
+        Yields:
+            PredictionResult for every input, in input order, as soon as its
+            batch finishes. Rejected or failed scans carry `error` instead of a class.
+        
+        Example:
+            >>> predictor = AlzheimerPredictor()
+            >>> for r in predictor.iter_predictions('cohort/**/*.jpg'):
+            ...     if r.error is None:
+            ...         print(f"{r.path}: {r.predicted_class} ({r.confidence*100:.1f}%)")
+        """
+        batches = iter_prepared_batches(_iter_image_paths(paths_or_folder), target_size=(224, 224),
+                                        batch_size=batch_size, workers=workers, prefetch=prefetch,
+                                        cache=self.cache)
+        for batch in batches:
+            try:
+                preds = iter(timed_predict(self.model, batch.x)) if batch.x is not None else iter(())
+                batch_error = None
+            except Exception as e:
+                batch_error = str(e)
+            
+            for path, prepared in batch.items:
+                if not prepared.is_valid:
+                    metrics.log_event("prediction", source=str(path), outcome="rejected", error=prepared.message)
+                    status = 'unreadable' if prepared.unreadable else 'rejected'
+                    yield PredictionResult(path, None, None, None, prepared.message, status)
+                elif prepared.probs is None and batch_error is not None:
+                    metrics.log_event("prediction", source=str(path), outcome="error", error=batch_error)
+                    yield PredictionResult(path, None, None, None, batch_error, 'error')
+                else:
+                    if prepared.probs is not None:
+                        probs = prepared.probs
+                    else:
+                        probs = next(preds)
+                        remember_prediction(self.cache, prepared, probs)
+                    with metrics.stage("format"):
+                        predicted_class, confidence = self._decode(probs)
+                        all_probs = {name: float(prob) for name, prob in zip(self.class_names, probs)}
+                    metrics.log_event("prediction", source=str(path), label=predicted_class, confidence=confidence,
+                                      outcome="cached" if prepared.probs is not None else "accepted")
+                    yield PredictionResult(path, predicted_class, confidence, all_probs)
+    
+    def predict_folder(self, folder_path, verbose=True, batch_size=32, workers=None, prefetch=2):
         """
         Predict all images in a folder
         
+        Images are decoded, validated and resized on a thread pool while the
+        model runs on the previous batch, so inference no longer waits on decode.
+        For long runs prefer `iter_predictions`, which streams results instead
+        of building the whole list.
+        
         Args:
             folder_path: Path to folder containing images
             verbose: Print progress
+            batch_size: Images per model.predict call
+            workers: Decode threads (default: CPU count, capped at 32)
+            prefetch: Ready batches queued ahead of the model (bounds memory)
         
         Returns:
-            List of (filename, predicted_class, confidence) tuples
+            List of (filename, predicted_class, confidence) tuples, in folder order.
+            Images that fail brain scan validation are skipped.
         
         Example:
             >>> predictor = AlzheimerPredictor()
-            >>> results = predictor.predict_folder('patient_mris/')
+            >>> results = predictor.predict_folder('patient_mris/', workers=16)
             >>> for filename, disease, conf in results:
             ...     print(f"{filename}: {disease} ({conf*100:.1f}%)")
         """
         results = []
-        files = sorted([f for f in os.listdir(folder_path) 
-                       if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))])
+        paths = list(_iter_image_paths(folder_path))
         
         if verbose:
-            print(f"Processing {len(files)} images...\n")
+            print(f"Processing {len(paths)} images...\n")
         
-        for i, fname in enumerate(files, 1):
-            path = os.path.join(folder_path, fname)
-            try:
-                pred_class, conf = self.predict_image(path)
-                results.append((fname, pred_class, conf))
+        stream = self.iter_predictions(paths, batch_size=batch_size, workers=workers, prefetch=prefetch)
+        for i, result in enumerate(stream, 1):
+            fname = os.path.basename(result.path)
+            if result.error is not None:
                 if verbose:
-                    print(f"[{i}/{len(files)}] {fname:30} -> {pred_class:20} ({conf*100:5.1f}%)")
-            except Exception as e:
-                if verbose:
-                    print(f"[{i}/{len(files)}] {fname:30} -> ERROR: {e}")
+                    print(f"[{i}/{len(paths)}] {fname:30} -> SKIPPED: {result.error}")
+                continue
+            results.append((fname, result.predicted_class, result.confidence))
+            if verbose:
+                print(f"[{i}/{len(paths)}] {fname:30} -> {result.predicted_class:20} ({result.confidence*100:5.1f}%)")
         
         return results
+    
+    def predict_volume(self, volume, pooling='mean', batch_size=32, workers=None, axis=None, window=None, slices=None):
+        """
+        Patient-level prediction for a whole study instead of one slice
+        
+        Args:
+            volume: (slices, H, W) array, .npy/.npz/.nii(.gz) file, folder of slice
+                images or list of slices - nothing is written to disk
+            pooling: How slice probabilities become one result: 'mean', 'median',
+                'max', 'confidence', 'log_mean', 'vote' or a callable
+            batch_size: Slices per model.predict call
+            workers: Threads validating and resizing slices ahead of the model
+            axis: Slice axis (default 0, axial for NIfTI)
+            window: Fixed (low, high) intensity window instead of the automatic one
+            slices: slice() or index list to restrict the evaluated slices
+        
+        Returns:
+            volume_inference.VolumePrediction with the pooled class, confidence and
+            probabilities plus per-slice probabilities. Slices failing brain scan
+            validation are listed in `rejected`; if all fail, predicted_class is None.
+        
+        Example:
+            >>> predictor = AlzheimerPredictor()
+            >>> result = predictor.predict_volume('sub-01_T1w.nii.gz', pooling='confidence')
+            >>> print(f"{result.predicted_class} ({result.confidence*100:.1f}%) from {len(result.slice_indices)} slices")
+        """
+        return predict_volume(self.model, volume, class_names=self.class_names, pooling=pooling,
+                              batch_size=batch_size, workers=workers, axis=axis, window=window, slices=slices)
 
 
 # ============================================
@@ -154,10 +304,25 @@ if __name__ == '__main__':
     
     for filename, disease, confidence in results:
         print(f"{filename}: {disease} ({confidence*100:.1f}%)")
+    
+    # Stream results for long runs (folders, globs or any iterable of paths)
+    for result in predictor.iter_predictions('study/**/*.jpg'):
+        if result.error is None:
+            print(f"{result.path}: {result.predicted_class}")
+    """)
+    
+    # Example 3: Whole study
+    print("\n📌 EXAMPLE 3: Predict Whole MRI Volume")
+    print("-" * 70)
+    print("""
+    # NIfTI (needs nibabel), NumPy volume or folder of slices - pooled over valid slices
+    result = predictor.predict_volume('sub-01_T1w.nii.gz', pooling='confidence')
+    print(f"{result.predicted_class} ({result.confidence*100:.1f}%)")
+    print(f"{len(result.slice_indices)} slices used, {len(result.rejected)} rejected")
     """)
     
-    # Example 3: Integration in larger application
-    print("\n📌 EXAMPLE 3: Integration in Your Application")
+    # Example 4: Integration in larger application
+    print("\n📌 EXAMPLE 4: Integration in Your Application")
     print("-" * 70)
     print("""
     from simple_predict import AlzheimerPredictor
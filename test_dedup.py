@@ -0,0 +1,64 @@
+"""Tests for dedup.near_duplicate_pairs (run with: python -m pytest test_dedup.py)."""
+import numpy as np
+
+import dedup
+
+
+def brute_force_pairs(phashes, dhashes, owners, max_distance, max_dhash_distance):
+    pairs = set()
+    for i in range(len(phashes)):
+        for j in range(i + 1, len(phashes)):
+            if owners[i] == owners[j]:
+                continue
+            if (bin(int(phashes[i]) ^ int(phashes[j])).count('1') <= max_distance
+                    and bin(int(dhashes[i]) ^ int(dhashes[j])).count('1') <= max_dhash_distance):
+                pairs.add((min(owners[i], owners[j]), max(owners[i], owners[j])))
+    return pairs
+
+
+def near_identical_hashes(count, seed=0, flips=3):
+    """`count` hashes that all sit within a few bits of one base hash, so they share band buckets."""
+    rng = np.random.default_rng(seed)
+    base_p, base_d = (int(v) for v in rng.integers(0, 2**63, size=2, dtype=np.int64))
+    phashes, dhashes = [], []
+    for _ in range(count):
+        p, d = base_p, base_d
+        for bit in rng.integers(0, 64, size=flips):
+            p ^= 1 << int(bit)
+        for bit in rng.integers(0, 64, size=flips):
+            d ^= 1 << int(bit)
+        phashes.append(p)
+        dhashes.append(d)
+    return phashes, dhashes
+
+
+def test_matches_brute_force_on_random_and_near_identical_hashes():
+    rng = np.random.default_rng(1)
+    near_p, near_d = near_identical_hashes(150)
+    rand_p = [int(v) for v in rng.integers(0, 2**63, size=100, dtype=np.int64)]
+    rand_d = [int(v) for v in rng.integers(0, 2**63, size=100, dtype=np.int64)]
+    phashes, dhashes = near_p + rand_p, near_d + rand_d
+    owners = list(range(len(phashes) // 2)) * 2  # every image has two hash rows (original + mirror)
+
+    expected = brute_force_pairs(phashes, dhashes, owners, 6, 10)
+    assert expected  # the near-identical block must produce pairs
+    assert dedup.near_duplicate_pairs(phashes, dhashes, owners, 6, 10) == expected
+
+
+def test_large_bucket_is_compared_in_bounded_blocks(monkeypatch):
+    phashes, dhashes = near_identical_hashes(600, seed=2)
+    owners = list(range(len(phashes)))
+    expected = dedup.near_duplicate_pairs(phashes, dhashes, owners)
+
+    block = 4096  # far below 600 x 600 distances
+    largest = []
+    real_popcount = dedup.popcount
+
+    def recording_popcount(x):
+        largest.append(x.size)
+        return real_popcount(x)
+
+    monkeypatch.setattr(dedup, 'COMPARE_BLOCK', block)
+    monkeypatch.setattr(dedup, 'popcount', recording_popcount)
+    assert dedup.near_duplicate_pairs(phashes, dhashes, owners) == expected
+    assert max(largest) <= block
@@ -0,0 +1,546 @@
+"""
+Training entry point for the custom Alzheimer CNN.
+
+Runs the data pipeline, model, callbacks and learning-rate schedule of disease.py
+(cells 12-16 and the warm-up/cosine cell) as one command, with no hard-coded paths.
+
+After every epoch the model weights, full optimizer state, epoch counter and callback
+counters are written to `--checkpoint-dir` (tf.train.CheckpointManager). Rerunning the
+same command after a preemption resumes at the next epoch instead of starting over.
+
+Optional speed-ups:
+    * a mixed-precision policy: mixed_bfloat16 on CPUs with bf16 support
+      (AVX512-BF16 / AMX), mixed_float16 on GPUs. The softmax output stays float32.
+    * XLA compilation of the train step (`jit_compile=True`)
+
+`--benchmark` trains a fresh model for a few epochs in each mode and reports epoch time
+and final accuracy side by side, so a mode is only adopted if it is faster on this
+machine without costing accuracy.
+
+Example:
+    python train.py --train-dir archive/AugmentedAlzheimerDataset --test-dir archive/OriginalDataset
+    python train.py --train-dir archive/AugmentedAlzheimerDataset --precision mixed_bfloat16 --jit
+    python train.py --train-dir archive/AugmentedAlzheimerDataset --benchmark float32 float32+xla mixed_bfloat16+xla
+"""
+import contextlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+PRECISIONS = ('float32', 'mixed_bfloat16', 'mixed_float16')
+SCHEDULES = ('plateau', 'cosine')
+STATE_FILE = 'training_state.json'
+BEST_WEIGHTS_FILE = 'early_stopping_best.weights.h5'
+# Attributes that make EarlyStopping / ReduceLROnPlateau / ModelCheckpoint decisions
+CALLBACK_STATE_ATTRS = ('wait', 'best', 'stopped_epoch', 'best_epoch', 'cooldown_counter')
+
+# ============================================
+# PRECISION / COMPILATION
+# ============================================
+
+def set_precision(precision='float32'):
+    """Set the global Keras dtype policy ('float32', 'mixed_bfloat16' or 'mixed_float16')."""
+    from tensorflow import keras
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+    keras.mixed_precision.set_global_policy(precision)
+
+
+def parse_mode(mode):
+    """'mixed_bfloat16+xla' -> ('mixed_bfloat16', True)."""
+    precision, _, suffix = mode.partition('+')
+    if suffix not in ('', 'xla'):
+        raise ValueError(f"Unknown mode suffix '+{suffix}' in '{mode}' (only '+xla' is supported)")
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision '{precision}' in '{mode}', expected one of {PRECISIONS}")
+    return precision, suffix == 'xla'
+
+
+def build_optimizer(schedule='plateau', learning_rate=1e-3, steps_per_epoch=None, epochs=30,
+                    warmup_epochs=5, weight_decay=1e-5):
+    """
+    'plateau': Adam at a fixed rate, lowered by ReduceLROnPlateau (disease.py cells 14-16).
+    'cosine': AdamW with WarmUpCosineDecay (disease.py transformer cell).
+    """
+    from tensorflow import keras
+
+    if schedule == 'plateau':
+        return keras.optimizers.Adam(learning_rate=learning_rate)
+    if schedule == 'cosine':
+        from alzheimer_model import WarmUpCosineDecay
+
+        lr = WarmUpCosineDecay(learning_rate, warmup_steps=steps_per_epoch * warmup_epochs,
+                               total_steps=steps_per_epoch * epochs)
+        return keras.optimizers.AdamW(learning_rate=lr, weight_decay=weight_decay)
+    raise ValueError(f"Unknown schedule '{schedule}', expected one of {SCHEDULES}")
+
+
+def compile_model(model, optimizer, jit_compile=False):
+    """Categorical cross-entropy + the disease.py metrics. Loss scaling for
+    mixed_float16 is added by Keras automatically."""
+    from tensorflow import keras
+
+    model.compile(
+        optimizer=optimizer,
+        loss='categorical_crossentropy',
+        metrics=['accuracy', keras.metrics.Precision(name='precision'), keras.metrics.Recall(name='recall')],
+        jit_compile=jit_compile,
+    )
+    return model
+
+# ============================================
+# CALLBACKS
+# ============================================
+
+def epoch_timer():
+    """Callback recording the wall time of every epoch in `.epoch_times`."""
+    from tensorflow import keras
+
+    class EpochTimer(keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.epoch_times = []
+            self._start = None
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self._start = time.perf_counter()
+
+        def on_epoch_end(self, epoch, logs=None):
+            self.epoch_times.append(time.perf_counter() - self._start)
+
+    return EpochTimer()
+
+
+def default_callbacks(output_path=None, schedule='plateau', patience=7):
+    """
+    EarlyStopping / ReduceLROnPlateau / ModelCheckpoint from disease.py cell 15.
+    ReduceLROnPlateau is left out under the cosine schedule, which owns the rate.
+    """
+    from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, ReduceLROnPlateau
+
+    callbacks = [EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True, verbose=1)]
+    if schedule == 'plateau':
+        callbacks.append(ReduceLROnPlateau(monitor='val_loss', factor=0.5, patience=4, min_lr=1e-7, verbose=1))
+    if output_path:
+        callbacks.append(ModelCheckpoint(output_path, monitor='val_accuracy', save_best_only=True, verbose=1))
+    return callbacks
+
+
+def _callback_state(callbacks):
+    """Counters/best values of the stateful Keras callbacks, keyed by class name."""
+    state = {}
+    for cb in callbacks:
+        values = {name: getattr(cb, name) for name in CALLBACK_STATE_ATTRS if hasattr(cb, name)}
+        if values:
+            state[type(cb).__name__] = {k: (float(v) if isinstance(v, (float, np.floating)) else v)
+                                        for k, v in values.items()}
+    return state
+
+
+def read_training_state(checkpoint_dir):
+    """The JSON sidecar written next to the checkpoints, or None."""
+    path = os.path.join(checkpoint_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def resumable_checkpoint(manager, epoch_var, callbacks, checkpoint_dir, restored_state=None):
+    """
+    Callback that saves model + optimizer + epoch through a tf.train.CheckpointManager at
+    the end of every epoch. It also writes the EarlyStopping / ReduceLROnPlateau /
+    ModelCheckpoint counters (and EarlyStopping's best weights) so a resumed run makes
+    the same decisions as one that was never interrupted.
+    Must be the last callback, so the others have already updated their state.
+    """
+    from tensorflow import keras
+
+    state_path = os.path.join(checkpoint_dir, STATE_FILE)
+    best_weights_path = os.path.join(checkpoint_dir, BEST_WEIGHTS_FILE)
+    early_stopping = next((cb for cb in callbacks if isinstance(cb, keras.callbacks.EarlyStopping)), None)
+
+    class ResumableCheckpoint(keras.callbacks.Callback):
+        def on_train_begin(self, logs=None):
+            # Runs after the other callbacks reset themselves in their own on_train_begin.
+            if not restored_state:
+                return
+            for cb in callbacks:
+                for name, value in restored_state.get('callbacks', {}).get(type(cb).__name__, {}).items():
+                    setattr(cb, name, value)
+            if early_stopping is not None and early_stopping.restore_best_weights and os.path.exists(best_weights_path):
+                current = self.model.get_weights()
+                self.model.load_weights(best_weights_path)
+                early_stopping.best_weights = self.model.get_weights()
+                self.model.set_weights(current)
+
+        def on_epoch_end(self, epoch, logs=None):
+            if early_stopping is not None and early_stopping.wait == 0 and early_stopping.best_weights is not None:
+                self.model.save_weights(best_weights_path)
+            epoch_var.assign(epoch + 1)
+            path = manager.save(checkpoint_number=epoch + 1)
+            _write_state(state_path, {'epoch': epoch + 1, 'checkpoint': path, 'finished': False,
+                                      'callbacks': _callback_state(callbacks)})
+
+        def on_train_end(self, logs=None):
+            state = read_training_state(checkpoint_dir)
+            if state is not None:
+                state['finished'] = True
+                _write_state(state_path, state)
+
+    return ResumableCheckpoint()
+
+
+def _clear_checkpoints(checkpoint_dir):
+    """Delete an earlier run's checkpoints and state (for --restart)."""
+    import tensorflow as tf
+
+    previous = tf.train.get_checkpoint_state(checkpoint_dir)
+    for path in (previous.all_model_checkpoint_paths if previous else []):
+        for filename in tf.io.gfile.glob(path + '.*'):
+            tf.io.gfile.remove(filename)
+    for name in (STATE_FILE, BEST_WEIGHTS_FILE, 'checkpoint', 'history.csv'):
+        if os.path.exists(os.path.join(checkpoint_dir, name)):
+            os.remove(os.path.join(checkpoint_dir, name))
+
+
+def _write_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(state, fh, indent=2)
+    os.replace(tmp, path)  # never leave a half-written state file behind
+
+# ============================================
+# TRAINING
+# ============================================
+
+def train(data, epochs=30, precision='float32', jit_compile=False, learning_rate=1e-3, schedule='plateau',
+          warmup_epochs=5, weight_decay=1e-5, patience=7, output_path=None, checkpoint_dir=None,
+          resume=True, steps_per_epoch=None, seed=42, callbacks=None, strategy=None, validation_steps=None):
+    """
+    Build and fit a fresh `build_custom_cnn` on a data_pipeline.TrainingData.
+
+    With `checkpoint_dir`, model weights, optimizer slots/iterations/learning rate, the
+    epoch counter and the callback state are saved after every epoch. With `resume`,
+    the run continues from the latest checkpoint at the next epoch.
+    `callbacks=None` uses `default_callbacks(output_path, schedule, patience)`.
+
+    With a `strategy` (MultiWorkerMirroredStrategy), the model and optimizer are created
+    in its scope, and fault tolerance uses Keras' BackupAndRestore. Every worker must
+    call this with the same arguments.
+    Returns (model, history, epoch_times).
+    """
+    import tensorflow as tf
+    from tensorflow import keras
+
+    from alzheimer_model import build_custom_cnn
+    from data_pipeline import set_global_seed
+
+    if strategy is None:
+        tf.keras.backend.clear_session()
+    set_precision(precision)
+    set_global_seed(seed)
+    input_shape = tuple(data.train.element_spec[0].shape[1:])
+    steps = steps_per_epoch or max(1, -(-data.train_count // data.batch_size))
+    with (strategy.scope() if strategy is not None else contextlib.nullcontext()):
+        optimizer = build_optimizer(schedule, learning_rate, steps, epochs, warmup_epochs, weight_decay)
+        model = compile_model(build_custom_cnn(input_shape, len(data.class_names)), optimizer, jit_compile)
+
+    callbacks = default_callbacks(output_path, schedule, patience) if callbacks is None else list(callbacks)
+    timer = epoch_timer()
+    initial_epoch = 0
+    if checkpoint_dir and strategy is not None:
+        # Coordinates chief/non-chief checkpoint files and restores the epoch + optimizer state
+        if not resume and os.path.isdir(checkpoint_dir):
+            shutil.rmtree(checkpoint_dir, ignore_errors=True)
+        callbacks += [keras.callbacks.BackupAndRestore(checkpoint_dir), timer]
+    elif checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        if not resume:
+            _clear_checkpoints(checkpoint_dir)
+        epoch_var = tf.Variable(0, dtype=tf.int64, trainable=False, name='epoch')
+        ckpt = tf.train.Checkpoint(model=model, optimizer=model.optimizer, epoch=epoch_var)
+        manager = tf.train.CheckpointManager(ckpt, checkpoint_dir, max_to_keep=3)
+        restored_state = None
+        if resume and manager.latest_checkpoint:
+            ckpt.restore(manager.latest_checkpoint)  # optimizer slots restore on their first use
+            initial_epoch = int(epoch_var.numpy())
+            restored_state = read_training_state(checkpoint_dir)
+            if restored_state and restored_state.get('checkpoint') != manager.latest_checkpoint:
+                print("[!] Training state does not match the latest checkpoint; callback counters start fresh")
+                restored_state = None
+            print(f"[OK] Resumed from {manager.latest_checkpoint} (epoch {initial_epoch})")
+        callbacks += [
+            keras.callbacks.CSVLogger(os.path.join(checkpoint_dir, 'history.csv'), append=initial_epoch > 0),
+            timer,
+            resumable_checkpoint(manager, epoch_var, list(callbacks), checkpoint_dir, restored_state),
+        ]
+    else:
+        callbacks.append(timer)
+
+    history = model.fit(
+        data.train,
+        validation_data=data.val,
+        epochs=epochs,
+        initial_epoch=initial_epoch,
+        steps_per_epoch=steps_per_epoch,
+        validation_steps=validation_steps,
+        class_weight=data.class_weights,
+        callbacks=callbacks,
+        verbose=1,
+    )
+    return model, history, timer.epoch_times
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+def benchmark(data, modes, epochs=3, learning_rate=1e-3, steps_per_epoch=None, seed=42):
+    """
+    Train one fresh model per mode and compare timing and accuracy. The first epoch
+    includes tracing/XLA compilation and filling the data cache, so it is reported
+    separately from the steady-state mean of the remaining epochs.
+    """
+    reports = []
+    for mode in modes:
+        precision, jit = parse_mode(mode)
+        print(f"\n[*] Benchmark mode: {mode}")
+        _, history, times = train(data, epochs, precision, jit, learning_rate,
+                                  steps_per_epoch=steps_per_epoch, seed=seed, callbacks=[])
+        steady = times[1:] or times
+        reports.append({
+            'mode': mode,
+            'precision': precision,
+            'jit_compile': jit,
+            'epochs': len(times),
+            'first_epoch_s': times[0],
+            'mean_epoch_s': float(np.mean(steady)),
+            'final_accuracy': float(history.history['accuracy'][-1]),
+            'final_val_accuracy': float(history.history['val_accuracy'][-1]) if 'val_accuracy' in history.history else None,
+        })
+    set_precision('float32')
+
+    baseline = reports[0]['mean_epoch_s']
+    for report in reports:
+        report['speedup_vs_first_mode'] = baseline / report['mean_epoch_s'] if report['mean_epoch_s'] else None
+    return reports
+
+
+def print_benchmark(reports):
+    print(f"\n{'='*78}")
+    print("[*] TRAINING MODE BENCHMARK")
+    print(f"{'='*78}")
+    print(f"{'Mode':24} {'1st epoch s':>11} {'Epoch s':>9} {'Speedup':>8} {'Acc':>8} {'Val acc':>8}")
+    print(f"{'-'*78}")
+    for r in reports:
+        val = f"{r['final_val_accuracy']*100:7.2f}%" if r['final_val_accuracy'] is not None else f"{'n/a':>8}"
+        print(f"{r['mode']:24} {r['first_epoch_s']:11.1f} {r['mean_epoch_s']:9.1f} "
+              f"{r['speedup_vs_first_mode']:7.2f}x {r['final_accuracy']*100:7.2f}% {val}")
+    print(f"{'='*78}")
+
+# ============================================
+# CLI INTERFACE
+# ============================================
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Train the custom Alzheimer CNN with resumable checkpoints',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Same setup as disease.py (Adam + ReduceLROnPlateau, 30 epochs); rerun the same command to resume
+  python train.py --train-dir archive/AugmentedAlzheimerDataset --test-dir archive/OriginalDataset
+
+  # Warm-up + cosine schedule with AdamW, from pre-decoded shards
+  python train.py --shard-dir shards/augmented --schedule cosine --epochs 40 --warmup-epochs 5 --lr 1e-4
+
+  # bfloat16 + XLA on a CPU with AVX512-BF16/AMX
+  python train.py --train-dir archive/AugmentedAlzheimerDataset --precision mixed_bfloat16 --jit
+
+  # Data-parallel on 4 local processes: global batch 64, learning rate x4
+  python train.py --train-dir archive/AugmentedAlzheimerDataset --schedule cosine --lr 1e-4 --workers 4
+
+  # Multi-node: run on every node with that node's TF_CONFIG
+  TF_CONFIG='{"cluster": {"worker": ["node1:2222", "node2:2222"]}, "task": {"type": "worker", "index": 0}}' \\
+  python train.py --train-dir /data/cohort --schedule cosine --distributed
+
+  # Ignore existing checkpoints and start over
+  python train.py --train-dir archive/AugmentedAlzheimerDataset --restart
+
+  # Compare modes for 3 epochs each before committing to one
+  python train.py --train-dir archive/AugmentedAlzheimerDataset --benchmark float32 float32+xla mixed_bfloat16 mixed_bfloat16+xla
+        """
+    )
+    # Data
+    parser.add_argument('--train-dir', default=None, help='Training dataset folder (one sub-folder per class)')
+    parser.add_argument('--test-dir', default=None, help='Test dataset folder, evaluated after training')
+    parser.add_argument('--shard-dir', default=None, help='Pre-decoded shards from dataset_cache.py (used if present)')
+    parser.add_argument('--size', '-s', type=int, nargs=2, metavar=('W', 'H'), default=(224, 224),
+                        help='Input size W H [default: 224 224]')
+    parser.add_argument('--batch-size', '-b', type=int, default=16, help='Batch size [default: 16]')
+    parser.add_argument('--validation-split', type=float, default=0.2,
+                        help='Per-class validation fraction [default: 0.2]')
+    parser.add_argument('--no-augment', action='store_true', help='Disable rotation/shift/zoom augmentation')
+    parser.add_argument('--no-cache', action='store_true', help='Do not cache decoded images in memory')
+    parser.add_argument('--index-db', default=None,
+                        help='List --train-dir through this dataset_index.py file (updated incrementally)')
+    parser.add_argument('--split-manifest', default=None,
+                        help='De-duplicated train/val lists from dedup.py (replaces --train-dir listing)')
+    # Optimization
+    parser.add_argument('--epochs', type=int, default=30, help='Training epochs [default: 30]')
+    parser.add_argument('--lr', type=float, default=1e-3, help='(Peak) learning rate [default: 1e-3]')
+    parser.add_argument('--schedule', choices=SCHEDULES, default='plateau',
+                        help='plateau: Adam + ReduceLROnPlateau; cosine: AdamW + warm-up/cosine [default: plateau]')
+    parser.add_argument('--warmup-epochs', type=int, default=5, help='Warm-up epochs for --schedule cosine [default: 5]')
+    parser.add_argument('--weight-decay', type=float, default=1e-5, help='AdamW weight decay [default: 1e-5]')
+    parser.add_argument('--patience', type=int, default=7, help='EarlyStopping patience [default: 7]')
+    parser.add_argument('--precision', choices=PRECISIONS, default='float32',
+                        help='Keras dtype policy [default: float32]')
+    parser.add_argument('--jit', action='store_true', help='XLA-compile the train step (jit_compile=True)')
+    parser.add_argument('--steps-per-epoch', type=int, default=None,
+                        help='Limit steps per epoch (useful for quick benchmarks)')
+    # Outputs / checkpoints
+    parser.add_argument('--output', '-o', default='best_alzheimer_model.h5',
+                        help='Best-model (.h5) path [default: best_alzheimer_model.h5]')
+    parser.add_argument('--checkpoint-dir', default='training_checkpoints',
+                        help='Resumable model/optimizer/epoch checkpoints [default: training_checkpoints]')
+    parser.add_argument('--restart', action='store_true', help='Start from scratch even if checkpoints exist')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for data order, augmentation and init [default: 42]')
+    # Distributed
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Launch N local worker processes with MultiWorkerMirroredStrategy [default: 1]')
+    parser.add_argument('--distributed', action='store_true',
+                        help='Join the MultiWorkerMirroredStrategy cluster described by TF_CONFIG')
+    parser.add_argument('--no-lr-scaling', action='store_true',
+                        help='Keep --lr as-is instead of scaling it with the number of replicas')
+    # Benchmark
+    parser.add_argument('--benchmark', nargs='+', metavar='MODE', default=None,
+                        help="Benchmark modes like float32, mixed_bfloat16+xla instead of training")
+    parser.add_argument('--benchmark-epochs', type=int, default=3, help='Epochs per benchmark mode [default: 3]')
+    parser.add_argument('--report', default='training_benchmark.json',
+                        help='Benchmark JSON report path [default: training_benchmark.json]')
+    args = parser.parse_args()
+
+    if not args.train_dir and not args.shard_dir and not args.split_manifest:
+        print("[ERROR] Pass --train-dir, --split-manifest and/or --shard-dir")
+        sys.exit(1)
+    if args.benchmark:
+        try:
+            for mode in args.benchmark:
+                parse_mode(mode)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+    if args.benchmark and (args.workers > 1 or args.distributed):
+        print("[ERROR] --benchmark runs in a single process; drop --workers/--distributed")
+        sys.exit(1)
+
+    if args.workers > 1 and not args.distributed:
+        from distributed_training import launch_local_workers
+
+        argv = [sys.argv[0]]
+        skip = False
+        for arg in sys.argv[1:]:
+            if skip:
+                skip = False
+            elif arg == '--workers':
+                skip = True
+            elif not arg.startswith('--workers='):
+                argv.append(arg)
+        print(f"[*] Launching {args.workers} local workers (logs of workers 1-{args.workers - 1} in {args.checkpoint_dir})")
+        sys.exit(launch_local_workers(args.workers, argv + ['--distributed'], log_dir=args.checkpoint_dir))
+
+    strategy, num_workers, worker_index = None, 1, 0
+    batch_size, learning_rate = args.batch_size, args.lr
+    if args.distributed:
+        import tensorflow as tf
+
+        from distributed_training import scale_hyperparameters, worker_info
+
+        # Must exist before any other TensorFlow op runs in this process
+        strategy = tf.distribute.MultiWorkerMirroredStrategy()
+        num_workers, worker_index = worker_info()
+        global_batch, learning_rate = scale_hyperparameters(args.batch_size, args.lr, strategy.num_replicas_in_sync,
+                                                            scale_lr=not args.no_lr_scaling)
+        # Keras distributes each worker's dataset with experimental_distribute_dataset, which
+        # treats the worker's batch as the global batch and splits it across all replicas
+        batch_size = global_batch
+        print(f"[*] Worker {worker_index}/{num_workers}: {strategy.num_replicas_in_sync} replicas, "
+              f"global batch {global_batch}, learning rate {learning_rate:g}")
+
+    state = None if (args.restart or args.benchmark or args.distributed) else read_training_state(args.checkpoint_dir)
+    stopped_early = state and state.get('callbacks', {}).get('EarlyStopping', {}).get('stopped_epoch', 0) > 0
+    if state and state.get('finished') and (stopped_early or state['epoch'] >= args.epochs):
+        print(f"[OK] Training in {args.checkpoint_dir} already finished at epoch {state['epoch']} (use --restart to retrain)")
+        sys.exit(0)
+    start_epoch = state['epoch'] if state else 0
+
+    from data_pipeline import build_datasets
+
+    index = None
+    if args.index_db and args.train_dir:
+        from dataset_index import DatasetIndex
+
+        index = DatasetIndex(args.train_dir, db_path=args.index_db)
+        stats = index.update()
+        print(f"[OK] Dataset index: {len(index)} images ({stats.added} added, {stats.changed} changed, {stats.removed} removed)")
+
+    print("[*] Building input pipeline...")
+    # Offset the seed on resume so the remaining epochs do not replay epoch 1's shuffle/augmentation
+    data = build_datasets(args.train_dir, args.test_dir, shard_dir=args.shard_dir, image_size=tuple(args.size),
+                          batch_size=batch_size, validation_split=args.validation_split,
+                          seed=args.seed + start_epoch, augment=not args.no_augment, cache=not args.no_cache,
+                          num_workers=num_workers, worker_index=worker_index, index=index,
+                          split_manifest=args.split_manifest)
+    print(f"[OK] {data.train_count} training / {data.val_count} validation / {data.test_count} test images")
+
+    if args.benchmark:
+        results = benchmark(data, args.benchmark, args.benchmark_epochs, args.lr, args.steps_per_epoch, args.seed)
+        print_benchmark(results)
+        with open(args.report, 'w') as fh:
+            json.dump({'batch_size': args.batch_size, 'steps_per_epoch': args.steps_per_epoch, 'modes': results},
+                      fh, indent=2)
+        print(f"\n[OK] Report saved: {args.report}")
+        sys.exit(0)
+
+    steps_per_epoch, validation_steps = args.steps_per_epoch, None
+    if strategy is not None:
+        # Every worker must run the same number of steps over its repeated shard; each step
+        # consumes one global batch across the cluster
+        steps_per_epoch = steps_per_epoch or max(1, data.train_count // batch_size)
+        validation_steps = max(1, data.val_count // batch_size) if data.val is not None else None
+
+    print(f"[*] Training: schedule={args.schedule}, precision={args.precision}, jit_compile={args.jit}")
+    model, history, times = train(
+        data,
+        epochs=args.epochs,
+        precision=args.precision,
+        jit_compile=args.jit,
+        learning_rate=learning_rate,
+        schedule=args.schedule,
+        warmup_epochs=args.warmup_epochs,
+        weight_decay=args.weight_decay,
+        patience=args.patience,
+        output_path=args.output,  # Keras keeps only the chief's copy under a strategy
+        checkpoint_dir=args.checkpoint_dir,
+        resume=not args.restart,
+        steps_per_epoch=steps_per_epoch,
+        validation_steps=validation_steps,
+        seed=args.seed,
+        strategy=strategy,
+    )
+    if times:
+        print(f"\n[OK] Training complete: {len(times)} epochs this run, {np.mean(times):.1f}s/epoch")
+    print(f"[OK] Best model saved: {args.output}")
+
+    if data.test is not None:
+        print("\n[*] Evaluating on test set...")
+        results = model.evaluate(data.test, verbose=1, return_dict=True)
+        for name, value in results.items():
+            print(f"  {name:12} : {value:.4f}")
@@ -0,0 +1,402 @@
+"""
+Whole-volume inference: classify every slice of a study and pool them into one patient-level result.
+
+A volume is a stack of 2D slices given as
+  - a NumPy array, (slices, H, W) grayscale or (slices, H, W, 3) RGB,
+  - a .npy/.npz file or a NIfTI file (.nii/.nii.gz, needs the optional `nibabel` package),
+  - a folder of exported slice images or a list of slice paths/arrays (sorted by name for folders).
+
+Raw scanner intensities are windowed to 8 bit once for the whole volume, so every slice
+shares the same contrast mapping. Slices then go through the shared image pipeline
+(validation, resize, batched prediction on a thread pool) straight from memory - no
+intermediate JPEGs are written. Slices rejected by MRI validation (typically the nearly
+empty ones at both ends of the stack) are reported and left out of the pooled result.
+
+Usage:
+    from volume_inference import predict_volume
+    result = predict_volume(model, 'sub-01_T1w.nii.gz', pooling='confidence')
+    print(result.predicted_class, result.confidence)
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from image_pipeline import iter_prepared_batches
+from inference_runner import BACKENDS, create_runner
+from instrumentation import metrics, timed_predict
+
+CLASS_NAMES = ["NonDemented", "VeryMildDemented", "MildDemented", "ModerateDemented"]
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+NIFTI_EXTENSIONS = (".nii", ".nii.gz")
+
+SliceSelection = Union[slice, Sequence[int], None]
+
+
+class VolumePrediction(NamedTuple):
+    """Patient-level result plus the per-slice probabilities it was pooled from."""
+
+    predicted_class: Optional[str]  # None when no slice passed validation
+    confidence: Optional[float]
+    probs: Optional[np.ndarray]  # pooled (num_classes,) probabilities
+    slice_indices: List[int]  # volume indices of the slices that reached the model
+    slice_probs: np.ndarray  # (len(slice_indices), num_classes), same order
+    rejected: List[Tuple[int, str]]  # (slice index, reason) for skipped slices
+    pooling: str
+
+
+# ============================================
+# POOLING
+# ============================================
+
+def _normalize(probs: np.ndarray) -> np.ndarray:
+    total = float(probs.sum())
+    return probs / total if total > 0 else np.full_like(probs, 1.0 / len(probs))
+
+
+def _pool_mean(slice_probs: np.ndarray) -> np.ndarray:
+    return slice_probs.mean(axis=0)
+
+
+def _pool_median(slice_probs: np.ndarray) -> np.ndarray:
+    return _normalize(np.median(slice_probs, axis=0))
+
+
+def _pool_max(slice_probs: np.ndarray) -> np.ndarray:
+    return _normalize(slice_probs.max(axis=0))
+
+
+def _pool_confidence(slice_probs: np.ndarray) -> np.ndarray:
+    """Mean weighted by each slice's top probability, so ambiguous slices count less."""
+    weights = slice_probs.max(axis=1)
+    return _normalize((slice_probs * weights[:, None]).sum(axis=0))
+
+
+def _pool_log_mean(slice_probs: np.ndarray) -> np.ndarray:
+    """Geometric mean (mean log-probability), renormalized."""
+    log_mean = np.log(np.clip(slice_probs, 1e-7, 1.0)).mean(axis=0)
+    return _normalize(np.exp(log_mean - log_mean.max()))
+
+
+def _pool_vote(slice_probs: np.ndarray) -> np.ndarray:
+    """Fraction of slices whose top class is each class."""
+    votes = np.bincount(slice_probs.argmax(axis=1), minlength=slice_probs.shape[1])
+    return votes.astype(np.float32) / len(slice_probs)
+
+
+POOLING: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "mean": _pool_mean,
+    "median": _pool_median,
+    "max": _pool_max,
+    "confidence": _pool_confidence,
+    "log_mean": _pool_log_mean,
+    "vote": _pool_vote,
+}
+
+
+def pool_probabilities(
+    slice_probs: np.ndarray,
+    pooling: Union[str, Callable[[np.ndarray], np.ndarray]] = "mean",
+) -> np.ndarray:
+    """
+    Reduce (num_slices, num_classes) probabilities to one (num_classes,) row.
+
+    `pooling` is a name from POOLING or any callable taking the slice matrix.
+    """
+    slice_probs = np.asarray(slice_probs, dtype=np.float32)
+    if slice_probs.ndim != 2 or len(slice_probs) == 0:
+        raise ValueError(f"expected a non-empty (slices, classes) array, got shape {slice_probs.shape}")
+    if callable(pooling):
+        return np.asarray(pooling(slice_probs), dtype=np.float32)
+    try:
+        return POOLING[pooling](slice_probs).astype(np.float32)
+    except KeyError:
+        raise ValueError(f"unknown pooling {pooling!r}; expected one of {', '.join(POOLING)}") from None
+
+
+# ============================================
+# LOADING + WINDOWING
+# ============================================
+
+def _load_nifti(path: str, axis: int) -> np.ndarray:
+    try:
+        import nibabel as nib
+    except ImportError:
+        raise ImportError("Reading NIfTI volumes needs nibabel: pip install nibabel") from None
+    img = nib.as_closest_canonical(nib.load(path))
+    data = np.asanyarray(img.dataobj)
+    if data.ndim == 4 and data.shape[3] == 1:
+        data = data[..., 0]
+    if data.ndim != 3:
+        raise ValueError(f"expected a 3D NIfTI volume, got shape {data.shape}")
+    # RAS canonical: rotate each slice so anterior is up, as in the exported training slices
+    return np.rot90(np.moveaxis(data, axis, 0), k=1, axes=(1, 2))
+
+
+def load_volume(path: str, axis: Optional[int] = None) -> np.ndarray:
+    """
+    Read a volume file into a (slices, H, W[, 3]) array.
+
+    Args:
+        path: .npy, .npz (a single array or one named 'volume') or .nii/.nii.gz
+        axis: Slice axis. Defaults to 0 for NumPy files and 2 (axial) for NIfTI,
+            which is reoriented to the closest canonical (RAS) orientation first.
+    """
+    lower = path.lower()
+    if lower.endswith(NIFTI_EXTENSIONS):
+        return _load_nifti(path, 2 if axis is None else axis)
+    if lower.endswith(".npz"):
+        with np.load(path) as archive:
+            if "volume" in archive.files:
+                data = archive["volume"]
+            elif len(archive.files) == 1:
+                data = archive[archive.files[0]]
+            else:
+                raise ValueError(f"{path}: expected one array or a 'volume' key, found {', '.join(archive.files)}")
+    elif lower.endswith(".npy"):
+        data = np.load(path)
+    else:
+        raise ValueError(f"unsupported volume file: {path}")
+    return np.moveaxis(data, axis, 0) if axis else data
+
+
+def window_intensities(
+    volume: np.ndarray,
+    window: Optional[Tuple[float, float]] = None,
+    percentiles: Tuple[float, float] = (0.5, 99.5),
+) -> np.ndarray:
+    """
+    Map raw intensities to uint8 with one window for the whole volume.
+
+    Args:
+        volume: Array of any numeric dtype
+        window: (low, high) intensities mapped to 0 and 255. By default the window
+            spans `percentiles` of the non-zero voxels, so the empty background
+            does not compress the brain's contrast. uint8 input is returned unchanged.
+    """
+    volume = np.asarray(volume)
+    if window is None and volume.dtype == np.uint8:
+        return volume
+    with metrics.stage("window"):
+        if window is None:
+            foreground = volume[volume > 0] if np.any(volume > 0) else volume.ravel()
+            low, high = (float(v) for v in np.percentile(foreground, percentiles))
+        else:
+            low, high = float(window[0]), float(window[1])
+        if high <= low:
+            high = low + 1.0
+        scaled = (volume.astype(np.float32) - low) * (255.0 / (high - low))
+        return np.clip(scaled, 0.0, 255.0).astype(np.uint8)
+
+
+def _as_slice_sources(source: Any, axis: Optional[int], window: Optional[Tuple[float, float]]) -> List[Any]:
+    """Turn any supported volume input into a list of per-slice sources for the image pipeline."""
+    if isinstance(source, (str, os.PathLike)):
+        path = os.fspath(source)
+        if os.path.isdir(path):
+            files = sorted(f for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+            if not files:
+                raise FileNotFoundError(f"No slice images found in {path}")
+            return [os.path.join(path, f) for f in files]
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Volume not found: {path}")
+        source = load_volume(path, axis)
+    elif isinstance(source, np.ndarray):
+        if axis:
+            source = np.moveaxis(source, axis, 0)
+    else:
+        # Sequence of slices: paths are decoded by the pipeline, arrays are stacked and windowed
+        slices = list(source)
+        if not slices or not all(isinstance(s, np.ndarray) for s in slices):
+            return slices
+        source = np.stack(slices)
+
+    if source.ndim == 4 and source.shape[-1] == 1:
+        source = source[..., 0]
+    if source.ndim not in (3, 4) or (source.ndim == 4 and source.shape[-1] != 3):
+        raise ValueError(f"expected a (slices, H, W) or (slices, H, W, 3) volume, got shape {source.shape}")
+    return list(window_intensities(source, window))
+
+
+def _select(count: int, slices: SliceSelection) -> List[int]:
+    if slices is None:
+        return list(range(count))
+    if isinstance(slices, slice):
+        return list(range(count))[slices]
+    indices = [int(i) for i in slices]
+    bad = [i for i in indices if not 0 <= i < count]
+    if bad:
+        raise IndexError(f"slice indices out of range for {count} slices: {bad}")
+    return indices
+
+
+# ============================================
+# PREDICTION
+# ============================================
+
+def predict_volume(
+    model: Any,
+    source: Any,
+    class_names: Optional[Sequence[str]] = None,
+    pooling: Union[str, Callable[[np.ndarray], np.ndarray]] = "mean",
+    target_size: Tuple[int, int] = (224, 224),
+    batch_size: int = 32,
+    workers: Optional[int] = None,
+    axis: Optional[int] = None,
+    window: Optional[Tuple[float, float]] = None,
+    slices: SliceSelection = None,
+) -> VolumePrediction:
+    """
+    Classify every slice of a volume in batches and pool them into one prediction.
+
+    Args:
+        model: Anything with a Keras-style predict(batch, verbose=0), e.g. from create_runner
+        source: Volume array, .npy/.npz/.nii(.gz) path, folder of slice images or list of slices
+        class_names: Defaults to the four dementia classes
+        pooling: 'mean', 'median', 'max', 'confidence', 'log_mean', 'vote' or a callable
+        target_size: Model input size (width, height)
+        batch_size: Slices per model.predict call
+        workers: Threads validating and resizing slices ahead of the model
+        axis: Slice axis of the array (see load_volume for file defaults)
+        window: Fixed (low, high) intensity window instead of the percentile window
+        slices: Restrict to a slice() or index list, e.g. slice(40, 140, 2)
+
+    Returns:
+        VolumePrediction. predicted_class/confidence/probs are None if every slice was rejected.
+    """
+    class_names = list(class_names or CLASS_NAMES)
+    pooling_name = pooling if isinstance(pooling, str) else getattr(pooling, "__name__", "custom")
+    if isinstance(pooling, str) and pooling not in POOLING:
+        raise ValueError(f"unknown pooling {pooling!r}; expected one of {', '.join(POOLING)}")
+
+    with metrics.trace("volume_prediction", source=source if isinstance(source, str) else type(source).__name__) as trace:
+        sources = _as_slice_sources(source, axis, window)
+        indices = _select(len(sources), slices)
+
+        kept: List[int] = []
+        rows: List[np.ndarray] = []
+        rejected: List[Tuple[int, str]] = []
+        batches = iter_prepared_batches([sources[i] for i in indices], target_size=target_size,
+                                        batch_size=batch_size, workers=workers)
+        position = 0
+        for batch in batches:
+            preds = iter(timed_predict(model, batch.x)) if batch.x is not None else iter(())
+            for _, prepared in batch.items:
+                index = indices[position]
+                position += 1
+                if prepared.is_valid:
+                    kept.append(index)
+                    rows.append(np.asarray(next(preds), dtype=np.float32))
+                else:
+                    rejected.append((index, prepared.message))
+
+        slice_probs = np.stack(rows) if rows else np.zeros((0, len(class_names)), dtype=np.float32)
+        trace["slices"], trace["rejected_slices"] = len(indices), len(rejected)
+        if not rows:
+            trace["outcome"] = "rejected"
+            return VolumePrediction(None, None, None, kept, slice_probs, rejected, pooling_name)
+
+        with metrics.stage("pool"):
+            probs = pool_probabilities(slice_probs, pooling)
+        idx = int(np.argmax(probs))
+        trace["outcome"], trace["label"], trace["confidence"] = "accepted", class_names[idx], float(probs[idx])
+        return VolumePrediction(class_names[idx], float(probs[idx]), probs, kept, slice_probs, rejected, pooling_name)
+
+
+def _parse_slices(text: Optional[str]) -> SliceSelection:
+    """'40:140:2' -> slice(40, 140, 2); '10,20,30' -> [10, 20, 30]."""
+    if not text:
+        return None
+    if ":" in text:
+        return slice(*(int(part) if part else None for part in text.split(":")))
+    return [int(part) for part in text.split(",")]
+
+
+# ============================================
+# CLI INTERFACE
+# ============================================
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Patient-level Alzheimer prediction from a whole MRI volume",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # NIfTI study (needs nibabel), mean of all valid axial slices
+  python volume_inference.py -i sub-01_T1w.nii.gz
+
+  # NumPy stack, confidence-weighted pooling over the central slices only
+  python volume_inference.py -i study.npy --pooling confidence --slices 40:140
+
+  # Folder of exported slices, per-slice table and JSON result
+  python volume_inference.py -i patient_slices/ --per-slice --json result.json
+        """
+    )
+    parser.add_argument("--input", "-i", required=True,
+                        help="Volume (.npy, .npz, .nii, .nii.gz) or folder of slice images")
+    parser.add_argument("--model", "-m", default="best_alzheimer_model.h5",
+                        help="Model (.h5, SavedModel dir or .tflite) [default: best_alzheimer_model.h5]")
+    parser.add_argument("--backend", choices=BACKENDS, default="auto", help="Inference backend [default: auto]")
+    parser.add_argument("--threads", type=int, default=None, help="TFLite interpreter threads")
+    parser.add_argument("--pooling", choices=sorted(POOLING), default="mean", help="Slice pooling [default: mean]")
+    parser.add_argument("--axis", type=int, default=None, help="Slice axis [default: 0, axial (2) for NIfTI]")
+    parser.add_argument("--window", type=float, nargs=2, metavar=("LOW", "HIGH"), default=None,
+                        help="Fixed intensity window [default: 0.5-99.5 percentile of non-zero voxels]")
+    parser.add_argument("--slices", default=None, help="Slice range START:STOP[:STEP] or list I,J,K")
+    parser.add_argument("--batch-size", "-b", type=int, default=32, help="Slices per model.predict call [default: 32]")
+    parser.add_argument("--size", type=int, nargs=2, default=[224, 224], help="Model input size [default: 224 224]")
+    parser.add_argument("--per-slice", action="store_true", help="Print the prediction of every slice")
+    parser.add_argument("--json", default=None, help="Also write the result to this JSON file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"[ERROR] Model not found: {args.model}")
+        sys.exit(1)
+    try:
+        runner = create_runner(args.model, backend=args.backend, num_threads=args.threads)
+        result = predict_volume(runner, args.input, pooling=args.pooling, target_size=tuple(args.size),
+                                batch_size=args.batch_size, axis=args.axis,
+                                window=tuple(args.window) if args.window else None,
+                                slices=_parse_slices(args.slices))
+    except (OSError, ImportError, ValueError, IndexError) as exc:
+        print(f"[ERROR] {exc}")
+        sys.exit(1)
+
+    n_slices = len(result.slice_indices) + len(result.rejected)
+    print(f"[*] {len(result.slice_indices)} of {n_slices} slices passed MRI validation")
+    if args.per_slice:
+        for index, probs in zip(result.slice_indices, result.slice_probs):
+            top = int(np.argmax(probs))
+            print(f"  slice {index:4d} -> {CLASS_NAMES[top]:20} ({probs[top]*100:5.1f}%)")
+    if result.predicted_class is None:
+        print("[VALIDATION FAILED] No slice of this volume looks like a brain MRI scan")
+        sys.exit(1)
+
+    print(f"\n{'='*70}")
+    print(f"[*] VOLUME RESULT ({result.pooling} pooling)")
+    print(f"{'='*70}")
+    print(f"Classification: {result.predicted_class}")
+    print(f"Confidence:     {result.confidence*100:.2f}%")
+    for name, prob in zip(CLASS_NAMES, result.probs):
+        print(f"  {name:20} : {prob*100:5.1f}%")
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump({
+                "input": args.input,
+                "pooling": result.pooling,
+                "predicted_class": result.predicted_class,
+                "confidence": result.confidence,
+                "probabilities": dict(zip(CLASS_NAMES, result.probs.tolist())),
+                "slices": [{"index": i, "probabilities": p.tolist()}
+                           for i, p in zip(result.slice_indices, result.slice_probs)],
+                "rejected": [{"index": i, "reason": r} for i, r in result.rejected],
+            }, fh, indent=2)
+        print(f"[OK] Result written: {args.json}")
+
+    print("\n[MEDICAL DISCLAIMER] Research use only - not a clinical diagnosis.")
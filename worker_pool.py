@@ -0,0 +1,151 @@
+"""
+Multi-process sharded inference for many-core CPU hosts.
+
+A single Python process running Keras does not scale linearly with cores. The
+`ShardedPredictor` starts N worker processes. Each one loads the model once, with its own
+TensorFlow intra-/inter-op thread budget (or TFLite interpreter threads). A dispatcher
+splits the input paths into batch-sized jobs, and `imap` hands the results back in input
+order, so output looks exactly like the single-process path.
+
+Example:
+    with ShardedPredictor('best_alzheimer_model.h5', workers=8, intra_op_threads=4) as pool:
+        for path, status, message, probs in pool.imap(paths):
+            ...
+"""
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Per-process state, set up once by _init_worker
+_runner = None
+_cache = None
+_target_size = (224, 224)
+_init_error: Optional[str] = None
+
+# (path, status, message, probs) with status 'ok', 'rejected' (failed MRI validation) or 'error'
+WorkerResult = Tuple[str, str, str, Optional[List[float]]]
+
+
+def _init_worker(model_path: str, backend: str, intra_op_threads: Optional[int],
+                 inter_op_threads: Optional[int], target_size: Tuple[int, int], cache_db: Optional[str],
+                 cache_size: int = 100_000) -> None:
+    """
+    Configure threading, then load the model once for this worker process.
+
+    A failing initializer makes multiprocessing respawn workers forever, so errors are
+    kept in `_init_error` and reported for every file instead.
+    """
+    global _runner, _cache, _target_size, _init_error
+    _target_size = tuple(target_size)
+    try:
+        from inference_runner import create_runner, detect_backend
+
+        resolved = detect_backend(model_path) if backend == "auto" else backend
+        if resolved != "tflite":
+            import tensorflow as tf  # thread pools must be sized before the first op runs
+
+            if intra_op_threads:
+                tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+            if inter_op_threads:
+                tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        _runner = create_runner(model_path, backend=resolved, num_threads=intra_op_threads)
+        if cache_db:
+            from prediction_cache import PredictionCache
+
+            _cache = PredictionCache(model_path, db_path=cache_db, max_db_entries=cache_size)
+    except Exception as exc:
+        _init_error = f"Worker failed to load model: {exc}"
+
+
+def _run_job(paths: Sequence[str]) -> List[WorkerResult]:
+    """Validate + preprocess a job's images and run them as one batch."""
+    from image_pipeline import prepare_image, remember_prediction
+
+    if _init_error is not None:
+        return [(path, "error", _init_error, None) for path in paths]
+    prepared = [prepare_image(path, target_size=_target_size, cache=_cache) for path in paths]
+    to_run = [p for p in prepared if p.x is not None]
+    batch_error = None
+    try:
+        preds = iter(_runner.predict(np.concatenate([p.x for p in to_run], axis=0), verbose=0)) if to_run else iter(())
+    except Exception as exc:  # reported per file; the rest of the run continues
+        batch_error = str(exc)
+
+    results = []
+    for path, p in zip(paths, prepared):
+        if not p.is_valid:
+            results.append((path, "rejected", p.message, None))
+        elif p.probs is not None:
+            results.append((path, "ok", p.message, [float(v) for v in p.probs]))
+        elif batch_error is not None:
+            results.append((path, "error", batch_error, None))
+        else:
+            probs = next(preds)
+            remember_prediction(_cache, p, probs)
+            results.append((path, "ok", p.message, [float(v) for v in probs]))
+    if _cache is not None:
+        _cache.flush()  # pool workers exit without running atexit handlers
+    return results
+
+
+def default_threads_per_worker(workers: int) -> int:
+    """Split the host's cores evenly across workers."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+class ShardedPredictor:
+    """Pool of model-holding worker processes with an ordered dispatcher."""
+
+    def __init__(self, model_path: str = "best_alzheimer_model.h5", workers: int = 2, backend: str = "auto",
+                 intra_op_threads: Optional[int] = None, inter_op_threads: Optional[int] = 1,
+                 batch_size: int = 32, target_size: Tuple[int, int] = (224, 224), cache_db: Optional[str] = None,
+                 cache_size: int = 100_000):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.intra_op_threads = intra_op_threads or default_threads_per_worker(self.workers)
+        self.inter_op_threads = inter_op_threads
+        # TensorFlow is not fork-safe; every worker starts from a clean interpreter.
+        self._pool = mp.get_context("spawn").Pool(
+            processes=self.workers,
+            initializer=_init_worker,
+            initargs=(model_path, backend, self.intra_op_threads, inter_op_threads, tuple(target_size), cache_db,
+                      cache_size),
+        )
+
+    def imap(self, paths: Iterable[str]) -> Iterator[WorkerResult]:
+        """Yield (path, status, message, probs) for every path, in input order."""
+        for job_results in self._pool.imap(_run_job, self._jobs(paths)):
+            yield from job_results
+
+    def _jobs(self, paths: Iterable[str]) -> Iterator[List[str]]:
+        job: List[str] = []
+        for path in paths:
+            job.append(path)
+            if len(job) == self.batch_size:
+                yield job
+                job = []
+        if job:
+            yield job
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self) -> None:
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self) -> "ShardedPredictor":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()